@@ -0,0 +1,143 @@
+"""Agendador de ticks a taxa fixa, sem deriva, com contabilidade de atrasos.
+
+Em vez de ``trabalho(); time.sleep(loop_interval)`` (período real = intervalo
++ tempo de trabalho), cada tick tem um prazo numa grade ``início + k*período``
+medida com relógio monotônico. Quando o trabalho estoura o período, a
+política define o que fazer com os ticks perdidos:
+
+- "catch-up": executa os ticks atrasados em sequência, sem dormir, até
+  alcançar a grade (nenhum tick é perdido);
+- "skip": executa o tick atrasado imediatamente e descarta os prazos já
+  vencidos, voltando à grade original no próximo prazo futuro;
+- "stretch": executa o tick atrasado imediatamente e reinicia a grade a
+  partir dele (a fase desloca, o período entre ticks é preservado).
+"""
+import asyncio
+import math
+import time
+from collections import namedtuple
+
+SCHEDULER_POLICIES = ("skip", "catch-up", "stretch")
+
+Tick = namedtuple("Tick", ["index", "deadline", "time", "lateness", "overrun", "skipped"])
+Tick.__doc__ = """Um tick liberado por `TickScheduler.wait`.
+
+index    : número do tick (0, 1, 2, ...)
+deadline : prazo agendado (relógio monotônico)
+time     : instante em que o tick foi liberado
+lateness : time - deadline (s)
+overrun  : True se o tick anterior estourou o período
+skipped  : prazos descartados antes deste tick (política "skip")
+"""
+
+
+class TickScheduler:
+    """Libera ticks em prazos fixos e mede atraso e estouros.
+
+    ``clock`` e ``sleep`` podem ser substituídos (por exemplo por um relógio
+    simulado nos testes).
+    """
+
+    def __init__(self, period, policy="skip", clock=time.monotonic, sleep=time.sleep):
+        if period <= 0:
+            raise ValueError("period deve ser positivo")
+        if policy not in SCHEDULER_POLICIES:
+            raise ValueError(f"policy deve ser uma de {SCHEDULER_POLICIES}")
+        self.period = period
+        self.policy = policy
+        self.clock = clock
+        self.sleep = sleep
+
+        self._origin = None
+        self._k = 0
+        self._next = None
+        self._overrun = False
+
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.late_last = 0.0
+        self.late_max = 0.0
+        self._late_mean = 0.0
+        self._late_m2 = 0.0
+
+    def wait(self):
+        """Dorme até o próximo prazo e devolve o `Tick` correspondente."""
+        delay = self._delay()
+        if delay > 0:
+            self.sleep(delay)
+        return self._release()
+
+    async def wait_async(self):
+        """Como `wait`, mas espera com ``asyncio.sleep`` (para o runtime asyncio)."""
+        delay = self._delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._release()
+
+    def _delay(self):
+        """Tempo até o próximo prazo; registra o estouro se o prazo já passou."""
+        now = self.clock()
+        if self._next is None:
+            self._origin = now
+            self._k = 0
+            self._next = now
+        self._overrun = now > self._next and self.ticks > 0
+        if self._overrun:
+            self.overruns += 1
+        return self._next - now
+
+    def _release(self):
+        now = self.clock()
+        deadline = self._next
+        overrun = self._overrun
+        skipped = 0
+        lateness = max(now - deadline, 0.0)
+
+        # Prazo do próximo tick, conforme a política
+        if self.policy == "catch-up":
+            self._k += 1
+        elif self.policy == "skip":
+            self._k += 1
+            behind = int(math.floor((now - self._origin) / self.period)) + 1 - self._k
+            if behind > 0:
+                skipped = behind
+                self._k += behind
+                self.skipped += behind
+        else:  # stretch
+            if overrun:
+                self._origin = now
+                self._k = 0
+            self._k += 1
+        self._next = self._origin + self._k * self.period
+
+        self._record(lateness)
+        tick = Tick(self.ticks, deadline, now, lateness, overrun, skipped)
+        self.ticks += 1
+        return tick
+
+    def __iter__(self):
+        while True:
+            yield self.wait()
+
+    def _record(self, lateness):
+        self.late_last = lateness
+        if lateness > self.late_max:
+            self.late_max = lateness
+        # Média e variância incrementais (Welford)
+        n = self.ticks + 1
+        delta = lateness - self._late_mean
+        self._late_mean += delta / n
+        self._late_m2 += delta * (lateness - self._late_mean)
+
+    def stats(self):
+        n = self.ticks
+        return {
+            "ticks": n,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "late_last_ms": self.late_last * 1e3,
+            "late_max_ms": self.late_max * 1e3,
+            "late_mean_ms": self._late_mean * 1e3,
+            "jitter_ms": math.sqrt(self._late_m2 / n) * 1e3 if n else 0.0,
+        }
@@ -0,0 +1,256 @@
+"""Busca paralela de ajuste da base de regras e das funções de pertinência.
+
+Um candidato é uma configuração do sistema fuzzy no formato de
+`base_regras` (matriz de consequentes e vértices das funções de
+pertinência); a melhor pode ser carregada direto pelo controlador.
+
+Cada candidato é simulado com a planta (`simulador.simulate`) sobre um
+conjunto de perfis de carga e clima, repetidos para variações dos
+coeficientes da planta, e recebe as métricas:
+
+- ``energy``: PCRAC integrado no tempo (média por cenário);
+- ``time_out_of_band``: segundos fora da faixa (18–26 °C);
+- ``settling``: tempo até T ficar definitivamente a ``settle_band`` do valor final;
+- ``oscillations``: mudanças de sinal da variação do erro.
+
+A nota é a soma ponderada das métricas divididas pelas da configuração
+atual, então a configuração atual tem nota ``sum(weights)`` e menor é
+melhor. Os candidatos são distribuídos num pool de processos.
+
+Uso::
+
+    python ajuste.py --candidates 400 --workers 8 --out ranking.json --best melhor.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import sistema_fuzzy
+from alertas import AlertEngine
+from base_regras import OUTPUT_LABELS, DEFAULT_CONFIG, build_engine, validate_config
+from planta import PLANT_COEFFS, plant_step
+from simulador import simulate
+from superficie import ControlSurface
+from zonas import ZoneController, oscillation_sign_changes
+
+# Variações da planta: nominal, resfriamento 15% mais fraco e carga 15% mais forte
+PLANT_VARIANTS = {
+    "nominal": PLANT_COEFFS,
+    "resfriamento_fraco": (PLANT_COEFFS[0], PLANT_COEFFS[1] * 0.85) + PLANT_COEFFS[2:],
+    "carga_forte": PLANT_COEFFS[:2] + (PLANT_COEFFS[2] * 1.15,) + PLANT_COEFFS[3:],
+}
+
+DEFAULT_SETTINGS = {
+    "setpoint": 22.0,
+    "loop_interval": 0.1,
+    "t_low": 18.0,
+    "t_high": 26.0,
+    "settle_band": 0.5,
+    "osc_deadband": 1e-3,
+    "centroid_method": "skfuzzy",
+    # Passos (erro, var_erro) da superfície de controle usada na simulação;
+    # None simula com o motor exato (bem mais lento por passo)
+    "surface_step": (0.5, 0.05),
+}
+
+DEFAULT_WEIGHTS = {"energy": 1.0, "time_out_of_band": 4.0, "settling": 0.5, "oscillations": 0.5}
+# Piso do denominador de cada métrica na nota (evita dividir por zero)
+SCORE_FLOORS = {"energy": 1.0, "time_out_of_band": 1.0, "settling": 1.0, "oscillations": 1.0}
+METRICS = tuple(DEFAULT_WEIGHTS)
+
+
+def default_profiles(steps=3000, seed=0):
+    """Perfis (Text, Qest), cada um (passos, perfis), e os nomes dos perfis."""
+    k = np.arange(steps)
+    rng = np.random.default_rng(seed)
+    degrau = np.where((k >= steps // 3) & (k < 2 * steps // 3), 80.0, 40.0)
+    passeio = np.clip(50.0 + np.cumsum(rng.normal(0.0, 1.5, steps)), 20.0, 90.0)
+    profiles = {
+        "degrau_carga": (np.full(steps, 30.0), degrau),
+        "rampa_clima": (np.linspace(20.0, 40.0, steps), np.full(steps, 50.0)),
+        "onda": (30.0 + 8.0 * np.sin(2 * np.pi * k / steps), 50.0 + 20.0 * np.sin(6 * np.pi * k / steps)),
+        "passeio": (25.0 + rng.normal(0.0, 2.0, steps), passeio),
+    }
+    Text = np.column_stack([p[0] for p in profiles.values()])
+    Qest = np.column_stack([p[1] for p in profiles.values()])
+    return Text, Qest, list(profiles)
+
+
+def evaluate(config, Text, Qest, plants=None, settings=None):
+    """Simula ``config`` em todos os perfis x variações da planta e devolve as métricas.
+
+    Cada métrica é a média sobre os cenários; ``worst_out_of_band`` é o pior
+    cenário.
+    """
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    plants = PLANT_VARIANTS if plants is None else plants
+    engine = build_engine(config)
+    method = settings["centroid_method"]
+    compute = lambda e, v: engine.evaluate(e, v, centroid_method=method).output
+    if settings["surface_step"] is not None:
+        compute = ControlSurface.build(
+            compute, (sistema_fuzzy.errotemp_universe.min(), sistema_fuzzy.errotemp_universe.max()),
+            (sistema_fuzzy.varerrotemp_universe.min(), sistema_fuzzy.varerrotemp_universe.max()),
+            *settings["surface_step"])
+    dt = settings["loop_interval"]
+
+    n_prof = Text.shape[1]
+    n = n_prof * len(plants)
+    coeffs = tuple(np.repeat(np.asarray(c, dtype=float), n_prof) for c in zip(*plants.values()))
+    controller = ZoneController(
+        [str(i) for i in range(n)], compute,
+        setpoint=settings["setpoint"], loop_interval=dt, t_low=settings["t_low"], t_high=settings["t_high"],
+        max_power_threshold=95.0, max_power_duration_sec=10.0, osc_window=20, osc_threshold=6,
+        T0=settings["setpoint"], plant=lambda T, p, Q, Te: plant_step(T, p, Q, Te, coeffs))
+    # A busca não usa os alertas do controlador
+    controller.alerts = AlertEngine([], n)
+    res = simulate(controller, np.tile(Text, len(plants)), np.tile(Qest, len(plants)))
+
+    T = res.T[1:]
+    steps = T.shape[0]
+    out_of_band = ((T < settings["t_low"]) | (T > settings["t_high"])).sum(axis=0) * dt
+    T_final = T[-max(1, steps // 10):].mean(axis=0)
+    fora = np.abs(T - T_final) > settings["settle_band"]
+    last = np.where(fora.any(axis=0), steps - np.argmax(fora[::-1], axis=0), 0)
+    v = res.var_erro
+    signs = np.sign(np.where(np.abs(v) < settings["osc_deadband"], 0.0, v))
+    return {
+        "energy": float((res.pcrac.sum(axis=0) * dt).mean()),
+        "time_out_of_band": float(out_of_band.mean()),
+        "settling": float((last * dt).mean()),
+        "oscillations": float(oscillation_sign_changes(signs.T).mean()),
+        "worst_out_of_band": float(out_of_band.max()),
+    }
+
+
+def score(metrics, baseline, weights=None):
+    """Soma ponderada das métricas relativas às da linha de base (menor é melhor)."""
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    return float(sum(w * metrics[name] / max(baseline[name], SCORE_FLOORS[name])
+                     for name, w in weights.items()))
+
+
+def random_candidates(n, seed=0, base=None, peak_jitter=0.3, rule_flip=0.15, symmetric=True):
+    """``n`` configurações vizinhas de ``base`` (padrão: a atual).
+
+    Os vértices internos variam até ``peak_jitter`` (fração) e cada
+    consequente sobe ou desce um nível com probabilidade ``rule_flip``. Com
+    ``symmetric``, as entradas continuam simétricas em torno de zero.
+    Candidatos inválidos são descartados e sorteados de novo.
+    """
+    base = DEFAULT_CONFIG if base is None else base
+    rng = np.random.default_rng(seed)
+    out = []
+    while len(out) < n:
+        cand = {"matriz_saida": [list(row) for row in base["matriz_saida"]]}
+        for key in ("erro_peaks", "var_peaks"):
+            p = np.asarray(base[key], dtype=float)
+            scale = rng.uniform(1.0 - peak_jitter, 1.0 + peak_jitter, 5)
+            if symmetric:
+                scale[:2] = scale[4:2:-1]
+            p = p * scale
+            cand[key] = [round(float(x), 4) for x in p]
+        p = np.asarray(base["pcrac_peaks"], dtype=float)
+        inner = p[1:4] + rng.uniform(-peak_jitter, peak_jitter, 3) * (p[4] - p[0]) / 4.0
+        cand["pcrac_peaks"] = [float(p[0])] + [round(float(x), 3) for x in inner] + [float(p[4])]
+        for row in cand["matriz_saida"]:
+            for j, label in enumerate(row):
+                r = rng.random()
+                if r < rule_flip:
+                    level = OUTPUT_LABELS.index(label) + (1 if r < rule_flip / 2 else -1)
+                    row[j] = OUTPUT_LABELS[min(max(level, 0), len(OUTPUT_LABELS) - 1)]
+        try:
+            validate_config(cand)
+        except ValueError:
+            continue
+        out.append(cand)
+    return out
+
+
+_WORKER = {}
+
+
+def _init_worker(Text, Qest, plants, settings):
+    _WORKER.update(Text=Text, Qest=Qest, plants=plants, settings=settings)
+
+
+def _evaluate_in_worker(config):
+    return evaluate(config, _WORKER["Text"], _WORKER["Qest"], _WORKER["plants"], _WORKER["settings"])
+
+
+def search(candidates, Text, Qest, plants=None, settings=None, weights=None, workers=None):
+    """Avalia a configuração atual e os ``candidates`` e devolve o ranking.
+
+    Cada linha do ranking tem ``rank``, ``score``, ``metrics``, ``config`` e
+    ``baseline`` (True para a configuração atual). ``workers`` é o tamanho do
+    pool de processos (padrão: número de CPUs); 0 ou 1 avalia no processo
+    atual.
+    """
+    plants = PLANT_VARIANTS if plants is None else plants
+    configs = [DEFAULT_CONFIG] + list(candidates)
+    workers = os.cpu_count() if workers is None else workers
+    if workers <= 1:
+        results = [evaluate(c, Text, Qest, plants, settings) for c in configs]
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(Text, Qest, plants, settings)) as pool:
+            chunk = max(1, len(configs) // (workers * 4))
+            results = list(pool.map(_evaluate_in_worker, configs, chunksize=chunk))
+
+    baseline = results[0]
+    rows = [{"score": score(m, baseline, weights), "metrics": m, "config": c, "baseline": i == 0}
+            for i, (c, m) in enumerate(zip(configs, results))]
+    rows.sort(key=lambda r: r["score"])
+    for rank, row in enumerate(rows, 1):
+        row["rank"] = rank
+    return rows
+
+
+def format_ranking(rows, top=10):
+    lines = [f"{'#':>3} {'nota':>7} {'energia':>9} {'fora s':>7} {'acomod s':>8} {'oscil':>6}"]
+    for row in rows[:top]:
+        m = row["metrics"]
+        flag = "  (atual)" if row["baseline"] else ""
+        lines.append(f"{row['rank']:>3} {row['score']:>7.3f} {m['energy']:>9.0f} {m['time_out_of_band']:>7.1f} "
+                     f"{m['settling']:>8.1f} {m['oscillations']:>6.1f}{flag}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=200, help="candidatos sorteados")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--steps", type=int, default=3000, help="passos por perfil")
+    parser.add_argument("--workers", type=int, help="processos (padrão: CPUs)")
+    parser.add_argument("--base", help="configuração JSON de partida (padrão: a atual)")
+    parser.add_argument("--out", help="salva o ranking completo em JSON")
+    parser.add_argument("--best", help="salva a melhor configuração em JSON")
+    args = parser.parse_args(argv)
+
+    base = None
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        validate_config(base)
+    Text, Qest, names = default_profiles(args.steps, args.seed)
+    t0 = time.perf_counter()
+    rows = search(random_candidates(args.candidates, args.seed, base), Text, Qest, workers=args.workers)
+    elapsed = time.perf_counter() - t0
+    print(format_ranking(rows))
+    print(f"{len(rows)} configurações x {len(names) * len(PLANT_VARIANTS)} cenários em {elapsed:.1f} s")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    if args.best:
+        with open(args.best, "w", encoding="utf-8") as f:
+            json.dump(rows[0]["config"], f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
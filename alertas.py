@@ -0,0 +1,404 @@
+"""Motor de alertas em fluxo, com custo constante por amostra.
+
+Cada regra guarda o seu estado em arrays com uma posição por zona (ou uma
+só, no modo de sala única) e é atualizada a cada amostra sem reler o
+histórico:
+
+- `ThresholdRule`: valor abaixo/acima de um limite, com máquina de estados
+  (avisa ao entrar e ao sair da condição, histerese, tempo mínimo no estado
+  ativo e lembretes periódicos com a contagem de repetições suprimidas);
+- `SustainedRule`: valor acima de um limiar por pelo menos ``duration_sec``,
+  medido pelo tempo decorrido entre amostras. Avisa uma vez ao atingir a
+  duração e outra ao sair da condição;
+- `OscillationRule`: mudanças de sinal do valor (com zona morta) numa janela
+  deslizante de ``window`` amostras, mantidas num buffer circular com
+  contagem incremental.
+
+`AlertEngine.update(now, **campos)` recebe escalares ou arrays (zonas,) e
+devolve os alertas como `Alert` (índice, alert_type, message, data, severity),
+com o nome da regra em ``Alert.rule``.
+
+`AlertGate` limita a taxa de alertas por regra na publicação.
+"""
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+
+
+class Alert(namedtuple("Alert", "index alert_type message data severity")):
+    """Alerta emitido: desempacota como a 5-tupla e leva o nome da regra em ``rule``."""
+
+    rule = None
+
+    def __new__(cls, index, alert_type, message, data, severity, rule=None):
+        self = super().__new__(cls, index, alert_type, message, data, severity)
+        self.rule = rule
+        return self
+
+
+class AlertRule:
+    """Base das regras: ``field`` é o nome do campo lido em `AlertEngine.update`."""
+
+    def __init__(self, name, field, alert_type, message, severity):
+        self.name = name
+        self.field = field
+        self.alert_type = alert_type
+        self.message = message
+        self.severity = severity
+        self.n = 0
+
+    def bind(self, n):
+        """Aloca o estado para ``n`` zonas."""
+        self.n = n
+
+    def reset(self, index=None):
+        """Limpa o estado de uma zona (ou de todas)."""
+
+    def update(self, values, now):
+        raise NotImplementedError
+
+
+class ThresholdRule(AlertRule):
+    """Valor abaixo de ``below`` ou acima de ``above``, com ciclo de vida.
+
+    Em vez de alertar a cada amostra, cada zona passa por uma máquina de
+    estados:
+
+    - normal -> ativo: emite ``message`` (``state: "raised"``) quando o valor
+      cruza o limite;
+    - ativo: repetições são suprimidas e contadas; a cada ``reminder_sec``
+      segundos (``None`` desativa) sai um lembrete com o número de amostras
+      suprimidas (``state: "active"``);
+    - ativo -> normal: só depois de ``min_hold_sec`` segundos no estado ativo
+      e com o valor de volta além da banda de histerese (``below +
+      hysteresis`` ou ``above - hysteresis``); emite ``message_cleared``
+      (``state: "cleared"``) com ``severity_cleared``.
+    """
+
+    def __init__(self, name, field, alert_type, message, severity, *, below=None, above=None,
+                 value_key=None, digits=2, hysteresis=0.0, min_hold_sec=0.0, reminder_sec=None,
+                 message_cleared=None, severity_cleared="baixa"):
+        if (below is None) == (above is None):
+            raise ValueError("informe exatamente um de below ou above")
+        if hysteresis < 0 or min_hold_sec < 0:
+            raise ValueError("hysteresis e min_hold_sec devem ser >= 0")
+        if reminder_sec is not None and reminder_sec <= 0:
+            raise ValueError("reminder_sec deve ser positivo")
+        super().__init__(name, field, alert_type, message, severity)
+        self.below = below
+        self.above = above
+        self.value_key = value_key or field
+        self.digits = digits
+        self.hysteresis = hysteresis
+        self.min_hold_sec = min_hold_sec
+        self.reminder_sec = reminder_sec
+        self.message_cleared = message_cleared or f"{message} (normalizado)"
+        self.severity_cleared = severity_cleared
+
+    @property
+    def limit(self):
+        return self.below if self.below is not None else self.above
+
+    def bind(self, n):
+        super().bind(n)
+        self.active = np.zeros(n, dtype=bool)
+        self.raised_at = np.full(n, np.nan)
+        self.last_sent = np.full(n, np.nan)
+        self.suppressed = np.zeros(n, dtype=np.int64)
+
+    def reset(self, index=None):
+        idx = slice(None) if index is None else index
+        self.active[idx] = False
+        self.raised_at[idx] = np.nan
+        self.last_sent[idx] = np.nan
+        self.suppressed[idx] = 0
+
+    def update(self, values, now):
+        if self.below is not None:
+            hit = values < self.below
+            back = values >= self.below + self.hysteresis
+        else:
+            hit = values > self.above
+            back = values <= self.above - self.hysteresis
+
+        active = self.active
+        cleared = active & back & (now - self.raised_at >= self.min_hold_sec)
+        raised = ~active & hit
+        held = active & ~cleared
+        self.suppressed += held & hit
+        if self.reminder_sec is None:
+            remind = np.zeros_like(held)
+        else:
+            remind = held & (now - self.last_sent >= self.reminder_sec)
+
+        alerts = []
+        for i in np.flatnonzero(cleared):
+            alerts.append((i, self.alert_type, self.message_cleared,
+                           self._data(values, now, i, "cleared"), self.severity_cleared))
+        for i in np.flatnonzero(raised):
+            alerts.append((i, self.alert_type, self.message, self._data(values, now, i, "raised"), self.severity))
+        for i in np.flatnonzero(remind):
+            alerts.append((i, self.alert_type, self.message, self._data(values, now, i, "active"), self.severity))
+
+        active[cleared] = False
+        active[raised] = True
+        self.raised_at[raised] = now
+        sent = raised | remind
+        self.last_sent[sent] = now
+        self.suppressed[sent | cleared] = 0
+        return alerts
+
+    def _data(self, values, now, i, state):
+        data = {self.value_key: round(float(values[i]), self.digits), "limit": float(self.limit), "state": state}
+        if state != "raised":
+            data["active_sec"] = round(float(now - self.raised_at[i]), 3)
+            data["suppressed"] = int(self.suppressed[i])
+        return data
+
+
+class SustainedRule(AlertRule):
+    """Valor >= ``at_least`` por ``duration_sec`` segundos ou mais.
+
+    Emite ``message`` uma vez quando a duração é atingida e
+    ``message_ended`` quando o valor volta abaixo do limiar depois de ter
+    permanecido acima pelo tempo mínimo.
+    """
+
+    def __init__(self, name, field, alert_type, message, severity, *, at_least, duration_sec,
+                 message_ended=None, value_key=None, digits=2):
+        super().__init__(name, field, alert_type, message, severity)
+        self.at_least = at_least
+        self.duration_sec = duration_sec
+        self.message_ended = message_ended
+        self.value_key = value_key or field
+        self.digits = digits
+
+    def bind(self, n):
+        super().bind(n)
+        # Instante em que cada zona entrou na condição (NaN: fora dela)
+        self.since = np.full(n, np.nan)
+        self.alerted = np.zeros(n, dtype=bool)
+
+    def reset(self, index=None):
+        idx = slice(None) if index is None else index
+        self.since[idx] = np.nan
+        self.alerted[idx] = False
+
+    def update(self, values, now):
+        alerts = []
+        active = values >= self.at_least
+        elapsed = now - self.since
+        with np.errstate(invalid='ignore'):
+            long_enough = elapsed >= self.duration_sec
+
+        if self.message_ended is not None:
+            for i in np.flatnonzero(~active & long_enough):
+                alerts.append((i, self.alert_type, self.message_ended, self._data(values, elapsed, i), self.severity))
+        started = active & np.isnan(self.since)
+        self.since[started] = now
+        self.since[~active] = np.nan
+        self.alerted[~active] = False
+
+        reached = active & ~started & long_enough & ~self.alerted
+        for i in np.flatnonzero(reached):
+            alerts.append((i, self.alert_type, self.message, self._data(values, elapsed, i), self.severity))
+        self.alerted |= reached
+        return alerts
+
+    def _data(self, values, elapsed, i):
+        return {self.value_key: round(float(values[i]), self.digits),
+                "duration_sec": round(float(elapsed[i]), 3)}
+
+
+class OscillationRule(AlertRule):
+    """``threshold`` ou mais mudanças de sinal nas últimas ``window`` amostras.
+
+    O sinal é 0 dentro de ``±deadband``; zeros são ignorados e cada sinal não
+    nulo é comparado com o último sinal não nulo anterior dentro da janela.
+    A contagem é mantida incrementalmente: ``pair_change[k]`` marca se a
+    amostra da posição ``k`` difere do próximo sinal não nulo; ao sair da
+    janela, a marca é descontada. Depois de um alerta a janela da zona é
+    limpa.
+    """
+
+    def __init__(self, name, field, alert_type, message, severity, *, window, threshold,
+                 deadband=0.05, value_key=None, digits=3):
+        if window < 2:
+            raise ValueError("window deve ser >= 2")
+        super().__init__(name, field, alert_type, message, severity)
+        self.window = window
+        self.threshold = threshold
+        self.deadband = deadband
+        self.value_key = value_key or field
+        self.digits = digits
+
+    def bind(self, n):
+        super().bind(n)
+        self.t = 0
+        self.pair_change = np.zeros((n, self.window), dtype=bool)
+        self.changes = np.zeros(n, dtype=np.int64)
+        self.samples = np.zeros(n, dtype=np.int64)
+        self.last_pos = np.full(n, -1, dtype=np.int64)   # posição absoluta do último sinal não nulo
+        self.last_sign = np.zeros(n, dtype=np.int8)
+
+    def reset(self, index=None):
+        idx = slice(None) if index is None else index
+        self.pair_change[idx] = False
+        self.changes[idx] = 0
+        self.samples[idx] = 0
+        self.last_pos[idx] = -1
+        self.last_sign[idx] = 0
+
+    def push(self, values):
+        """Acrescenta uma amostra por zona; devolve as mudanças de sinal na janela."""
+        t = self.t
+        slot = t % self.window
+        # A amostra t - window sai da janela junto com o par que ela formava
+        self.changes -= self.pair_change[:, slot]
+        self.pair_change[:, slot] = False
+
+        sign = np.where(values > self.deadband, 1, np.where(values < -self.deadband, -1, 0)).astype(np.int8)
+        nz = sign != 0
+        has_prev = nz & (self.last_pos >= 0) & (self.last_pos > t - self.window)
+        change = has_prev & (sign != self.last_sign)
+        rows = np.flatnonzero(has_prev)
+        self.pair_change[rows, self.last_pos[rows] % self.window] = change[rows]
+        self.changes += change
+        self.last_pos[nz] = t
+        self.last_sign[nz] = sign[nz]
+
+        np.minimum(self.samples + 1, self.window, out=self.samples)
+        self.t = t + 1
+        return self.changes
+
+    def update(self, values, now):
+        changes = self.push(values)
+        alerts = []
+        for i in np.flatnonzero(changes >= self.threshold):
+            alerts.append((i, self.alert_type, self.message,
+                           {"sign_changes": int(changes[i]), "window_samples": int(self.samples[i]),
+                            self.value_key: round(float(values[i]), self.digits)}, self.severity))
+            self.reset(i)
+        return alerts
+
+
+class AlertEngine:
+    """Conjunto de regras avaliado amostra a amostra para ``n`` zonas."""
+
+    def __init__(self, rules, n=1):
+        self.rules = list(rules)
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("nomes de regra repetidos")
+        self.n = n
+        for rule in self.rules:
+            rule.bind(n)
+
+    def __getitem__(self, name):
+        for rule in self.rules:
+            if rule.name == name:
+                return rule
+        raise KeyError(name)
+
+    def reset(self, index=None):
+        for rule in self.rules:
+            rule.reset(index)
+
+    def update(self, now, **fields):
+        """Avalia todas as regras; os alertas saem na ordem das regras."""
+        arrays = {}
+        alerts = []
+        for rule in self.rules:
+            values = arrays.get(rule.field)
+            if values is None:
+                values = np.broadcast_to(np.asarray(fields[rule.field], dtype=float), (self.n,))
+                arrays[rule.field] = values
+            alerts.extend(Alert(*alert, rule=rule.name) for alert in rule.update(values, now))
+        return alerts
+
+
+def default_alert_rules(*, t_low, t_high, max_power_threshold, max_power_duration_sec,
+                        osc_window, osc_threshold, hysteresis=0.0, min_hold_sec=0.0, reminder_sec=None):
+    """Regras do controlador: temperatura crítica, potência máxima e oscilação.
+
+    Campos esperados em `AlertEngine.update`: ``T_next``, ``pcrac`` e ``erro``.
+    ``hysteresis``, ``min_hold_sec`` e ``reminder_sec`` valem para as regras de
+    temperatura (ver `ThresholdRule`).
+    """
+    lifecycle = dict(value_key="temperature", hysteresis=hysteresis, min_hold_sec=min_hold_sec,
+                     reminder_sec=reminder_sec, message_cleared="Temperatura de volta à faixa segura")
+    return [
+        ThresholdRule("temperatura_baixa", "T_next", "crítico", "Temperatura abaixo do limite seguro",
+                      "crítica", below=t_low, **lifecycle),
+        ThresholdRule("temperatura_alta", "T_next", "crítico", "Temperatura acima do limite seguro",
+                      "crítica", above=t_high, **lifecycle),
+        SustainedRule("potencia_maxima", "pcrac", "eficiência",
+                      "CRAC atingiu potência máxima por tempo prolongado", "alta",
+                      at_least=max_power_threshold, duration_sec=max_power_duration_sec,
+                      message_ended="CRAC operou em potência máxima por período prolongado"),
+        OscillationRule("oscilacao", "erro", "estabilidade",
+                        "Oscilações excessivas detectadas no erro de temperatura", "média",
+                        window=osc_window, threshold=osc_threshold, value_key="erro_atual"),
+    ]
+
+
+class AlertGate:
+    """Limite de taxa por (tópico, regra), na frente de ``publish_alert``.
+
+    Balde de fichas: até ``burst`` alertas seguidos, repostos à taxa de
+    ``rate_per_sec`` por segundo. Alertas além disso são descartados e
+    contados; o próximo alerta aceito do mesmo balde leva ``suppressed`` nos
+    dados. Assim a carga no broker fica limitada durante um incidente,
+    qualquer que seja a taxa de ticks.
+
+    O balde é escolhido por ``key`` (o nome da regra, `Alert.rule`) ou, na
+    falta dele, pelo tipo do alerta. Transições de estado (``state`` igual a
+    ``"raised"`` ou ``"cleared"``) sempre passam e não gastam fichas: só os
+    lembretes e os alertas sem ciclo de vida são limitados, e o aviso de volta
+    à faixa nunca se perde. Seguro para chamadas de várias threads.
+    """
+
+    TRANSITIONS = ("raised", "cleared")
+
+    def __init__(self, rate_per_sec=1.0, burst=5, clock=time.monotonic):
+        if rate_per_sec <= 0 or burst < 1:
+            raise ValueError("rate_per_sec deve ser positivo e burst >= 1")
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.clock = clock
+        self._buckets = {}     # (tópico, regra ou tipo) -> [fichas, último instante, suprimidos]
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.dropped = 0
+
+    def admit(self, topic, alert_type, data=None, now=None, key=None):
+        """Dados a publicar (cópia, com ``suppressed`` se houver) ou None se descartado."""
+        data = dict(data or {})
+        with self._lock:
+            if data.get("state") in self.TRANSITIONS:
+                self.sent += 1
+                return data
+            now = self.clock() if now is None else now
+            bucket_key = (topic, alert_type if key is None else key)
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                bucket = self._buckets[bucket_key] = [float(self.burst), now, 0]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate_per_sec)
+            bucket[1] = now
+            if tokens < 1.0:
+                bucket[0] = tokens
+                bucket[2] += 1
+                self.dropped += 1
+                return None
+            bucket[0] = tokens - 1.0
+            if bucket[2]:
+                data["suppressed"] = data.get("suppressed", 0) + bucket[2]
+                bucket[2] = 0
+            self.sent += 1
+            return data
+
+    def stats(self):
+        with self._lock:
+            return {"sent": self.sent, "dropped": self.dropped,
+                    "pending": {f"{topic}:{key}": b[2] for (topic, key), b in self._buckets.items() if b[2]}}
@@ -0,0 +1,396 @@
+"""Runtime asyncio: ticks, entradas e publicação como tarefas cooperativas.
+
+No runtime com threads, ``on_message`` roda na thread de rede do paho e
+altera ``Text``/``Qest`` sem sincronização com o loop de controle. Aqui
+tudo roda numa única thread, no event loop:
+
+- `AsyncMqttClient` liga o socket do paho ao event loop (``loop_read``,
+  ``loop_write`` e ``loop_misc`` chamados pelo asyncio, sem ``loop_start``)
+  e entrega as mensagens recebidas numa fila assíncrona;
+- `AsyncRuntime` consome essa fila, executa os ticks e esvazia as filas
+  de saída (`publicacao.Publisher` sem thread própria). Se a conexão cai,
+  reconecta com espera exponencial (``reconnect_min`` a ``reconnect_max``
+  segundos), como o ``loop_start`` do paho faz no runtime com threads.
+
+Há dois modos de disparo:
+
+- "periodic": um tick a cada ``period`` segundos (`agendador.TickScheduler`);
+- "on-change": recalcula assim que chega uma entrada, respeitando
+  ``min_spacing`` entre dois cálculos. Sem entradas, só calcula a cada
+  ``idle_period`` (``None``: nunca), sem gastar CPU à toa.
+
+`MemoryBroker` é um broker em memória com a mesma interface de cliente,
+para testes e medições sem rede.
+"""
+import asyncio
+import socket
+import time
+from collections import namedtuple
+from agendador import TickScheduler
+from publicacao import topic_matches
+
+TRIGGER_MODES = ("periodic", "on-change")
+
+Message = namedtuple("Message", ["topic", "payload", "retain"])
+Message.__doc__ = """Mensagem recebida (mesmos atributos usados de ``paho.MQTTMessage``)."""
+
+
+class AsyncMqttClient:
+    """Cliente paho dirigido pelo event loop do asyncio.
+
+    ``paho`` é o ``mqtt.Client`` subjacente: callbacks como ``on_connect`` e
+    ``on_disconnect`` podem ser atribuídos nele e rodam na thread do event
+    loop. ``publish`` não bloqueia: o paho enfileira o pacote e o socket é
+    escrito quando o event loop indica que ele aceita dados.
+
+    ``sndbuf`` fixa o buffer de envio do socket (SO_SNDBUF) em bytes; com
+    ``None`` fica o tamanho padrão do sistema. Uma queda de conexão sinaliza
+    `wait_disconnected`; quem reconecta é o `AsyncRuntime` (`reconnect`).
+    """
+
+    def __init__(self, host, port=1883, keepalive=60, client_id="", paho=None, sndbuf=None):
+        if paho is None:
+            import paho.mqtt.client as mqtt
+            paho = mqtt.Client(client_id=client_id)
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.paho = paho
+        self.sndbuf = sndbuf
+        self.paho.on_message = self._on_message
+        self.paho.on_socket_open = self._on_socket_open
+        self.paho.on_socket_close = self._on_socket_close
+        self.paho.on_socket_register_write = self._on_socket_register_write
+        self.paho.on_socket_unregister_write = self._on_socket_unregister_write
+        self._loop = None
+        self._misc = None
+        self._queue = None
+        self._disconnected = None
+        self._closing = False
+
+    async def connect(self):
+        """Conecta ao broker (a conexão TCP roda num executor)."""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._disconnected = asyncio.Event()
+        self._closing = False
+        await self._loop.run_in_executor(None, self.paho.connect, self.host, self.port, self.keepalive)
+        return self
+
+    async def reconnect(self):
+        """Refaz a conexão TCP e a sessão MQTT; levanta ``OSError`` se falhar.
+
+        As assinaturas são refeitas por ``on_connect``, como no runtime com threads.
+        """
+        self._disconnected.clear()
+        await self._loop.run_in_executor(None, self.paho.reconnect)
+
+    async def wait_disconnected(self):
+        """Retorna quando a conexão cair (não conta `disconnect`)."""
+        await self._disconnected.wait()
+
+    def subscribe(self, topic, qos=0):
+        return self.paho.subscribe(topic, qos)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        return self.paho.publish(topic, payload, qos=qos, retain=retain)
+
+    async def messages(self):
+        """Itera sobre as mensagens recebidas, na ordem de chegada."""
+        while True:
+            yield await self._queue.get()
+
+    async def disconnect(self):
+        self._closing = True
+        self.paho.disconnect()
+        if self._misc is not None:
+            self._misc.cancel()
+
+    # Integração com o event loop (mesmo padrão do exemplo asyncio do paho)
+    def _on_message(self, client, userdata, msg):
+        self._queue.put_nowait(Message(msg.topic, msg.payload, msg.retain))
+
+    def _on_socket_open(self, client, userdata, sock):
+        def register():
+            self._loop.add_reader(sock, client.loop_read)
+            self._misc = self._loop.create_task(self._misc_loop())
+        # connect() roda num executor: registra o socket na thread do event loop
+        self._loop.call_soon_threadsafe(register)
+        if self.sndbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._loop.remove_reader(sock)
+        self._loop.remove_writer(sock)
+        if self._misc is not None:
+            self._misc.cancel()
+        if not self._closing:
+            self._disconnected.set()
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._loop.call_soon_threadsafe(self._loop.add_writer, sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._loop.remove_writer(sock)
+
+    async def _misc_loop(self):
+        import paho.mqtt.client as mqtt
+        while self.paho.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1.0)
+
+
+class _Delivered:
+    """Resposta de publish do `MemoryBroker`: entregue na hora."""
+    rc = 0
+
+    @staticmethod
+    def is_published():
+        return True
+
+
+class _Lost:
+    """Resposta de publish do `MemoryBroker` com o cliente desconectado."""
+    rc = 4      # MQTT_ERR_NO_CONN
+
+    @staticmethod
+    def is_published():
+        return False
+
+
+class MemoryBroker:
+    """Broker MQTT em memória (um event loop, sem rede, QoS ignorado).
+
+    Guarda as mensagens retidas e, em ``log``, todas as mensagens publicadas
+    como (instante, tópico, payload). Com ``keep_log=False`` (execuções
+    longas), ``log`` é None e só os contadores ``messages`` e ``bytes``
+    (payloads publicados) avançam.
+    """
+
+    def __init__(self, clock=time.monotonic, keep_log=True):
+        self.clock = clock
+        self.retained = {}
+        self.log = [] if keep_log else None
+        self.messages = 0
+        self.bytes = 0
+        self._clients = []
+
+    def client(self):
+        client = MemoryClient(self)
+        self._clients.append(client)
+        return client
+
+    def deliver(self, topic, payload, retain=False):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        elif isinstance(payload, (int, float)):
+            payload = str(payload).encode()
+        elif payload is None:
+            payload = b""
+        self.messages += 1
+        self.bytes += len(payload)
+        if self.log is not None:
+            self.log.append((self.clock(), topic, payload))
+        if retain:
+            self.retained[topic] = payload
+        for client in self._clients:
+            if client.connected and any(topic_matches(f, topic) for f in client.subscriptions):
+                client._queue.put_nowait(Message(topic, payload, False))
+
+
+class MemoryClient:
+    """Cliente do `MemoryBroker` com a interface de `AsyncMqttClient`.
+
+    `drop` simula uma queda de conexão: até `reconnect`, o cliente não
+    recebe nem publica mensagens.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.subscriptions = []
+        self.connected = True
+        self._queue = asyncio.Queue()
+        self._disconnected = asyncio.Event()
+
+    async def connect(self):
+        return self
+
+    def drop(self):
+        self.connected = False
+        self._disconnected.set()
+
+    async def reconnect(self):
+        self.connected = True
+        self._disconnected.clear()
+
+    async def wait_disconnected(self):
+        await self._disconnected.wait()
+
+    def subscribe(self, topic, qos=0):
+        self.subscriptions.append(topic)
+        for retained_topic, payload in self.broker.retained.items():
+            if topic_matches(topic, retained_topic):
+                self._queue.put_nowait(Message(retained_topic, payload, True))
+        return (0, len(self.subscriptions))
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        if not self.connected:
+            return _Lost()
+        self.broker.deliver(topic, payload, retain)
+        return _Delivered()
+
+    async def messages(self):
+        while True:
+            yield await self._queue.get()
+
+    def queued(self):
+        """Mensagens entregues a este cliente e ainda não lidas."""
+        return self._queue.qsize()
+
+    async def disconnect(self):
+        pass
+
+
+class AsyncRuntime:
+    """Tarefas cooperativas de entrada, cálculo e publicação.
+
+    ``handle_message(msg)`` aplica uma entrada ao estado do controlador;
+    ``step(now)`` executa um cálculo completo e publica em ``out`` (um
+    `publicacao.Publisher` sem thread, esvaziado aqui depois de cada
+    cálculo). Tudo roda na thread do event loop, sem travas.
+
+    Quando a conexão cai, espera ``reconnect_min`` segundos e tenta de novo,
+    dobrando a espera a cada falha até ``reconnect_max``. Os ticks continuam
+    durante a queda.
+    """
+
+    def __init__(self, client, out, step, handle_message, *, trigger="periodic", period=0.1,
+                 policy="skip", min_spacing=0.01, idle_period=None, reconnect_min=1.0, reconnect_max=120.0):
+        if trigger not in TRIGGER_MODES:
+            raise ValueError(f"trigger deve ser um de {TRIGGER_MODES}")
+        if min_spacing < 0:
+            raise ValueError("min_spacing deve ser >= 0")
+        if not 0 < reconnect_min <= reconnect_max:
+            raise ValueError("deve valer 0 < reconnect_min <= reconnect_max")
+        self.client = client
+        self.out = out
+        self.step = step
+        self.handle_message = handle_message
+        self.trigger = trigger
+        self.period = period
+        self.policy = policy
+        self.min_spacing = min_spacing
+        self.idle_period = idle_period
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+        self.scheduler = None
+
+        self._changed = None
+        self._published = None
+        self.inputs = 0
+        self.computes = 0
+        self.coalesced = 0
+        self.input_to_compute_max = 0.0
+        self.reconnects = 0
+        self.reconnect_failures = 0
+        self._pending_since = None
+
+    async def run(self, stop=None):
+        """Roda até ``stop`` (``asyncio.Event``) ser sinalizado ou a tarefa ser cancelada."""
+        self._changed = asyncio.Event()
+        self._published = asyncio.Event()
+        tasks = [asyncio.create_task(self._ingest(), name="ingest"),
+                 asyncio.create_task(self._compute(), name="compute"),
+                 asyncio.create_task(self._publish(), name="publish"),
+                 asyncio.create_task(self._connection(), name="connection")]
+        try:
+            if stop is None:
+                await asyncio.gather(*tasks)
+            else:
+                waiter = asyncio.create_task(stop.wait())
+                done, _ = await asyncio.wait(tasks + [waiter], return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task is not waiter:
+                        task.result()   # propaga exceções das tarefas
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.out.drain()
+
+    def stats(self):
+        stats = {"trigger": self.trigger, "inputs": self.inputs, "computes": self.computes,
+                 "coalesced": self.coalesced,
+                 "input_to_compute_max_ms": self.input_to_compute_max * 1e3,
+                 "reconnects": self.reconnects, "reconnect_failures": self.reconnect_failures}
+        if self.scheduler is not None:
+            stats["scheduler"] = self.scheduler.stats()
+        return stats
+
+    async def _ingest(self):
+        async for msg in self.client.messages():
+            self.inputs += 1
+            self.handle_message(msg)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            else:
+                self.coalesced += 1
+            self._changed.set()
+
+    async def _compute(self):
+        if self.trigger == "periodic":
+            self.scheduler = TickScheduler(self.period, self.policy)
+            while True:
+                tick = await self.scheduler.wait_async()
+                self._run_step(tick.time)
+                await asyncio.sleep(0)
+
+        last = None
+        while True:
+            if self.idle_period is None:
+                await self._changed.wait()
+            else:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.idle_period)
+                except asyncio.TimeoutError:
+                    pass
+            if last is not None:
+                delay = last + self.min_spacing - time.monotonic()
+                if delay > 0:
+                    # Entradas que chegarem durante a espera entram neste mesmo cálculo
+                    await asyncio.sleep(delay)
+            self._changed.clear()
+            last = time.monotonic()
+            self._run_step(last)
+            await asyncio.sleep(0)
+
+    def _run_step(self, now):
+        if self._pending_since is not None:
+            self.input_to_compute_max = max(self.input_to_compute_max, time.monotonic() - self._pending_since)
+            self._pending_since = None
+        self.step(now)
+        self.computes += 1
+        self._published.set()
+
+    async def _publish(self):
+        while True:
+            await self._published.wait()
+            self._published.clear()
+            self.out.drain()
+            if self.out.queued():
+                # Limite de mensagens em voo: tenta de novo em seguida
+                await asyncio.sleep(self.out.poll_interval)
+                self._published.set()
+
+    async def _connection(self):
+        while True:
+            await self.client.wait_disconnected()
+            delay = self.reconnect_min
+            while True:
+                await asyncio.sleep(delay)
+                try:
+                    await self.client.reconnect()
+                    break
+                except OSError:
+                    self.reconnect_failures += 1
+                    delay = min(2 * delay, self.reconnect_max)
+            self.reconnects += 1
@@ -0,0 +1,336 @@
+"""Base de regras definida por arquivo, compilada e trocada em tempo de execução.
+
+O arquivo de configuração (JSON) descreve o sistema fuzzy::
+
+    {"matriz_saida": [["MB", "MB", "B", "M", "A"], ...],    # 5x5, linhas = var_erro
+     "erro_peaks":  [-12, -6, 0, 6, 12],
+     "var_peaks":   [-0.8, -0.4, 0, 0.4, 0.8],
+     "pcrac_peaks": [0, 25, 50, 75, 100]}
+
+Os ``*_peaks`` são os 5 vértices da partição de cada variável: cada termo vai
+do vértice anterior ao seguinte, e os termos das pontas das entradas são
+trapézios até o fim do universo. Com os valores acima o sistema é idêntico
+ao de `sistema_fuzzy`. É o mesmo formato da melhor configuração gravada por
+`ajuste.py`.
+
+`compile_rule_base` transforma a configuração em `CompiledRuleBase`: funções
+de pertinência amostradas, motores vetorizado e esparso e a superfície de
+controle. A forma compacta (arrays ``.npz``) fica em disco, nomeada pelo hash
+do conteúdo, e recompilar uma configuração já vista só lê o arquivo.
+
+`RuleBaseSwap` leva uma base compilada em segundo plano até o loop, que a
+aplica entre dois ticks; `RuleFileWatcher` recompila quando o arquivo muda.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+import skfuzzy as fuzz
+import sistema_fuzzy
+from inferencia import BatchInference, SparseInference
+from superficie import ControlSurface
+
+INPUT_LABELS = ("MN", "PN", "ZE", "PP", "MP")
+OUTPUT_LABELS = ("MB", "B", "M", "A", "MA")
+CONFIG_KEYS = ("matriz_saida", "erro_peaks", "var_peaks", "pcrac_peaks")
+COMPILED_FORMAT_VERSION = 1
+
+DEFAULT_CONFIG = {
+    "matriz_saida": [list(row) for row in sistema_fuzzy.matriz_saida],
+    "erro_peaks": [-12.0, -6.0, 0.0, 6.0, 12.0],
+    "var_peaks": [-0.8, -0.4, 0.0, 0.4, 0.8],
+    "pcrac_peaks": [0.0, 25.0, 50.0, 75.0, 100.0],
+}
+
+# Limites dos trapézios das pontas (iguais aos de sistema_fuzzy)
+ERRO_LIMITS = (-16.0, 16.0)
+VAR_LIMITS = (-2.0, 2.1)
+
+
+def input_mfs(universe, peaks, limits):
+    """Termos MN..MP de uma entrada a partir dos 5 vértices."""
+    lo, hi = limits
+    p = [float(x) for x in peaks]
+    return {
+        "MN": fuzz.trapmf(universe, [lo, lo, p[0], p[1]]),
+        "PN": fuzz.trimf(universe, [p[0], p[1], p[2]]),
+        "ZE": fuzz.trimf(universe, [p[1], p[2], p[3]]),
+        "PP": fuzz.trimf(universe, [p[2], p[3], p[4]]),
+        "MP": fuzz.trapmf(universe, [p[3], p[4], hi, hi]),
+    }
+
+
+def output_mfs(universe, peaks):
+    """Termos MB..MA da saída a partir dos 5 vértices."""
+    p = [float(x) for x in peaks]
+    return {
+        "MB": fuzz.trimf(universe, [p[0], p[0], p[1]]),
+        "B": fuzz.trimf(universe, [p[0], p[1], p[2]]),
+        "M": fuzz.trimf(universe, [p[1], p[2], p[3]]),
+        "A": fuzz.trimf(universe, [p[2], p[3], p[4]]),
+        "MA": fuzz.trimf(universe, [p[3], p[4], p[4]]),
+    }
+
+
+def _is_number(x):
+    return isinstance(x, (int, float, np.integer, np.floating)) and not isinstance(x, bool)
+
+
+def validate_config(config):
+    """Levanta ValueError se a configuração não formar um sistema válido.
+
+    Tipos errados (um número no lugar da matriz, objetos nas células) também
+    são ValueError, para que quem lê arquivos ou mensagens trate um só erro.
+    """
+    if not isinstance(config, dict):
+        raise ValueError("a configuração deve ser um objeto JSON")
+    missing = [key for key in CONFIG_KEYS if key not in config]
+    if missing:
+        raise ValueError(f"chaves ausentes: {missing}")
+    for key, universe in (("erro_peaks", sistema_fuzzy.errotemp_universe),
+                          ("var_peaks", sistema_fuzzy.varerrotemp_universe),
+                          ("pcrac_peaks", sistema_fuzzy.pcrac_universe)):
+        peaks = config[key]
+        if not isinstance(peaks, (list, tuple)) or not all(_is_number(x) for x in peaks):
+            raise ValueError(f"{key} deve ser uma lista de números")
+        p = np.asarray(peaks, dtype=float)
+        if p.shape != (5,) or not np.isfinite(p).all() or np.any(np.diff(p) <= 0):
+            raise ValueError(f"{key} deve ter 5 vértices estritamente crescentes")
+        if p[0] < universe[0] or p[-1] > universe[-1]:
+            raise ValueError(f"{key} fora do universo [{universe[0]}, {universe[-1]}]")
+    matriz = config["matriz_saida"]
+    if (not isinstance(matriz, (list, tuple))
+            or not all(isinstance(row, (list, tuple)) and all(isinstance(c, str) for c in row) for row in matriz)):
+        raise ValueError("matriz_saida deve ser uma lista de linhas de rótulos (texto)")
+    if len(matriz) != 5 or any(len(row) != 5 for row in matriz):
+        raise ValueError("matriz_saida deve ser 5x5")
+    unknown = {c for row in matriz for c in row} - set(OUTPUT_LABELS)
+    if unknown:
+        raise ValueError(f"consequentes desconhecidos: {sorted(unknown)}")
+
+
+def build_engine(config):
+    """Motor vetorizado (`inferencia.BatchInference`) de uma configuração."""
+    validate_config(config)
+    return BatchInference(
+        sistema_fuzzy.errotemp_universe,
+        input_mfs(sistema_fuzzy.errotemp_universe, config["erro_peaks"], ERRO_LIMITS),
+        sistema_fuzzy.varerrotemp_universe,
+        input_mfs(sistema_fuzzy.varerrotemp_universe, config["var_peaks"], VAR_LIMITS),
+        sistema_fuzzy.pcrac_universe,
+        output_mfs(sistema_fuzzy.pcrac_universe, config["pcrac_peaks"]),
+        config["matriz_saida"], list(INPUT_LABELS), list(INPUT_LABELS))
+
+
+def config_hash(config, surface_step=(0.5, 0.05), centroid_method="skfuzzy"):
+    """sha256 (hex) da configuração normalizada, do passo da superfície e da defuzzificação."""
+    canonical = {
+        "matriz_saida": [[str(c) for c in row] for row in config["matriz_saida"]],
+        "erro_peaks": [float(x) for x in config["erro_peaks"]],
+        "var_peaks": [float(x) for x in config["var_peaks"]],
+        "pcrac_peaks": [float(x) for x in config["pcrac_peaks"]],
+        "surface_step": [float(x) for x in surface_step],
+        "centroid_method": centroid_method,
+        "version": COMPILED_FORMAT_VERSION,
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+def load_config(path):
+    """Lê e valida um arquivo de configuração JSON."""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    validate_config(config)
+    return config
+
+
+class CompiledRuleBase:
+    """Sistema fuzzy pronto para o loop: motores, superfície e termos amostrados.
+
+    ``antecedents`` e ``consequents_terms`` têm o formato de
+    `sistema_fuzzy.antecedents` e `sistema_fuzzy.consequents_terms`.
+    ``source`` diz se a base foi compilada agora ("compiled") ou lida do
+    cache ("cache").
+    """
+
+    def __init__(self, config, hash_hex, engine, surface, source="compiled", compile_ms=0.0):
+        self.config = config
+        self.hash = hash_hex
+        self.engine = engine
+        self.sparse = SparseInference(engine)
+        self.surface = surface
+        self.source = source
+        self.compile_ms = compile_ms
+        self.antecedents = {
+            "errotemp": (engine.erro_universe, dict(zip(engine.erro_labels, engine.erro_mf))),
+            "varerrotemp": (engine.var_universe, dict(zip(engine.delta_labels, engine.var_mf))),
+        }
+        self.consequents_terms = dict(zip(engine.out_labels, engine.out_mf))
+
+    @property
+    def matriz_saida(self):
+        return [list(row) for row in self.config["matriz_saida"]]
+
+    def definitions(self):
+        """``{nome: (universo, termos)}`` para `sistema_fuzzy.mf_definitions_hash`."""
+        return dict(self.antecedents, pcrac=(self.engine.out_universe, self.consequents_terms))
+
+    def save(self, path):
+        """Grava a forma compacta (npz) de modo atômico."""
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, version=COMPILED_FORMAT_VERSION, config=json.dumps(self.config),
+                     erro_mf=self.engine.erro_mf, var_mf=self.engine.var_mf, out_mf=self.engine.out_mf,
+                     erro_grid=self.surface.erro_grid, var_grid=self.surface.var_grid,
+                     table=self.surface.table)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, hash_hex):
+        with np.load(path) as data:
+            if int(data["version"]) != COMPILED_FORMAT_VERSION:
+                raise ValueError(f"{path}: versão do formato compilado diferente")
+            config = json.loads(str(data["config"]))
+            engine = BatchInference(
+                sistema_fuzzy.errotemp_universe, dict(zip(INPUT_LABELS, data["erro_mf"])),
+                sistema_fuzzy.varerrotemp_universe, dict(zip(INPUT_LABELS, data["var_mf"])),
+                sistema_fuzzy.pcrac_universe, dict(zip(OUTPUT_LABELS, data["out_mf"])),
+                config["matriz_saida"], list(INPUT_LABELS), list(INPUT_LABELS))
+            surface = ControlSurface(data["erro_grid"], data["var_grid"], data["table"])
+        return cls(config, hash_hex, engine, surface, source="cache")
+
+
+def compile_rule_base(config, cache_dir=None, surface_step=(0.5, 0.05), centroid_method="skfuzzy"):
+    """Compila ``config`` (ou lê a forma compacta do cache em ``cache_dir``)."""
+    t0 = time.perf_counter()
+    validate_config(config)
+    config = {key: config[key] for key in CONFIG_KEYS}
+    hash_hex = config_hash(config, surface_step, centroid_method)
+    path = None if cache_dir is None else os.path.join(cache_dir, f"regras-{hash_hex[:16]}.npz")
+    if path is not None and os.path.exists(path):
+        try:
+            compiled = CompiledRuleBase.load(path, hash_hex)
+            compiled.compile_ms = (time.perf_counter() - t0) * 1e3
+            return compiled
+        except (OSError, ValueError, KeyError):
+            pass  # cache corrompido ou antigo: recompila
+
+    engine = build_engine(config)
+    surface = ControlSurface.build(
+        lambda e, v: engine.evaluate(e, v, centroid_method=centroid_method).output,
+        (engine.erro_universe.min(), engine.erro_universe.max()),
+        (engine.var_universe.min(), engine.var_universe.max()), *surface_step)
+    compiled = CompiledRuleBase(config, hash_hex, engine, surface)
+    if path is not None:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            compiled.save(path)
+        except OSError:
+            pass  # sem cache a base continua válida
+    compiled.compile_ms = (time.perf_counter() - t0) * 1e3
+    return compiled
+
+
+class RuleBaseSwap:
+    """Entrega uma base compilada em outra thread ao loop de controle.
+
+    ``offer`` guarda a base mais recente (uma oferta ainda não aplicada é
+    substituída); o loop chama ``take`` no início de cada tick e aplica o que
+    receber. A troca é só a atribuição de uma referência, então nenhum tick
+    espera pela compilação.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = None
+        self.offered = 0
+        self.applied = 0
+        self.replaced = 0
+
+    def offer(self, compiled):
+        with self._lock:
+            if self._pending is not None:
+                self.replaced += 1
+            self._pending = compiled
+            self.offered += 1
+
+    def take(self):
+        if self._pending is None:   # caminho de todo tick: sem trava
+            return None
+        with self._lock:
+            compiled, self._pending = self._pending, None
+        if compiled is not None:
+            self.applied += 1
+        return compiled
+
+    def stats(self):
+        return {"offered": self.offered, "applied": self.applied, "replaced": self.replaced}
+
+
+class RuleFileWatcher:
+    """Thread que recompila o arquivo de configuração quando ele muda.
+
+    Verifica ``mtime`` e tamanho a cada ``interval`` segundos. Cada versão
+    válida é passada a ``on_compiled(compiled)``; erros de leitura ou
+    validação vão para ``on_error(exc)`` e a base em uso continua. Um erro
+    inesperado na compilação também vai para ``on_error`` sem encerrar a
+    thread.
+    """
+
+    def __init__(self, path, compile, on_compiled, on_error=None, interval=1.0):
+        self.path = path
+        self.compile = compile
+        self.on_compiled = on_compiled
+        self.on_error = on_error
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._signature = self._stat()
+        self.reloads = 0
+        self.errors = 0
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def check(self):
+        """Recompila se o arquivo mudou; devolve True se ofereceu uma nova base."""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            compiled = self.compile(load_config(self.path))
+        except (OSError, ValueError, TypeError) as exc:
+            self._failed(exc)
+            return False
+        self.reloads += 1
+        self.on_compiled(compiled)
+        return True
+
+    def _failed(self, exc):
+        self.errors += 1
+        if self.on_error is not None:
+            self.on_error(exc)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="rules-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as exc:     # a observação do arquivo não pode parar
+                self._failed(exc)
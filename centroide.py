@@ -0,0 +1,120 @@
+"""Centróide exato (forma fechada) para conjuntos de saída lineares por partes.
+
+Com termos trimf/trapmf, corte por min e acumulação por max, a pertinência
+agregada ``f(x) = max_t min(c_t, m_t(x))`` é um polígono. Em vez de amostrá-la
+no universo (como ``fuzz.defuzz`` e ``ControlSystemSimulation.compute``),
+`PiecewiseLinearCentroid` encontra os vértices desse polígono e integra
+cada trecho linear analiticamente:
+
+- vértices dos termos e encontros entre as retas de dois termos (fixos);
+- cruzamentos de cada termo com o seu corte ``m_t(x) = c_t``;
+- cruzamentos da reta de um termo com o patamar (corte) de outro, onde o
+  máximo pode trocar de termo.
+
+Entre dois vértices consecutivos ``f`` é linear, então área e momento são
+exatos. O custo depende do número de vértices dos termos, não da
+resolução do universo.
+"""
+import numpy as np
+
+
+def knots_from_samples(x, mf):
+    """Vértices (xs, ys) da interpolação linear de uma pertinência amostrada.
+
+    Pontos colineares com os vizinhos são removidos. Para trimf/trapmf com
+    parâmetros sobre a grade, os vértices são exatamente os parâmetros.
+    """
+    x = np.asarray(x, dtype=float)
+    mf = np.asarray(mf, dtype=float)
+    if x.size < 3:
+        return x.copy(), mf.copy()
+    slope = np.diff(mf) / np.diff(x)
+    keep = np.ones(x.size, dtype=bool)
+    keep[1:-1] = ~np.isclose(slope[1:], slope[:-1], rtol=0.0, atol=1e-12)
+    return x[keep], mf[keep]
+
+
+class PiecewiseLinearCentroid:
+    """Centróide exato de ``max_t min(c_t, m_t(x))`` para vários cortes de uma vez.
+
+    ``terms`` é uma lista de pares (xs, ys) com os vértices de cada termo,
+    todos sobre o mesmo intervalo [lo, hi]. Entre dois vértices de termos
+    consecutivos (um "trecho") cada termo é uma reta ``a*x + b``; o que
+    depende dos cortes é calculado só para os termos não nulos no trecho.
+    """
+
+    def __init__(self, terms):
+        self.terms = [(np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)) for xs, ys in terms]
+        self.lo = min(xs[0] for xs, _ in self.terms)
+        self.hi = max(xs[-1] for xs, _ in self.terms)
+        knots = np.unique(np.concatenate([xs for xs, _ in self.terms]))
+
+        # Reta de cada termo em cada trecho (termos x trechos)
+        left, right = knots[:-1], knots[1:]
+        yl = np.array([np.interp(left, xs, ys) for xs, ys in self.terms])
+        yr = np.array([np.interp(right, xs, ys) for xs, ys in self.terms])
+        slope = (yr - yl) / (right - left)
+        icpt = yl - slope * left
+        active = (yl > 0.0) | (yr > 0.0)
+
+        # Candidatos a vértice que dependem dos cortes, por trecho:
+        #   m_t(x) = c_t  (termo encontra o próprio corte)
+        #   m_a(x) = c_b  (reta de um termo encontra o patamar de outro)
+        # Encontros reta-reta não dependem dos cortes e entram como fixos.
+        fixed = [knots]
+        line_term, cut_term, seg = [], [], []
+        for i in range(knots.size - 1):
+            terms_i = np.flatnonzero(active[:, i])
+            for a in terms_i:
+                for b in terms_i:
+                    if slope[a, i] != 0.0:
+                        line_term.append(a)
+                        cut_term.append(b)
+                        seg.append(i)
+                    if b > a and slope[b, i] != slope[a, i]:
+                        x = (icpt[b, i] - icpt[a, i]) / (slope[a, i] - slope[b, i])
+                        if left[i] < x < right[i]:
+                            fixed.append([x])
+        self.static_knots = np.unique(np.concatenate(fixed))
+        seg = np.array(seg, dtype=np.intp)
+        line_term = np.array(line_term, dtype=np.intp)
+        self._cut_term = np.array(cut_term, dtype=np.intp)
+        self._slope = slope[line_term, seg]
+        self._icpt = icpt[line_term, seg]
+        self._left = left[seg]
+        self._right = right[seg]
+
+    @classmethod
+    def from_samples(cls, x, mfs):
+        """Constrói a partir de pertinências amostradas sobre o universo ``x``."""
+        return cls([knots_from_samples(x, mf) for mf in mfs])
+
+    def aggregate(self, cuts, x):
+        """Pertinência agregada ``max_t min(c_t, m_t(x))`` em ``x`` (N, P)."""
+        out = np.zeros(np.shape(x))
+        for t, (xs, ys) in enumerate(self.terms):
+            np.fmax(out, np.fmin(cuts[:, t, None], np.interp(x, xs, ys)), out=out)
+        return out
+
+    def breakpoints(self, cuts):
+        """Vértices ordenados do polígono agregado, (N, P); sobras repetem ``lo``."""
+        cuts = np.asarray(cuts, dtype=float)
+        n = cuts.shape[0]
+        x = (cuts[:, self._cut_term] - self._icpt) / self._slope
+        x = np.where((x > self._left) & (x < self._right), x, self.lo)
+        points = np.concatenate([np.broadcast_to(self.static_knots, (n, self.static_knots.size)), x], axis=1)
+        points.sort(axis=1)
+        return points
+
+    def centroid(self, cuts):
+        """Centróide exato por linha de ``cuts`` (N, T); NaN quando a área é nula."""
+        cuts = np.asarray(cuts, dtype=float)
+        x = self.breakpoints(cuts)
+        y = self.aggregate(cuts, x)
+        x1, x2 = x[:, :-1], x[:, 1:]
+        y1, y2 = y[:, :-1], y[:, 1:]
+        w = x2 - x1
+        area = (0.5 * w * (y1 + y2)).sum(axis=1)
+        moment = (w / 6.0 * (y1 * (2.0 * x1 + x2) + y2 * (x1 + 2.0 * x2))).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(area > 0.0, moment / area, np.nan)
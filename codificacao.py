@@ -0,0 +1,237 @@
+"""Codificação compacta do payload de inferência.
+
+O payload JSON de ``datacenter/fuzzy/inference`` repete a cada tick as 25
+regras com seus antecedentes e os 101 pontos de ``pcrac.universe``. No modo
+compacto, o que é estático (universo, ids e rótulos das regras) é publicado
+uma vez como mensagem retida (`inference_metadata`). Por tick vai apenas um
+quadro binário com o ponto de operação, as ativações não nulas e a agregação
+quantizada, completa ou como delta do quadro anterior.
+
+Layout do quadro (little-endian)::
+
+    cabeçalho  "<3sBBIdfffffHB": b"FZI", versão, flags, seq, timestamp (s),
+               T, pcrac, erro, var_erro, defuzzified, M, n_regras_ativas
+    regras     n_regras_ativas x "<BH": id (1..25), ativação * 65535
+    agregação  flags & 0x3 == 0: M valores (u8 ou u16)
+               flags & 0x3 == 1: "<H" k + k x ("<H" índice, valor)
+               flags & 0x3 == 2: igual ao quadro anterior
+               flags & 0x4: valores em 16 bits (senão 8 bits)
+
+Quadros delta só podem ser aplicados sobre o quadro ``seq - 1``. Um
+quadro completo (keyframe) é enviado a cada ``keyframe_interval`` quadros,
+para que novos assinantes ou quem perdeu mensagens se ressincronize.
+"""
+import json
+import math
+import struct
+import numpy as np
+
+INFERENCE_FORMAT_VERSION = 1
+MAGIC = b"FZI"
+
+AGG_FULL = 0
+AGG_DELTA = 1
+AGG_SAME = 2
+FLAG_MU16 = 0x4
+
+_HEADER = struct.Struct("<3sBBIdfffffHB")
+_RULE = struct.Struct("<BH")
+_COUNT = struct.Struct("<H")
+_ACT_SCALE = 65535
+
+
+def inference_metadata(pcrac_universe, rule_labels, mu_bits=8):
+    """Metadados estáticos do formato compacto (publicados uma vez, com retain).
+
+    ``rule_labels`` é a lista (delta, erro, consequente) na ordem dos ids,
+    como em `inferencia.BatchInference.rule_labels`.
+    """
+    return {
+        "version": INFERENCE_FORMAT_VERSION,
+        "encoding": "fzi-binary",
+        "mu_bits": mu_bits,
+        "mu_scale": (1 << mu_bits) - 1,
+        "activation_scale": _ACT_SCALE,
+        "aggregation_x": [float(x) for x in pcrac_universe],
+        "rules": [
+            {"id": k + 1,
+             "antecedents": [f"varerrotemp.{d_label}", f"errotemp.{e_label}"],
+             "consequent": consequent}
+            for k, (d_label, e_label, consequent) in enumerate(rule_labels)
+        ],
+    }
+
+
+def _json_number(x):
+    """``x`` como ``json.dumps`` escreveria um float (inclusive NaN e infinitos)."""
+    x = float(x)
+    if math.isfinite(x):
+        return repr(x)
+    return "NaN" if x != x else ("Infinity" if x > 0 else "-Infinity")
+
+
+class InferenceJson:
+    """Payload JSON de inferência montado direto dos buffers de `inferencia.SparseState`.
+
+    Gera o mesmo texto que ``json.dumps`` do dicionário do loop (timestamp,
+    ``operating_point``, ``rules``, ``defuzzified``, ``aggregation``), sem
+    montar dicionários por regra. O que não muda entre ticks (``aggregation.x``
+    e os rótulos de cada regra) é serializado uma vez. A agregação é
+    arredondada num buffer próprio (``out=``).
+    """
+
+    def __init__(self, pcrac_universe, engine):
+        self.n_rules = engine.n_rules
+        self.rule_var = engine.rule_var.tolist()
+        self.rule_erro = engine.rule_erro.tolist()
+        self._x = json.dumps(np.asarray(pcrac_universe).tolist())
+        # Texto fixo de cada regra, em volta dos dois graus e da ativação
+        self._rule_parts = [
+            (f'{{"id": {k + 1}, "antecedents": {{{json.dumps(f"varerrotemp.{d_label}")}: ',
+             f', {json.dumps(f"errotemp.{e_label}")}: ',
+             f', "consequent": {json.dumps(consequent)}}}')
+            for k, (d_label, e_label, consequent) in enumerate(engine.rule_labels)
+        ]
+        self._mu = np.empty(len(pcrac_universe))
+
+    def _rule(self, k, deg_var, deg_erro, activation):
+        head, mid, tail = self._rule_parts[k]
+        return (f'{head}{_json_number(round(deg_var, 6))}{mid}{_json_number(round(deg_erro, 6))}'
+                f'}}, "activation": {_json_number(activation)}{tail}')
+
+    def encode(self, timestamp, T, pcrac, erro, var_erro, state, include_all=False):
+        """Texto do payload; ``include_all`` inclui as regras que não disparam (ativação 0)."""
+        rules = ""
+        if include_all:
+            activations = state.activations
+            for k in range(self.n_rules):
+                rule = self._rule(k, state.var_degrees[self.rule_var[k]], state.erro_degrees[self.rule_erro[k]],
+                                  round(float(activations[k]), 6))
+                rules = rule if not rules else rules + ", " + rule
+        else:
+            for n in range(state.n_fired):
+                rec = state.records[n]
+                activation = round(rec.activation, 6)
+                if activation == 0.0:
+                    continue
+                rule = self._rule(rec.index, rec.var_degree, rec.erro_degree, activation)
+                rules = rule if not rules else rules + ", " + rule
+        np.round(state.aggregation, 6, out=self._mu)
+        return (f'{{"timestamp": {json.dumps(timestamp)}, "operating_point": {{"T": {_json_number(round(T, 3))}, '
+                f'"pcrac": {_json_number(round(pcrac, 3))}, "erro": {_json_number(round(erro, 3))}, '
+                f'"var_erro": {_json_number(round(var_erro, 3))}}}, "rules": [{rules}], '
+                f'"defuzzified": {_json_number(round(state.output, 3))}, '
+                f'"aggregation": {{"x": {self._x}, "mu": {self._mu.tolist()!r}}}}}')
+
+
+class InferenceEncoder:
+    """Gera os quadros binários por tick, escolhendo delta quando for menor."""
+
+    def __init__(self, n_points, mu_bits=8, keyframe_interval=50, delta=True):
+        if mu_bits not in (8, 16):
+            raise ValueError("mu_bits deve ser 8 ou 16")
+        self.n_points = n_points
+        self.mu_bits = mu_bits
+        self.keyframe_interval = keyframe_interval
+        self.delta = delta
+        self._dtype = np.dtype("<u1") if mu_bits == 8 else np.dtype("<u2")
+        self._pair = struct.Struct("<HB" if mu_bits == 8 else "<HH")
+        self._scale = (1 << mu_bits) - 1
+        self._prev = None
+        self.seq = 0
+
+    def quantize(self, agg_mu):
+        mu = np.clip(np.asarray(agg_mu, dtype=float), 0.0, 1.0)
+        return np.rint(mu * self._scale).astype(self._dtype)
+
+    def encode(self, timestamp, T, pcrac, erro, var_erro, defuzzified, activations, agg_mu):
+        q = self.quantize(agg_mu)
+        if q.size != self.n_points:
+            raise ValueError(f"agregação com {q.size} pontos; esperado {self.n_points}")
+
+        keyframe = (self._prev is None or not self.delta
+                    or (self.keyframe_interval and self.seq % self.keyframe_interval == 0))
+        if keyframe:
+            kind, agg_bytes = AGG_FULL, q.tobytes()
+        else:
+            changed = np.flatnonzero(q != self._prev)
+            if changed.size == 0:
+                kind, agg_bytes = AGG_SAME, b""
+            else:
+                delta = _COUNT.pack(changed.size) + b"".join(
+                    self._pair.pack(i, v) for i, v in zip(changed.tolist(), q[changed].tolist()))
+                if len(delta) < q.nbytes:
+                    kind, agg_bytes = AGG_DELTA, delta
+                else:
+                    kind, agg_bytes = AGG_FULL, q.tobytes()
+
+        act = np.asarray(activations, dtype=float)
+        active = np.flatnonzero(act > 0.0)
+        rules = b"".join(_RULE.pack(i + 1, int(round(min(act[i], 1.0) * _ACT_SCALE)))
+                         for i in active.tolist())
+
+        flags = kind | (FLAG_MU16 if self.mu_bits == 16 else 0)
+        header = _HEADER.pack(MAGIC, INFERENCE_FORMAT_VERSION, flags, self.seq & 0xFFFFFFFF,
+                              float(timestamp), T, pcrac, erro, var_erro, defuzzified,
+                              self.n_points, active.size)
+        self._prev = q
+        self.seq += 1
+        return header + rules + agg_bytes
+
+
+class InferenceDecoder:
+    """Reconstrói os quadros do `InferenceEncoder`.
+
+    Devolve um dicionário com a mesma organização do payload JSON
+    (``operating_point``, ``rules`` só com ativações não nulas,
+    ``defuzzified`` e ``aggregation.mu``). Se um delta chegar sem o quadro
+    anterior, ``aggregation`` vem ``None`` até o próximo keyframe.
+    """
+
+    def __init__(self):
+        self._prev = None
+        self._prev_seq = None
+
+    def decode(self, data):
+        data = bytes(data)
+        (magic, version, flags, seq, ts, T, pcrac, erro, var_erro, defuzz,
+         n_points, n_active) = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != INFERENCE_FORMAT_VERSION:
+            raise ValueError("quadro de inferência com formato desconhecido")
+        offset = _HEADER.size
+
+        rules = []
+        for _ in range(n_active):
+            rule_id, act = _RULE.unpack_from(data, offset)
+            offset += _RULE.size
+            rules.append({"id": rule_id, "activation": act / _ACT_SCALE})
+
+        mu16 = bool(flags & FLAG_MU16)
+        dtype = np.dtype("<u2") if mu16 else np.dtype("<u1")
+        scale = 65535 if mu16 else 255
+        kind = flags & 0x3
+        in_sequence = self._prev is not None and self._prev_seq == (seq - 1) & 0xFFFFFFFF
+
+        if kind == AGG_FULL:
+            q = np.frombuffer(data, dtype=dtype, count=n_points, offset=offset).copy()
+        elif kind == AGG_DELTA and in_sequence:
+            (count,) = _COUNT.unpack_from(data, offset)
+            pairs = np.frombuffer(data, dtype=np.dtype([("i", "<u2"), ("v", dtype)]),
+                                  count=count, offset=offset + _COUNT.size)
+            q = self._prev.copy()
+            q[pairs["i"]] = pairs["v"]
+        elif kind == AGG_SAME and in_sequence:
+            q = self._prev
+        else:
+            q = None
+
+        self._prev = q
+        self._prev_seq = seq
+        return {
+            "seq": seq,
+            "timestamp": ts,
+            "operating_point": {"T": T, "pcrac": pcrac, "erro": erro, "var_erro": var_erro},
+            "rules": rules,
+            "defuzzified": defuzz,
+            "aggregation": None if q is None else {"mu": (q / scale).tolist()},
+        }
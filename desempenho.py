@@ -0,0 +1,309 @@
+"""Micro-benchmarks do caminho quente do controlador, sem rede.
+
+Cada etapa de um tick é medida separadamente, com entradas variando de
+chamada para chamada (uma trajetória fixa de erro e variação do erro):
+
+- ``simulacao_compute``: ``ControlSystemSimulation.compute()`` do skfuzzy;
+- ``inference_debug`` e ``inference_active``: relatório de inferência;
+- ``antecedents``: montagem do dicionário ``antecedents`` a partir das
+  variáveis do skfuzzy;
+- ``json_inference``: payload JSON de inferência montado por
+  `codificacao.InferenceJson` a partir dos buffers de ``evaluate_into``,
+  como no tick;
+- ``plot_inference`` e ``gerar_graficos_base64``: imagens (matplotlib);
+- ``tick``: `fuzzy_miso.control_step` completo contra um cliente nulo;
+- ``tick_surface``: o mesmo tick com a superfície pré-calculada, o caminho
+  que reaproveita os buffers da inferência (sem coletas do GC por tick).
+
+Para cada etapa o resultado traz percentis do tempo por chamada (ms) e, numa
+segunda passagem com ``tracemalloc`` (que distorce o tempo), o pico de
+memória alocada por chamada, os blocos retidos e as coletas do GC.
+
+Uso::
+
+    python desempenho.py --out atual.json
+    python desempenho.py --baseline base.json --tolerance 0.2   # sai com 1 se regredir
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+
+# Chamadas medidas por etapa (as imagens são bem mais lentas)
+DEFAULT_ITERATIONS = {
+    "simulacao_compute": 300,
+    "inference_debug": 300,
+    "inference_active": 1000,
+    "antecedents": 1000,
+    "json_inference": 1000,
+    "plot_inference": 5,
+    "gerar_graficos_base64": 5,
+    "tick": 300,
+    "tick_surface": 300,
+}
+STAGES = tuple(DEFAULT_ITERATIONS)
+PERCENTILES = (50, 90, 99)
+BENCHMARK_FORMAT_VERSION = 1
+
+
+class NullClient:
+    """Cliente MQTT que só conta as publicações."""
+
+    def __init__(self):
+        self.published = 0
+        self.bytes = 0
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published += 1
+        if isinstance(payload, (str, bytes, bytearray)):
+            self.bytes += len(payload)
+
+
+def operating_points(n, seed=0):
+    """Trajetória determinística (erro, var_erro) que passa por várias regras."""
+    k = np.arange(n)
+    erro = 10.0 * np.sin(k * 0.07) + np.random.default_rng(seed).normal(0.0, 0.5, n)
+    var_erro = np.clip(np.diff(erro, prepend=erro[0]), -2.0, 2.0)
+    return np.clip(erro, -16.0, 16.0), var_erro
+
+
+def stage_functions(app):
+    """{etapa: (preparo(i), chamada)}; ``preparo`` escolhe a entrada da chamada i."""
+    pts = operating_points(max(DEFAULT_ITERATIONS.values()) * 4)
+    n_pts = pts[0].size
+    cur = {}
+
+    def point(i):
+        k = i % n_pts
+        cur["erro"], cur["var"] = float(pts[0][k]), float(pts[1][k])
+
+    def simulacao_compute():
+        sim = app.simulacao
+        sim.input['errotemp'] = cur["erro"]
+        sim.input['varerrotemp'] = cur["var"]
+        sim.compute()
+        return sim.output['pcrac']
+
+    def inference_debug():
+        return app.inference_debug(cur["erro"], cur["var"], app.pcrac_universe,
+                                   app.consequents_terms, app.antecedents)
+
+    def inference_active():
+        return app.inference_active(cur["erro"], cur["var"])
+
+    def antecedents():
+        # Como o loop original montava o dicionário a cada tick
+        return {
+            'errotemp': (app.errotemp.universe, {label: app.errotemp[label].mf for label in app.errotemp.terms}),
+            'varerrotemp': (app.varerrotemp.universe, {label: app.varerrotemp[label].mf for label in app.varerrotemp.terms}),
+        }
+
+    def prepare_inference(i):
+        point(i)
+        cur["state"] = app.motor_esparso.evaluate_into(cur["erro"], cur["var"])
+
+    def json_inference():
+        return app.inference_json.encode(app.iso_ts(), 22.0 + cur["erro"], 50.0, cur["erro"], cur["var"],
+                                         cur["state"], app.INFERENCE_INCLUDE_ALL_RULES)
+
+    def prepare_plot(i):
+        point(i)
+        cur["debug"] = app.inference_active(cur["erro"], cur["var"])
+
+    def plot_inference():
+        rule_infos, agg_mu, defuzz_val = cur["debug"]
+        return app.plot_inference(cur["erro"], cur["var"], app.pcrac_universe, app.antecedents,
+                                  app.consequents_terms, rule_infos, agg_mu, defuzz_val)
+
+    client = NullClient()
+    alert_engine = app.build_alert_engine()
+    sim = {}
+
+    def prepare_tick(i):
+        point(i)
+        app.Qest = 40.0 + 30.0 * np.sin(i * 0.05)
+        if "simulacao" not in sim:
+            sim["simulacao"] = app.simulacao
+
+    def tick():
+        app.control_step(client, time.monotonic(), alert_engine, simulacao=sim["simulacao"])
+
+    def prepare_tick_surface(i):
+        point(i)
+        app.T_n = app.T_SETPOINT + cur["erro"]
+        app.Qest = 40.0 + 30.0 * np.sin(i * 0.05)
+        if "superficie" not in sim:
+            sim["superficie"], _ = app.build_control_surface(validate=False)
+
+    def tick_surface():
+        app.control_step(client, time.monotonic(), alert_engine, superficie=sim["superficie"])
+
+    return {
+        "simulacao_compute": (point, simulacao_compute),
+        "inference_debug": (point, inference_debug),
+        "inference_active": (point, inference_active),
+        "antecedents": (point, antecedents),
+        "json_inference": (prepare_inference, json_inference),
+        "plot_inference": (prepare_plot, plot_inference),
+        "gerar_graficos_base64": (point, app.gerar_graficos_base64),
+        "tick": (prepare_tick, tick),
+        "tick_surface": (prepare_tick_surface, tick_surface),
+    }
+
+
+def summarize_times(times_s):
+    """Percentis, média e máximo (ms) de uma lista de durações em segundos."""
+    ms = np.asarray(times_s, dtype=float) * 1e3
+    row = {"calls": int(ms.size), "mean_ms": float(ms.mean()), "min_ms": float(ms.min()),
+           "max_ms": float(ms.max())}
+    for p, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+        row[f"p{p}_ms"] = float(v)
+    return row
+
+
+def measure_stage(prepare, call, iterations, warmup=3, alloc_iterations=None):
+    """Tempo por chamada e alocações de uma etapa.
+
+    O tempo exclui ``prepare``. As alocações vêm de uma segunda passagem
+    com ``tracemalloc``: pico de bytes alocados durante a chamada (média),
+    bytes e blocos retidos depois dela e coletas do GC por chamada.
+    """
+    for i in range(warmup):
+        prepare(i)
+        call()
+    times = np.empty(iterations)
+    gc_before = sum(s["collections"] for s in gc.get_stats())
+    for i in range(iterations):
+        prepare(i)
+        t0 = time.perf_counter()
+        call()
+        times[i] = time.perf_counter() - t0
+    gc_runs = sum(s["collections"] for s in gc.get_stats()) - gc_before
+    row = summarize_times(times)
+    row["gc_per_call"] = gc_runs / iterations
+
+    alloc_iterations = min(iterations, 50) if alloc_iterations is None else alloc_iterations
+    peaks = np.empty(alloc_iterations)
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        blocks0 = sys.getallocatedblocks()
+        net0 = tracemalloc.get_traced_memory()[0]
+        for i in range(alloc_iterations):
+            prepare(i)
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            call()
+            peaks[i] = tracemalloc.get_traced_memory()[1] - base
+        net = tracemalloc.get_traced_memory()[0] - net0
+        blocks = sys.getallocatedblocks() - blocks0
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    row["alloc_peak_kb"] = float(peaks.mean() / 1024.0)
+    row["alloc_net_bytes_per_call"] = net / alloc_iterations
+    row["alloc_blocks_per_call"] = blocks / alloc_iterations
+    return row
+
+
+def run_benchmarks(stages=None, iterations=None, app=None):
+    """Mede as etapas pedidas e devolve o relatório (dicionário serializável)."""
+    if app is None:
+        import fuzzy_miso as app
+    stages = list(STAGES if stages is None else stages)
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"etapas desconhecidas: {sorted(unknown)}")
+    iterations = dict(DEFAULT_ITERATIONS, **(iterations or {}))
+    functions = stage_functions(app)
+
+    # O tick altera o estado do controlador: restaura ao final
+    saved = {name: getattr(app, name) for name in ("T_n", "erro_anterior", "PCRAC_val", "Text", "Qest")}
+    results = {}
+    try:
+        for name in stages:
+            prepare, call = functions[name]
+            results[name] = measure_stage(prepare, call, iterations[name])
+    finally:
+        for name, value in saved.items():
+            setattr(app, name, value)
+
+    return {
+        "version": BENCHMARK_FORMAT_VERSION,
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "mf_hash": app.mf_definitions_hash()[:16],
+        },
+        "stages": results,
+    }
+
+
+def compare(current, baseline, tolerance=0.2, metric="p50_ms"):
+    """Compara duas execuções etapa a etapa pela métrica ``metric``.
+
+    Retorna uma lista de dicionários (etapa, base, atual, razão, regressão);
+    uma etapa regride quando ``atual > base * (1 + tolerance)``. Etapas que
+    só existem num dos relatórios são ignoradas.
+    """
+    rows = []
+    for name, cur in current["stages"].items():
+        base = baseline["stages"].get(name)
+        if base is None:
+            continue
+        ratio = cur[metric] / base[metric] if base[metric] > 0 else float("inf")
+        rows.append({"stage": name, "baseline": base[metric], "current": cur[metric],
+                     "ratio": ratio, "regression": ratio > 1.0 + tolerance})
+    return rows
+
+
+def format_report(report):
+    lines = [f"{'etapa':<22} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'máx ms':>9} {'pico KB':>9} {'blocos':>8}"]
+    for name, row in report["stages"].items():
+        lines.append(f"{name:<22} {row['p50_ms']:>9.3f} {row['p90_ms']:>9.3f} {row['p99_ms']:>9.3f} "
+                     f"{row['max_ms']:>9.3f} {row['alloc_peak_kb']:>9.1f} {row['alloc_blocks_per_call']:>8.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, help="etapas a medir (padrão: todas)")
+    parser.add_argument("--iterations", type=int, help="chamadas por etapa (substitui os padrões)")
+    parser.add_argument("--out", help="salva o relatório em JSON")
+    parser.add_argument("--baseline", help="relatório JSON salvo para comparação")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="regressão tolerada (0.2 = 20%%)")
+    parser.add_argument("--metric", default="p50_ms", help="métrica comparada (padrão: p50_ms)")
+    args = parser.parse_args(argv)
+
+    iterations = None
+    if args.iterations:
+        iterations = {name: args.iterations for name in STAGES}
+    report = run_benchmarks(args.stages, iterations)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance, args.metric)
+        regressions = [r for r in rows if r["regression"]]
+        for r in rows:
+            flag = "REGRESSÃO" if r["regression"] else "ok"
+            print(f"{r['stage']:<22} {r['baseline']:>9.3f} -> {r['current']:>9.3f} ({r['ratio']:.2f}x) {flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""Ensaio de latência e de longa duração do controlador, sem rede.
+
+O controlador roda no runtime asyncio (`fuzzy_miso.run_async`) contra um
+`assincrono.MemoryBroker` no mesmo processo. Um injetor publica cargas
+térmicas em ``entrada/cargaTermica`` (ou ``entrada/cargaTermica/<zona>``,
+no modo multi-zona) a uma taxa fixa. Cada entrada passa pelo caminho real:
+``on_message``, o tick e a publicação em ``datacenter/fuzzy/control``.
+
+A latência entrada-atuação de uma mensagem vai da sua publicação até a
+primeira atuação da zona publicada depois que o controlador a aplicou. O
+cliente do controlador marca a mensagem como aplicada quando o runtime
+pede a próxima, ou seja, depois de ``on_message``. Consumidores lentos
+(assinantes de ``datacenter/#`` que levam ``consumer_delay`` por mensagem)
+mostram o que acontece quando quem lê as saídas não acompanha o ritmo.
+
+O relatório traz p50/p99/máximo da latência, bytes e mensagens por segundo
+no broker, o RSS do processo e uma linha do tempo com amostras a cada
+``sample_every`` segundos, para acompanhar a memória numa execução longa.
+
+Uso::
+
+    python ensaio.py --duration 10 --rate 200 --zones 50
+    python ensaio.py --duration 3600 --rate 20 --slow-consumers 2 --consumer-delay 0.05 --out soak.json
+"""
+import argparse
+import array
+import asyncio
+import json
+import os
+import sys
+from collections import deque
+import numpy as np
+from assincrono import MemoryBroker, MemoryClient
+
+PERCENTILES = (50, 99)
+
+
+def rss_bytes():
+    """RSS atual do processo (Linux, ``/proc/self/statm``); None se indisponível."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class LatencyProbe:
+    """Casa cada entrada com a primeira atuação da sua zona depois de aplicada.
+
+    ``sent`` registra a publicação, ``applied`` a aplicação pelo controlador
+    (na ordem de chegada do tópico) e ``actuated`` uma atuação da zona.
+    """
+
+    def __init__(self, n_zones):
+        self.sent_at = {}
+        self.awaiting = [[] for _ in range(n_zones)]
+        self.latencies = array.array("d")
+        self.sent_count = 0
+        self.applied_count = 0
+        self.actuations = 0
+
+    def sent(self, topic, zone, t):
+        self.sent_at.setdefault(topic, deque()).append((zone, t))
+        self.sent_count += 1
+
+    def applied(self, topic):
+        pending = self.sent_at.get(topic)
+        if pending:
+            zone, t = pending.popleft()
+            self.awaiting[zone].append(t)
+            self.applied_count += 1
+
+    def actuated(self, zone, t):
+        self.actuations += 1
+        waiting = self.awaiting[zone]
+        for t0 in waiting:
+            self.latencies.append(t - t0)
+        waiting.clear()
+
+    def pending(self):
+        return self.sent_count - len(self.latencies)
+
+
+class _ControllerClient(MemoryClient):
+    """Cliente do controlador: avisa a sonda quando a mensagem anterior foi aplicada."""
+
+    async def messages(self):
+        while True:
+            msg = await self._queue.get()
+            yield msg
+            # O runtime só pede a próxima depois de ``on_message`` desta
+            self.broker.probe.applied(msg.topic)
+
+
+class SoakBroker(MemoryBroker):
+    """`MemoryBroker` sem log que avisa a sonda a cada atuação publicada.
+
+    ``actuation`` é ``{tópico: zona}``; a zona None vale para todas (pacote
+    por tick em TOPIC_STEP).
+    """
+
+    def __init__(self, probe, actuation):
+        super().__init__(keep_log=False)
+        self.probe = probe
+        self.actuation = actuation
+        self.n_zones = len(probe.awaiting)
+
+    def controller_client(self):
+        client = _ControllerClient(self)
+        self._clients.append(client)
+        return client
+
+    def deliver(self, topic, payload, retain=False):
+        super().deliver(topic, payload, retain)
+        if topic in self.actuation:
+            zone, now = self.actuation[topic], self.clock()
+            for z in (range(self.n_zones) if zone is None else (zone,)):
+                self.probe.actuated(z, now)
+
+
+async def _inject(broker, probe, topics, rate, duration, seed):
+    """Publica cargas térmicas (passeio aleatório por zona) a ``rate`` mensagens/s."""
+    client = broker.client()
+    rng = np.random.default_rng(seed)
+    load = np.full(len(topics), 40.0)
+    start = broker.clock()
+    k = 0
+    while True:
+        elapsed = broker.clock() - start
+        if elapsed >= duration:
+            return k
+        # Atrasado (tick longo ou enchente), publica de uma vez o que venceu
+        due = min(int(elapsed * rate) + 1, int(duration * rate))
+        while k < due:
+            zone = k % len(topics)
+            load[zone] = min(max(load[zone] + rng.normal(0.0, 2.0), 10.0), 95.0)
+            probe.sent(topics[zone], zone, broker.clock())
+            client.publish(topics[zone], f"{load[zone]:.2f}")
+            k += 1
+        await asyncio.sleep(max(0.0, start + k / rate - broker.clock()))
+
+
+async def _consume(client, delay, counts, i):
+    async for _ in client.messages():
+        counts[i] += 1
+        if delay:
+            await asyncio.sleep(delay)
+
+
+async def _sample(broker, probe, consumers, every, timeline):
+    start = broker.clock()
+    prev_bytes, prev_t = broker.bytes, start
+    while True:
+        await asyncio.sleep(every)
+        now = broker.clock()
+        rss = rss_bytes()
+        timeline.append({
+            "t": round(now - start, 3),
+            "rss_mb": None if rss is None else rss / 2**20,
+            "bytes_per_sec": (broker.bytes - prev_bytes) / (now - prev_t),
+            "matched": len(probe.latencies),
+            "consumer_queue": max((c.queued() for c in consumers), default=0),
+        })
+        prev_bytes, prev_t = broker.bytes, now
+
+
+def _latency_summary(latencies):
+    ms = np.frombuffer(latencies, dtype=float) * 1e3
+    if not ms.size:
+        return {"count": 0}
+    row = {"count": int(ms.size), "mean_ms": float(ms.mean()), "max_ms": float(ms.max())}
+    for p, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+        row[f"p{p}_ms"] = float(v)
+    return row
+
+
+def run_soak(duration=10.0, rate=50.0, zones=0, trigger=None, loop_interval=None, surface=False,
+             slow_consumers=0, consumer_delay=0.0, sample_every=1.0, settle=None, seed=0, app=None):
+    """Roda o controlador por ``duration`` segundos sob ``rate`` entradas/s e devolve o relatório.
+
+    ``zones = 0`` usa o controle de sala única; ``zones > 0`` cria um
+    controlador com essa quantidade de zonas e distribui as entradas entre
+    elas. ``trigger`` e ``loop_interval`` substituem CONTROL_TRIGGER e
+    loop_interval. Depois da injeção, o controlador roda mais ``settle``
+    segundos (padrão: dois períodos) para atuar sobre as últimas entradas.
+    O estado do módulo é restaurado ao final.
+    """
+    if app is None:
+        import fuzzy_miso as app
+    if rate <= 0 or duration <= 0:
+        raise ValueError("rate e duration devem ser positivos")
+    saved = {name: getattr(app, name) for name in ("T_n", "erro_anterior", "PCRAC_val", "Text", "Qest",
+                                                   "sensors", "inputs_version", "zone_controller",
+                                                   "loop_interval")}
+    if loop_interval is not None:
+        app.loop_interval = loop_interval
+    if settle is None:
+        settle = 2.0 * app.loop_interval + 0.05
+    superficie = app.build_control_surface(validate=False)[0] if surface else None
+    app.sensors = app.build_sensors()
+
+    if zones:
+        controller = app.zone_controller = app.build_zone_controller(zones, superficie)
+        names = controller.zones
+        topics = [app.TOPIC_ZONE_INPUT_QEST + zone for zone in names]
+        actuation = {app.TOPIC_ZONE_CONTROL.format(zone=zone): i for i, zone in enumerate(names)}
+    else:
+        controller = app.zone_controller = None
+        topics = [app.TOPIC_INPUT_QEST]
+        actuation = {app.TOPIC_CONTROL: 0}
+    if app.PUBLISH_STEP_MODE == "bundle":
+        actuation = {app.TOPIC_STEP: None}
+
+    probe = LatencyProbe(len(topics))
+    timeline = []
+
+    async def principal():
+        broker = SoakBroker(probe, actuation)
+        consumers = [broker.client() for _ in range(slow_consumers)]
+        counts = [0] * slow_consumers
+        for c in consumers:
+            c.subscribe("datacenter/#")
+        stop = asyncio.Event()
+        controller_task = asyncio.create_task(
+            app.run_async(broker.controller_client(), trigger=trigger, stop=stop, superficie=superficie))
+        helpers = [asyncio.create_task(_consume(c, consumer_delay, counts, i)) for i, c in enumerate(consumers)]
+        helpers.append(asyncio.create_task(_sample(broker, probe, consumers, sample_every, timeline)))
+        await asyncio.sleep(0)
+        rss_start = rss_bytes()
+        t0 = broker.clock()
+        try:
+            await _inject(broker, probe, topics, rate, duration, seed)
+            injected = broker.clock() - t0
+            await asyncio.sleep(settle)
+        finally:
+            stop.set()
+            runtime = await controller_task
+            for task in helpers:
+                task.cancel()
+            await asyncio.gather(*helpers, return_exceptions=True)
+        elapsed = broker.clock() - t0
+        return broker, runtime, consumers, counts, rss_start, injected, elapsed
+
+    try:
+        broker, runtime, consumers, counts, rss_start, injected, elapsed = asyncio.run(principal())
+    finally:
+        if controller is not None and hasattr(controller, "close"):
+            controller.close()
+        for name, value in saved.items():
+            setattr(app, name, value)
+
+    rss_end = rss_bytes()
+    rss_samples = [row["rss_mb"] for row in timeline if row["rss_mb"] is not None]
+    return {
+        "config": {"duration": duration, "rate": rate, "zones": zones, "trigger": runtime.trigger,
+                   "loop_interval": loop_interval if loop_interval is not None else saved["loop_interval"],
+                   "surface": surface, "slow_consumers": slow_consumers, "consumer_delay": consumer_delay},
+        "inputs": {"sent": probe.sent_count, "applied": probe.applied_count,
+                   "unmatched": probe.pending(), "rate": probe.sent_count / injected},
+        "latency": _latency_summary(probe.latencies),
+        "actuations": probe.actuations,
+        "broker": {"messages": broker.messages, "bytes": broker.bytes,
+                   "messages_per_sec": broker.messages / elapsed, "bytes_per_sec": broker.bytes / elapsed},
+        "rss_mb": {"start": None if rss_start is None else rss_start / 2**20,
+                   "end": None if rss_end is None else rss_end / 2**20,
+                   "max": max(rss_samples) if rss_samples else None},
+        "consumers": {"received": counts, "queued": [c.queued() for c in consumers],
+                      "max_queue": max((row["consumer_queue"] for row in timeline), default=0)},
+        "runtime": runtime.stats(),
+        "elapsed_sec": elapsed,
+        "timeline": timeline,
+    }
+
+
+def format_report(report):
+    lat, broker, rss, inputs = report["latency"], report["broker"], report["rss_mb"], report["inputs"]
+    lines = [f"entradas: {inputs['sent']} ({inputs['rate']:.1f}/s), aplicadas {inputs['applied']}, "
+             f"sem atuação {inputs['unmatched']}; cálculos {report['runtime']['computes']}"]
+    if lat["count"]:
+        lines.append(f"latência entrada-atuação: p50 {lat['p50_ms']:.2f} ms, p99 {lat['p99_ms']:.2f} ms, "
+                     f"máx {lat['max_ms']:.2f} ms")
+    lines.append(f"broker: {broker['messages_per_sec']:.0f} msg/s, {broker['bytes_per_sec'] / 1024:.1f} KB/s")
+    if rss["start"] is not None:
+        lines.append(f"RSS: {rss['start']:.1f} -> {rss['end']:.1f} MB (máx {rss['max'] or rss['end']:.1f} MB)")
+    if report["consumers"]["received"]:
+        lines.append(f"consumidores lentos: recebidas {report['consumers']['received']}, "
+                     f"fila máx {report['consumers']['max_queue']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos de injeção")
+    parser.add_argument("--rate", type=float, default=50.0, help="entradas por segundo (todas as zonas)")
+    parser.add_argument("--zones", type=int, default=0, help="quantidade de zonas (0: sala única)")
+    parser.add_argument("--trigger", choices=("periodic", "on-change"), help="padrão: CONTROL_TRIGGER")
+    parser.add_argument("--loop-interval", type=float, help="período do tick (s)")
+    parser.add_argument("--surface", action="store_true", help="usa a superfície pré-calculada")
+    parser.add_argument("--slow-consumers", type=int, default=0, help="assinantes de datacenter/#")
+    parser.add_argument("--consumer-delay", type=float, default=0.0, help="segundos por mensagem consumida")
+    parser.add_argument("--sample-every", type=float, default=1.0, help="intervalo da linha do tempo (s)")
+    parser.add_argument("--out", help="salva o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    report = run_soak(args.duration, args.rate, args.zones, args.trigger, args.loop_interval, args.surface,
+                      args.slow_consumers, args.consumer_delay, args.sample_every)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
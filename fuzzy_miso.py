@@ -1,13 +1,29 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
 import numpy as np
 import skfuzzy as fuzz
-from skfuzzy import control as ctrl
-import paho.mqtt.client as mqtt
-import time
 import json
-import matplotlib.pyplot as plt
 import io
+import os
 import base64
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timezone
+import sistema_fuzzy
+from sistema_fuzzy import (errotemp_universe, varerrotemp_universe, pcrac_universe, antecedents,
+                           consequents_terms, erro_labels, delta_labels, matriz_saida, motor_lote,
+                           motor_esparso, control_simulation, mf_definitions_hash)
+from superficie import ControlSurface
+from planta import plant_step
+from codificacao import InferenceEncoder, InferenceJson, inference_metadata
+from agendador import TickScheduler
+from alertas import AlertEngine, AlertGate, default_alert_rules
+from publicacao import Publisher, TopicPolicy, LATEST
+from metricas import Metrics, serve_http
+from base_regras import RuleBaseSwap, RuleFileWatcher, compile_rule_base, load_config
+from ingestao import SensorIngest, decode_packed
+from zonas import (ZoneController, TOPIC_ZONE_INPUT_TEXT, TOPIC_ZONE_INPUT_QEST, TOPIC_ZONE_RESET,
+                   TOPIC_ZONE_CONTROL, TOPIC_ZONE_TEMP, TOPIC_ZONE_ALERT)
 
 MQTT_BROKER = "test.mosquitto.org"
 MQTT_PORT = 1883
@@ -18,60 +34,70 @@ TOPIC_ALERT = "datacenter/fuzzy/alert"
 TOPIC_TEMP = "datacenter/fuzzy/temp"
 TOPIC_INPUT_TEXT = "entrada/temp/externa"
 TOPIC_INPUT_QEST = "entrada/cargaTermica"
+TOPIC_INPUT_TEXT_BIN = "entrada/temp/externa/bin"
+TOPIC_INPUT_QEST_BIN = "entrada/cargaTermica/bin"
 TOPIC_IMG_RULES = "datacenter/fuzzy/img/rules"
 TOPIC_INFERENCE = "datacenter/fuzzy/inference"
 TOPIC_INFERENCE_IMG = "datacenter/fuzzy/inference/img"
 TOPIC_RESET = "datacenter/fuzzy/reset"  
+TOPIC_INFERENCE_META = "datacenter/fuzzy/inference/meta"
+TOPIC_INFERENCE_BIN = "datacenter/fuzzy/inference/bin"
+TOPIC_STEP = "datacenter/fuzzy/step"
+TOPIC_METRICS = "datacenter/fuzzy/metrics"
+TOPIC_RULES = "datacenter/fuzzy/rules"
+TOPIC_RULES_STATUS = "datacenter/fuzzy/rules/status"
 
 Text = 35.0
 Qest = 40.0
+# Entradas recebidas pela rede (ingestao.py). A thread do MQTT escreve só no
+# snapshot de `sensors`; o loop copia para Text e Qest no início de cada tick.
+# Amostras com timestamp mais velho que INPUT_MAX_AGE_SEC são descartadas, e
+# as com timestamp mais de INPUT_MAX_SKEW_SEC à frente do relógio, recusadas.
+INPUT_MAX_AGE_SEC = 10.0
+INPUT_MAX_SKEW_SEC = 5.0
+inputs_version = 0
+
+# Modo multi-zona: lista de identificadores de zona (ex.: ["sala1", "sala2"]).
+# Vazia mantém o controle de sala única nos tópicos sem sufixo.
+ZONES = []
+zone_controller = None
+# Com ZONE_WORKERS > 0, o passo das zonas é dividido entre esse número de
+# processos (processos.py). Este processo fica só com o MQTT e os alertas.
+ZONE_WORKERS = 0
+
+def __getattr__(name):
+    # Objetos do skfuzzy.control (errotemp, pcrac, simulacao, ...) são criados
+    # sob demanda em sistema_fuzzy
+    if name in sistema_fuzzy.LAZY_NAMES:
+        return getattr(sistema_fuzzy, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def compute_pcrac_batch(erro, var_erro):
+    """PCRAC exato para arrays de erro e variação do erro.
+
+    Usa o motor vetorizado. Com DEFUZZ_METHOD = "skfuzzy" o resultado é
+    idêntico ao de simulacao.compute(); com "analytic" é o centróide exato.
+    """
+    return motor_lote.evaluate(erro, var_erro, centroid_method=DEFUZZ_METHOD).output
 
-errotemp = ctrl.Antecedent(np.arange(-16, 16.1, 1), 'errotemp')
-varerrotemp = ctrl.Antecedent(np.arange(-2, 2.1, 0.1), 'varerrotemp')
-pcrac = ctrl.Consequent(np.arange(0, 101, 1), 'pcrac')
-
-errotemp['MN'] = fuzz.trapmf(errotemp.universe, [-16, -16, -12, -6])
-errotemp['PN'] = fuzz.trimf(errotemp.universe, [-12, -6, 0])
-errotemp['ZE'] = fuzz.trimf(errotemp.universe, [-6, 0, 6])
-errotemp['PP'] = fuzz.trimf(errotemp.universe, [0, 6, 12])
-errotemp['MP'] = fuzz.trapmf(errotemp.universe, [6, 12, 16, 16])
-
-varerrotemp['MN'] = fuzz.trapmf(varerrotemp.universe, [-2, -2, -0.8, -0.4])
-varerrotemp['PN'] = fuzz.trimf(varerrotemp.universe, [-0.8, -0.4, 0])
-varerrotemp['ZE'] = fuzz.trimf(varerrotemp.universe, [-0.4, 0, 0.4])
-varerrotemp['PP'] = fuzz.trimf(varerrotemp.universe, [0, 0.4, 0.8])
-varerrotemp['MP'] = fuzz.trapmf(varerrotemp.universe, [0.4, 0.8, 2.1, 2.1])
-
-pcrac['MB'] = fuzz.trimf(pcrac.universe, [0, 0, 25])
-pcrac['B']  = fuzz.trimf(pcrac.universe, [0, 25, 50])
-pcrac['M']  = fuzz.trimf(pcrac.universe, [25, 50, 75])
-pcrac['A']  = fuzz.trimf(pcrac.universe, [50, 75, 100])
-pcrac['MA'] = fuzz.trimf(pcrac.universe, [75, 100, 100])
-
-rules = []
-erro_labels = ['MN', 'PN', 'ZE', 'PP', 'MP']
-delta_labels = ['MN', 'PN', 'ZE', 'PP', 'MP']
-
-matriz_saida = [
-    ['MB',  'MB',  'B',  'M',  'A' ],
-    ['MB', 'B',  'M',  'A',  'MA' ],
-    ['MB', 'B',  'M',  'A',  'MA' ],
-    ['MB', 'B', 'M',  'A',  'MA' ],
-    ['B', 'M', 'A', 'MA',  'MA'  ]
-]
-
-for i, d_label in enumerate(delta_labels):
-    for j, e_label in enumerate(erro_labels):
-        rules.append(ctrl.Rule(varerrotemp[d_label] & errotemp[e_label],
-                               pcrac[matriz_saida[i][j]]))
-
-sistema_controle = ctrl.ControlSystem(rules)
-simulacao = ctrl.ControlSystemSimulation(sistema_controle)
+def build_control_surface(erro_step=None, var_step=None, validate=None):
+    """Pré-calcula a superfície pcrac(erro, var_erro) e, opcionalmente, mede o erro."""
+    erro_step = SURFACE_ERRO_STEP if erro_step is None else erro_step
+    var_step = SURFACE_VAR_STEP if var_step is None else var_step
+    validate = SURFACE_VALIDATE if validate is None else validate
+
+    superficie = ControlSurface.build(
+        compute_pcrac_batch,
+        (errotemp_universe.min(), errotemp_universe.max()),
+        (varerrotemp_universe.min(), varerrotemp_universe.max()),
+        erro_step, var_step)
+    report = superficie.max_error(compute_pcrac_batch) if validate else None
+    return superficie, report
 
 def iso_ts():
     return datetime.now(timezone.utc).isoformat()
 
-def publish_alert(client, alert_type, message, data=None, severity="média"):
+def publish_alert(client, alert_type, message, data=None, severity="média", topic=TOPIC_ALERT):
     payload = {
         "timestamp": iso_ts(),
         "type": alert_type,
@@ -79,48 +105,96 @@ def publish_alert(client, alert_type, message, data=None, severity="média"):
         "data": data or {},
         "severity": severity
     }
-    client.publish(TOPIC_ALERT, json.dumps(payload))
+    client.publish(topic, json.dumps(payload))
+
+def emit_alert(client, alert_type, message, data=None, severity="média", topic=TOPIC_ALERT, now=None, rule=None):
+    """publish_alert passando pelo limite de taxa (`alert_gate`), por regra ou por tipo.
+
+    Retorna True se o alerta foi publicado.
+    """
+    data = alert_gate.admit(topic, alert_type, data, now, key=rule)
+    if data is None:
+        metrics.inc("alerts_dropped_total")
+        return False
+    metrics.inc("alerts_total")
+    publish_alert(client, alert_type, message, data, severity, topic)
+    return True
+
+def build_sensors():
+    """Ingestão de Text e Qest (texto, lote JSON ou lote binário), a partir dos valores atuais."""
+    return (SensorIngest({"Text": Text, "Qest": Qest}, max_age=INPUT_MAX_AGE_SEC,
+                         max_skew=INPUT_MAX_SKEW_SEC)
+            .route(TOPIC_INPUT_TEXT, "Text")
+            .route(TOPIC_INPUT_QEST, "Qest")
+            .route(TOPIC_INPUT_TEXT_BIN, "Text", decode_packed)
+            .route(TOPIC_INPUT_QEST_BIN, "Qest", decode_packed))
+
+sensors = build_sensors()
+
+def read_inputs():
+    """Copia para Text e Qest o snapshot das entradas, se mudou desde o último tick."""
+    global Text, Qest, inputs_version
+    reading = sensors.read()
+    if reading.version != inputs_version:
+        Text, Qest = reading.values
+        inputs_version = reading.version
 
 def on_connect(client, userdata, flags, rc):
-    client.subscribe(TOPIC_INPUT_TEXT)
-    client.subscribe(TOPIC_INPUT_QEST)
-    client.subscribe(TOPIC_RESET)
+    for topic in input_topics():
+        client.subscribe(topic)
     
-    publish_alert(client,
-                  alert_type="comunicação",
-                  message="Conectado ao broker MQTT",
-                  data={"broker": MQTT_BROKER, "port": MQTT_PORT},
-                  severity="baixa")
+    emit_alert(client,
+               alert_type="comunicação",
+               message="Conectado ao broker MQTT",
+               data={"broker": MQTT_BROKER, "port": MQTT_PORT},
+               severity="baixa")
 
 def on_disconnect(client, userdata, rc):
-    publish_alert(client,
-                  alert_type="comunicação",
-                  message="Desconexão do broker MQTT",
-                  data={"reason_code": rc},
-                  severity="crítica")
+    emit_alert(client,
+               alert_type="comunicação",
+               message="Desconexão do broker MQTT",
+               data={"reason_code": rc},
+               severity="crítica")
 
 def on_message(client, userdata, msg):
-    global Text, Qest
-    
-    if msg.topic == TOPIC_RESET:
-        Text = 25.0
-        Qest = 40.0
-        print(f"RESET RECEBIDO: Text={Text}, Qest={Qest}")
-        publish_alert(client, 
-                      alert_type="operacional", 
-                      message="Valores resetados manualmente", 
-                      data={"Text": Text, "Qest": Qest}, 
-                      severity="baixa")
-        return 
-
+    t0 = time.perf_counter()
     try:
-        valor = float(msg.payload.decode())
-        if msg.topic == TOPIC_INPUT_TEXT:
-            Text = valor
-        elif msg.topic == TOPIC_INPUT_QEST:
-            Qest = valor
-    except:
-        pass
+        apply_input(client, msg)
+    finally:
+        metrics.observe("on_message_seconds", time.perf_counter() - t0)
+        metrics.inc("messages_in_total")
+
+def apply_input(client, msg):
+    """Aplica uma mensagem de entrada (Text, Qest, reset, regras ou tópico de zona).
+
+    Roda na thread de rede: Text e Qest vão para o snapshot de `sensors`,
+    e os comandos são despachados pela tabela `command_handlers`.
+    """
+    if zone_controller is not None and zone_controller.handle_message(msg.topic, msg.payload):
+        return
+    if sensors.handle(msg.topic, msg.payload):
+        return
+    handler = command_handlers.get(msg.topic)
+    if handler is not None:
+        handler(client, msg.payload)
+
+def handle_reset(client, payload):
+    sensors.set(Text=25.0, Qest=40.0)
+    if zone_controller is not None:
+        zone_controller.reset()
+    print("RESET RECEBIDO: Text=25.0, Qest=40.0")
+    emit_alert(client, 
+               alert_type="operacional", 
+               message="Valores resetados manualmente", 
+               data={"Text": 25.0, "Qest": 40.0}, 
+               severity="baixa")
+
+def input_topics():
+    """Tópicos assinados: entradas de `sensors`, comandos e, no modo multi-zona, as zonas."""
+    topics = list(sensors.handlers) + list(command_handlers)
+    if zone_controller is not None:
+        topics += [TOPIC_ZONE_INPUT_TEXT + "+", TOPIC_ZONE_INPUT_QEST + "+", TOPIC_ZONE_RESET + "+"]
+    return topics
 
 
 #########################################################################
@@ -160,26 +234,50 @@ def graceful_shutdown(client):
         pass
 
 
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_disconnect = on_disconnect
-client.on_message = on_message
+# Cliente MQTT e imagem das regras só existem depois de start()
+client = None
+# Cache em disco da imagem das regras, por hash das funções de pertinência
+RULES_IMG_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+RULES_IMG_VERSION = 1  # incrementar quando o desenho de gerar_graficos_base64 mudar
+# Base de regras por arquivo (base_regras.py). Com RULES_FILE, a configuração
+# é aplicada no primeiro tick e recompilada quando o arquivo muda (verificado
+# a cada RULES_WATCH_SEC). Uma configuração JSON publicada em TOPIC_RULES tem o
+# mesmo efeito. A forma compilada fica em RULES_CACHE_DIR, nomeada pelo hash.
+RULES_FILE = None
+RULES_WATCH_SEC = 1.0
+RULES_CACHE_DIR = RULES_IMG_CACHE_DIR
+# Base compilada em uso (None: a de sistema_fuzzy) e a troca pendente
+rule_base = None
+rule_swap = RuleBaseSwap()
+# Tempos da partida a frio (ms), preenchidos por startup_phase()
+startup_times = {}
 
-client.connect(MQTT_BROKER, MQTT_PORT, 60)
-client.loop_start()
+@contextmanager
+def startup_phase(name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_times[name] = round((time.perf_counter() - t0) * 1e3, 1)
 
-def gerar_graficos_base64():
+def rule_definitions():
+    """``{nome: (universo, termos)}`` da base de regras em uso."""
+    return dict(antecedents, pcrac=(pcrac_universe, consequents_terms))
+
+def gerar_graficos_base64(definitions=None):
+    import matplotlib.pyplot as plt
+    definitions = rule_definitions() if definitions is None else definitions
     fig, (ax0, ax1, ax2) = plt.subplots(nrows=3, figsize=(6, 12))
-    for label in errotemp.terms:
-        ax0.plot(errotemp.universe, errotemp[label].mf, label=label)
+    for label, mf in definitions['errotemp'][1].items():
+        ax0.plot(definitions['errotemp'][0], mf, label=label)
     ax0.axvline(0, color='k', linestyle='--', linewidth=0.8)
     ax0.legend()
-    for label in varerrotemp.terms:
-        ax1.plot(varerrotemp.universe, varerrotemp[label].mf, label=label)
+    for label, mf in definitions['varerrotemp'][1].items():
+        ax1.plot(definitions['varerrotemp'][0], mf, label=label)
     ax1.axvline(0, color='k', linestyle='--', linewidth=0.8)
     ax1.legend()
-    for label in pcrac.terms:
-        ax2.plot(pcrac.universe, pcrac[label].mf, label=label)
+    for label, mf in definitions['pcrac'][1].items():
+        ax2.plot(definitions['pcrac'][0], mf, label=label)
     ax2.legend()
     buf = io.BytesIO()
     plt.tight_layout()
@@ -189,27 +287,404 @@ def gerar_graficos_base64():
     plt.close(fig)
     return "data:image/png;base64," + img
 
-img_data = gerar_graficos_base64()
-client.publish(TOPIC_IMG_RULES, img_data, retain=True)
+def rules_image(cache_dir=None, definitions=None):
+    """Imagem das funções de pertinência (data URI) e se veio do cache.
+
+    O arquivo em ``cache_dir`` é nomeado pelo hash das funções de
+    pertinência, então qualquer mudança nelas gera uma nova renderização.
+    ``definitions`` é o padrão de `rule_definitions` (a base em uso).
+    """
+    cache_dir = RULES_IMG_CACHE_DIR if cache_dir is None else cache_dir
+    definitions = rule_definitions() if definitions is None else definitions
+    key = f"{RULES_IMG_VERSION}-{mf_definitions_hash(definitions)[:16]}"
+    path = os.path.join(cache_dir, f"rules-{key}.b64")
+    try:
+        with open(path, encoding="ascii") as f:
+            return f.read(), True
+    except OSError:
+        pass
+    img_data = gerar_graficos_base64(definitions)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="ascii") as f:
+            f.write(img_data)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # sem cache a imagem continua válida
+    return img_data, False
+
+def compile_rules(config):
+    """`base_regras.compile_rule_base` com a superfície e a defuzzificação deste módulo."""
+    return compile_rule_base(config, RULES_CACHE_DIR, (SURFACE_ERRO_STEP, SURFACE_VAR_STEP), DEFUZZ_METHOD)
+
+def publish_rules_status(client, data, retain=False):
+    client.publish(TOPIC_RULES_STATUS, json.dumps(dict(data, timestamp=iso_ts())), retain=retain)
+
+def request_rules(client, payload):
+    """Compila em segundo plano a configuração JSON recebida em TOPIC_RULES.
+
+    A base compilada é aplicada pelo loop no tick seguinte; uma configuração
+    inválida é informada em TOPIC_RULES_STATUS e a base em uso continua.
+    """
+    def work():
+        try:
+            compiled = compile_rules(json.loads(payload))
+        except (ValueError, TypeError) as exc:
+            publish_rules_status(client, {"error": str(exc)})
+            emit_alert(client, "operacional", "Base de regras rejeitada", {"error": str(exc)}, severity="baixa")
+            return
+        rule_swap.offer(compiled)
+    threading.Thread(target=work, name="rules-compile", daemon=True).start()
+
+# Tópicos de comando -> handler(client, payload), chamado na thread de rede
+command_handlers = {TOPIC_RESET: handle_reset, TOPIC_RULES: request_rules}
+
+def refresh_rules_image(client, definitions):
+    """Renderiza (ou lê do cache) e publica a imagem das regras em uma thread."""
+    def work():
+        img_data, _ = rules_image(definitions=definitions)
+        client.publish(TOPIC_IMG_RULES, img_data, retain=True)
+    thread = threading.Thread(target=work, name="rules-image", daemon=True)
+    thread.start()
+    return thread
+
+def apply_rule_base(client, compiled, encoder=None, renderer=None):
+    """Passa a usar ``compiled`` (None volta à base de sistema_fuzzy).
+
+    Chamado pelo loop entre dois ticks: troca os motores usados no cálculo e
+    na inferência, publica o estado (retido) em TOPIC_RULES_STATUS e atualiza
+    a imagem das regras em segundo plano. Devolve a thread da imagem.
+    """
+    global rule_base, motor_lote, motor_esparso, inference_json, antecedents, consequents_terms, matriz_saida
+    source = sistema_fuzzy if compiled is None else compiled
+    motor_lote = sistema_fuzzy.motor_lote if compiled is None else compiled.engine
+    motor_esparso = sistema_fuzzy.motor_esparso if compiled is None else compiled.sparse
+    inference_json = InferenceJson(pcrac_universe, motor_lote)
+    antecedents, consequents_terms = source.antecedents, source.consequents_terms
+    matriz_saida = source.matriz_saida
+    rule_base = compiled
+    if zone_controller is not None and compiled is not None and zone_controller.compute_pcrac is not compute_pcrac_batch:
+        # Superfície pré-calculada ou motor enviado aos processos de zona
+        if isinstance(zone_controller.compute_pcrac, ControlSurface):
+            zone_controller.compute_pcrac = compiled.surface
+        else:
+            from processos import EngineCompute
+            zone_controller.compute_pcrac = EngineCompute(compiled.engine, DEFUZZ_METHOD)
+    if renderer is not None:
+        renderer.set_terms(pcrac_universe, antecedents, consequents_terms)
+    if encoder is not None:
+        client.publish(TOPIC_INFERENCE_META,
+                       json.dumps(inference_metadata(pcrac_universe, motor_lote.rule_labels, INFERENCE_MU_BITS)),
+                       retain=True)
+    if compiled is None:
+        status = {"hash": mf_definitions_hash()[:16], "source": "builtin"}
+    else:
+        status = {"hash": compiled.hash[:16], "source": compiled.source, "compile_ms": round(compiled.compile_ms, 1)}
+    publish_rules_status(client, status, retain=True)
+    metrics.inc("rules_applied_total")
+    return refresh_rules_image(client, rule_definitions())
+
+def start_rules_watcher():
+    """Oferece a base de RULES_FILE ao loop e acompanha o arquivo; None se desligado.
+
+    Se o arquivo for inválido na partida, o loop segue com a base de
+    sistema_fuzzy até o arquivo ser corrigido.
+    """
+    if RULES_FILE is None:
+        return None
+    on_error = lambda exc: print(f"Base de regras inválida em {RULES_FILE}: {exc}")
+    try:
+        rule_swap.offer(compile_rules(load_config(RULES_FILE)))
+    except (OSError, ValueError, TypeError) as exc:
+        on_error(exc)
+    return RuleFileWatcher(RULES_FILE, compile_rules, rule_swap.offer, on_error=on_error,
+                           interval=RULES_WATCH_SEC).start()
+
+def start():
+    """Cria o cliente MQTT, conecta e publica a imagem das regras.
+
+    Só a primeira chamada tem efeito; as seguintes devolvem o mesmo cliente.
+    """
+    global client
+    if client is not None:
+        return client
+    with startup_phase("mqtt_ms"):
+        import paho.mqtt.client as mqtt
+        new_client = mqtt.Client()
+        new_client.on_connect = on_connect
+        new_client.on_disconnect = on_disconnect
+        new_client.on_message = on_message
+        new_client.reconnect_delay_set(MQTT_RECONNECT_MIN_SEC, MQTT_RECONNECT_MAX_SEC)
+        new_client.connect(MQTT_BROKER, MQTT_PORT, 60)
+        new_client.loop_start()
+    client = new_client
+    with startup_phase("rules_img_ms"):
+        img_data, cached = rules_image()
+        client.publish(TOPIC_IMG_RULES, img_data, retain=True)
+    startup_times["rules_img_cache"] = "hit" if cached else "miss"
+    return client
 
 T_n = 22.0
 PCRAC_val = 50.0
 erro_anterior = 0.0
 
+T_LIMIT_LOW = 18.0
+T_LIMIT_HIGH = 26.0
 MAX_POWER_THRESHOLD = 95.0
 MAX_POWER_DURATION_SEC = 10.0
 # default loop iterval (seconds) between samples — reduce to improve sampling rate
 loop_interval = 0.1
-max_power_counter = 0
-max_power_required_iters = int(MAX_POWER_DURATION_SEC / loop_interval)
+# O que fazer quando um tick estoura o período: "skip", "catch-up" ou "stretch"
+# (ver agendador.py). O período é medido com relógio monotônico, sem deriva.
+SCHEDULER_POLICY = "skip"
+# "thread": loop bloqueante com a thread de rede do paho (loop_start).
+# "asyncio": entradas, cálculo e publicação como tarefas de um event loop
+# (assincrono.py), sem estado compartilhado entre threads.
+RUNTIME = "thread"
+# Só no runtime asyncio: "periodic" (um tick a cada loop_interval) ou
+# "on-change" (recalcula assim que chega uma entrada, com pelo menos
+# ON_CHANGE_MIN_SPACING_SEC entre cálculos, e a cada ON_CHANGE_IDLE_SEC sem
+# entradas; None desliga esse recálculo ocioso).
+CONTROL_TRIGGER = "periodic"
+ON_CHANGE_MIN_SPACING_SEC = 0.02
+ON_CHANGE_IDLE_SEC = 1.0
+# Reconexão ao broker: espera inicial e máxima (dobrando a cada falha), nos dois
+# runtimes. MQTT_SNDBUF fixa o buffer de envio do socket no runtime asyncio
+# (bytes); None usa o tamanho padrão do sistema.
+MQTT_RECONNECT_MIN_SEC = 1
+MQTT_RECONNECT_MAX_SEC = 120
+MQTT_SNDBUF = None
 OSC_WINDOW = 20  # número de amostras na janela
-osc_history = []  # armazena sinais de erro (positivo/negativo/zero)
 OSC_SIGN_CHANGE_THRESHOLD = 6  # se houver mais que isso em janela, alerta
+# Alertas de temperatura: avisam ao entrar e ao sair da faixa crítica, não a
+# cada tick. Só normalizam com ALERT_HYSTERESIS °C de folga e depois de
+# ALERT_MIN_HOLD_SEC no estado ativo; enquanto ativos, um lembrete com a
+# contagem de repetições suprimidas sai a cada ALERT_REMINDER_SEC (None desliga).
+ALERT_HYSTERESIS = 0.5
+ALERT_MIN_HOLD_SEC = 5.0
+ALERT_REMINDER_SEC = 60.0
+# Limite de taxa por tópico e regra (balde de fichas) em emit_alert; transições
+# de estado (raised/cleared) não passam pelo limite
+ALERT_RATE_PER_SEC = 1.0
+ALERT_BURST = 5
 # Throttle: generation of the inference image is expensive (matplotlib). Only
 # produce and publish the inference image every INFERENCE_IMG_PERIOD_SEC seconds
-# (set to None to disable).
+# (set to None to disable). A renderização roda fora do loop de controle, numa
+# thread ("thread") ou num processo filho ("process").
 INFERENCE_IMG_PERIOD_SEC = 10.0
-last_inference_img_at = 0.0
+INFERENCE_RENDER_MODE = "thread"
+# Cache LRU das imagens de inferência, endereçado pelo ponto de operação
+# quantizado (passos de erro, var_erro e defuzz). Em regime a imagem se repete:
+# um acerto reaproveita o PNG e, se o ponto não mudou desde a última
+# publicação, nada é publicado (a não ser a cada INFERENCE_IMG_RESEND_SEC,
+# para quem assinar depois). INFERENCE_IMG_CACHE_ENTRIES = None desliga.
+INFERENCE_IMG_QUANTUM = (0.1, 0.01, 0.5)
+INFERENCE_IMG_CACHE_ENTRIES = 64
+INFERENCE_IMG_CACHE_MAX_BYTES = 16 * 1024 * 1024
+INFERENCE_IMG_RESEND_SEC = 60.0
+# Payload de inferência: "json" (compatível com o flow.json do Node-RED),
+# "compact" (metadados retidos em TOPIC_INFERENCE_META + quadro binário por tick
+# em TOPIC_INFERENCE_BIN) ou "both".
+INFERENCE_PAYLOAD_MODE = "json"
+# O campo "rules" do payload lista só as regras com ativação não nula (no
+# máximo 4 das 25). True inclui todas, como inference_debug, para depuração.
+INFERENCE_INCLUDE_ALL_RULES = False
+INFERENCE_MU_BITS = 8
+INFERENCE_KEYFRAME_INTERVAL = 50
+# O tick avalia a inferência nos buffers de motor_esparso.state e monta o JSON
+# com inference_json, sem dicionários por regra (refeito quando a base muda).
+inference_json = InferenceJson(pcrac_universe, motor_lote)
+# Saída do loop: o que vai para a rede passa por publicacao.Publisher, com
+# filas limitadas por tópico e uma thread de envio; o loop nunca espera o
+# broker. Telemetria mantém só o valor mais recente; alertas e quadros
+# binários ficam numa fila FIFO de PUBLISH_QUEUE_MAXLEN (descarta a mais antiga).
+PUBLISH_QUEUE_MAXLEN = 100
+PUBLISH_MAX_INFLIGHT = 20
+# Métricas de execução (metricas.py): resumo JSON retido em TOPIC_METRICS a
+# cada METRICS_PERIOD_SEC (None desliga) e, com METRICS_HTTP_PORT, endpoint
+# local /metrics no formato do Prometheus.
+METRICS_PERIOD_SEC = 10.0
+METRICS_HTTP_PORT = None
+# Gravação de cada tick em segmentos colunares mapeados em memória
+# (telemetria.py): T, PCRAC, erro, var_erro, Text, Qest e ativações das regras.
+# TELEMETRY_DIR = None desliga. Um segmento guarda TELEMETRY_SEGMENT_RECORDS
+# ticks (um dia a 10 Hz); além de TELEMETRY_MAX_SEGMENTS, os mais antigos são apagados.
+TELEMETRY_DIR = None
+TELEMETRY_SEGMENT_RECORDS = 864000
+TELEMETRY_MAX_SEGMENTS = 120
+# Controle e temperatura do tick: "separate" (TOPIC_CONTROL e TOPIC_TEMP, como
+# o flow.json espera), "bundle" (um JSON por tick em TOPIC_STEP; no multi-zona,
+# um JSON com todas as zonas) ou "both".
+PUBLISH_STEP_MODE = "separate"
+# Como o PCRAC é calculado a cada tick: "exact" chama simulacao.compute();
+# "surface" usa a superfície pré-calculada na partida (interpolação bilinear).
+CONTROL_MODE = "exact"
+# Defuzzificação no modo exato, no multi-zona e na superfície: "skfuzzy"
+# (centróide amostrado no universo, igual a simulacao.compute()) ou "analytic"
+# (centróide exato do polígono agregado, sem degraus da grade de 101 pontos).
+DEFUZZ_METHOD = "skfuzzy"
+SURFACE_ERRO_STEP = 0.5
+SURFACE_VAR_STEP = 0.05
+SURFACE_VALIDATE = True  # mede o erro máximo da superfície contra o motor exato
+def build_zone_controller(zones, superficie=None):
+    """Cria um ZoneController com os parâmetros de controle e alerta deste módulo.
+
+    `zones` pode ser uma lista de identificadores ou a quantidade de zonas.
+    Com ZONE_WORKERS > 0, devolve um `processos.ShardedZoneController`.
+    """
+    if isinstance(zones, int):
+        zones = [f"zona{i}" for i in range(zones)]
+    controller_class, options = ZoneController, {}
+    if ZONE_WORKERS:
+        from processos import ShardedZoneController, EngineCompute
+        controller_class, options = ShardedZoneController, {"workers": ZONE_WORKERS}
+    if superficie is not None:
+        compute = superficie
+    elif ZONE_WORKERS:
+        compute = EngineCompute(motor_lote, DEFUZZ_METHOD)
+    else:
+        compute = compute_pcrac_batch
+    return controller_class(zones, compute, **options,
+                            setpoint=T_SETPOINT,
+                            loop_interval=loop_interval,
+                            t_low=T_LIMIT_LOW,
+                            t_high=T_LIMIT_HIGH,
+                            max_power_threshold=MAX_POWER_THRESHOLD,
+                            max_power_duration_sec=MAX_POWER_DURATION_SEC,
+                            osc_window=OSC_WINDOW,
+                            osc_threshold=OSC_SIGN_CHANGE_THRESHOLD,
+                            alert_hysteresis=ALERT_HYSTERESIS,
+                            alert_min_hold_sec=ALERT_MIN_HOLD_SEC,
+                            alert_reminder_sec=ALERT_REMINDER_SEC)
+
+def build_alert_engine(n=1):
+    """Motor de alertas (temperatura crítica, potência máxima, oscilação) para n zonas."""
+    return AlertEngine(default_alert_rules(t_low=T_LIMIT_LOW,
+                                           t_high=T_LIMIT_HIGH,
+                                           max_power_threshold=MAX_POWER_THRESHOLD,
+                                           max_power_duration_sec=MAX_POWER_DURATION_SEC,
+                                           osc_window=OSC_WINDOW,
+                                           osc_threshold=OSC_SIGN_CHANGE_THRESHOLD,
+                                           hysteresis=ALERT_HYSTERESIS,
+                                           min_hold_sec=ALERT_MIN_HOLD_SEC,
+                                           reminder_sec=ALERT_REMINDER_SEC), n)
+
+def build_alert_gate():
+    """Limite de taxa dos alertas publicados (ALERT_RATE_PER_SEC, ALERT_BURST)."""
+    return AlertGate(ALERT_RATE_PER_SEC, ALERT_BURST)
+
+alert_gate = build_alert_gate()
+
+metrics = Metrics(prefix="fuzzy")
+metrics.describe("tick_seconds", "Duração total do tick")
+metrics.describe("stage_seconds", "Duração de cada etapa do tick", label="stage")
+metrics.describe("on_message_seconds", "Duração do tratamento de uma mensagem de entrada")
+metrics.describe("messages_in_total", "Mensagens de entrada recebidas")
+metrics.describe("alerts_total", "Alertas publicados")
+metrics.describe("alerts_dropped_total", "Alertas descartados pelo limite de taxa")
+metrics.describe("rules_applied_total", "Bases de regras aplicadas em execução")
+stage_timer = metrics.timer("stage_seconds")
+
+def register_metrics(out=None, renderer=None, scheduler=None):
+    """Expõe como medidores os contadores das entradas, da publicação, do renderizador e do agendador."""
+    metrics.gauge("inputs", sensors.stats, "Entradas recebidas (mensagens, amostras, malformadas, antigas)")
+    if out is not None:
+        metrics.gauge("messages_out", lambda: {k: v for k, v in out.stats().items() if k != "dropped_by_topic"},
+                      "Mensagens de saída por estado (enfileiradas, enviadas, descartadas, em voo)")
+    if renderer is not None:
+        metrics.gauge("render_frames", lambda: {k: v for k, v in renderer.stats().items() if k != "pending"},
+                      "Quadros da imagem de inferência (pedidos, renderizados, descartados)")
+        if renderer.cache is not None:
+            metrics.gauge("render_cache", renderer.cache.stats,
+                          "Cache de imagens de inferência (entradas, bytes, acertos, taxa de acerto)")
+    if scheduler is not None:
+        metrics.gauge("scheduler", lambda: {k: v for k, v in scheduler.stats().items()},
+                      "Ticks, estouros e atraso do agendador")
+
+def publish_metrics(client, now):
+    """Publica o resumo das métricas (retido) a cada METRICS_PERIOD_SEC."""
+    if metrics.due(now, METRICS_PERIOD_SEC):
+        client.publish(TOPIC_METRICS, json.dumps(metrics.snapshot()), retain=True)
+
+def build_publisher(client):
+    """Publisher com as políticas de fila dos tópicos deste módulo."""
+    fifo = TopicPolicy(latest=False, maxlen=PUBLISH_QUEUE_MAXLEN)
+    return Publisher(client, {
+        TOPIC_ALERT: fifo,
+        TOPIC_ZONE_ALERT.format(zone="+"): fifo,
+        TOPIC_INFERENCE_BIN: fifo,
+    }, default=LATEST, max_inflight=PUBLISH_MAX_INFLIGHT)
+
+def build_renderer(out):
+    """Renderizador da imagem de inferência, publicando em ``out``, com o cache configurado."""
+    from renderizador import InferenceRenderer, RenderCache
+    cache = None
+    if INFERENCE_IMG_CACHE_ENTRIES is not None:
+        cache = RenderCache(INFERENCE_IMG_QUANTUM, INFERENCE_IMG_CACHE_ENTRIES, INFERENCE_IMG_CACHE_MAX_BYTES)
+    # O worker publica de outra thread; Publisher.publish só enfileira
+    return InferenceRenderer(
+        lambda img: out.publish(TOPIC_INFERENCE_IMG, img, retain=False),
+        pcrac_universe, antecedents, consequents_terms,
+        period=INFERENCE_IMG_PERIOD_SEC, mode=INFERENCE_RENDER_MODE,
+        cache=cache, resend_after=INFERENCE_IMG_RESEND_SEC)
+
+def build_recorder():
+    """Gravador de telemetria em TELEMETRY_DIR, ou None se desligado."""
+    if TELEMETRY_DIR is None:
+        return None
+    from telemetria import TelemetryRecorder
+    return TelemetryRecorder(TELEMETRY_DIR, motor_lote.n_rules, TELEMETRY_SEGMENT_RECORDS,
+                             TELEMETRY_MAX_SEGMENTS, meta={"setpoint": T_SETPOINT, "loop_interval": loop_interval,
+                                                           "mf_hash": mf_definitions_hash(rule_definitions())[:16]})
+
+def publish_step(client, pcrac, T, zones=None):
+    """Controle e temperatura de um tick, conforme PUBLISH_STEP_MODE.
+
+    Com ``zones``, ``pcrac`` e ``T`` são listas com um valor por zona.
+    """
+    if PUBLISH_STEP_MODE in ("separate", "both"):
+        if zones is None:
+            client.publish(TOPIC_CONTROL, pcrac)
+            client.publish(TOPIC_TEMP, T)
+        else:
+            for zone, p, t in zip(zones, pcrac, T):
+                client.publish(TOPIC_ZONE_CONTROL.format(zone=zone), p)
+                client.publish(TOPIC_ZONE_TEMP.format(zone=zone), t)
+    if PUBLISH_STEP_MODE in ("bundle", "both"):
+        payload = {"timestamp": iso_ts(), "pcrac": pcrac, "T": T}
+        if zones is not None:
+            payload["zones"] = list(zones)
+        client.publish(TOPIC_STEP, json.dumps(payload))
+
+def publish_zone_step(client, controller, result):
+    """Publica controle, temperatura e alertas de todas as zonas de um tick."""
+    publish_step(client, np.round(result.pcrac, 2).tolist(), np.round(result.T_next, 2).tolist(),
+                 zones=controller.zones)
+    for alert in result.alerts:
+        zone, alert_type, message, data, severity = alert
+        emit_alert(client, alert_type, message, data, severity,
+                   topic=TOPIC_ZONE_ALERT.format(zone=zone), rule=alert.rule)
+
+def run_zones(client, controller, scheduler=None):
+    """Loop de controle multi-zona. Não retorna; encerra com Ctrl+C."""
+    if scheduler is None:
+        scheduler = TickScheduler(loop_interval, SCHEDULER_POLICY)
+    for tick in scheduler:
+        zone_tick(client, controller, tick.time)
+
+def zone_tick(client, controller, now):
+    """Um tick multi-zona com medição das etapas (passo e publicação)."""
+    t_tick = t = stage_timer.start()
+    compiled = rule_swap.take()
+    if compiled is not None:
+        apply_rule_base(client, compiled)
+    result = controller.step(now=now)
+    t = stage_timer.lap("zone_step", t)
+    publish_zone_step(client, controller, result)
+    stage_timer.lap("publish", t)
+    metrics.observe("tick_seconds", time.perf_counter() - t_tick)
+    publish_metrics(client, now)
 
 def inference_debug(erro_val, varerro_val, pcrac_universe, consequents_terms, antecedents):
     rule_infos = []
@@ -248,7 +723,35 @@ def inference_debug(erro_val, varerro_val, pcrac_universe, consequents_terms, an
 
     return rule_infos, agg.tolist(), defuzz_val
 
+def inference_active(erro_val, varerro_val, include_all=None):
+    """Mesmo retorno de inference_debug, avaliando só as regras que disparam.
+
+    Os termos ativos de cada entrada são localizados pelos vértices das
+    funções de pertinência (`inferencia.SparseInference`). ``rule_infos``
+    traz só as regras com ativação não nula, a menos que ``include_all``
+    (padrão: INFERENCE_INCLUDE_ALL_RULES) seja verdadeiro. ``agg`` é um array.
+    """
+    include_all = INFERENCE_INCLUDE_ALL_RULES if include_all is None else include_all
+    res = motor_esparso.evaluate(erro_val, varerro_val)
+    fired = dict(res.rules)
+    rule_infos = []
+    for k in (range(motor_lote.n_rules) if include_all else fired):
+        activation = round(fired.get(k, 0.0), 6)
+        if activation == 0.0 and not include_all:
+            continue
+        d_label, e_label, consequent_label = motor_lote.rule_labels[k]
+        deg_var = res.var_degrees.get(int(motor_lote.rule_var[k]), 0.0)
+        deg_erro = res.erro_degrees.get(int(motor_lote.rule_erro[k]), 0.0)
+        rule_infos.append({
+            "id": k + 1,
+            "antecedents": {f"varerrotemp.{d_label}": round(deg_var, 6), f"errotemp.{e_label}": round(deg_erro, 6)},
+            "activation": activation,
+            "consequent": consequent_label
+        })
+    return rule_infos, res.aggregation, res.output
+
 def plot_inference(erro_val, varerro_val, pcrac_universe, antecedents, consequents_terms, rule_infos, agg_mu, defuzz_val):
+    import matplotlib.pyplot as plt
     fig, axes = plt.subplots(3, 1, figsize=(9, 12))
     ax = axes[0]
     for label, mf in antecedents['errotemp'][1].items():
@@ -280,124 +783,255 @@ def plot_inference(erro_val, varerro_val, pcrac_universe, antecedents, consequen
     plt.close(fig)
     return "data:image/png;base64," + img_b64
 
+def control_step(out, now, alert_engine, superficie=None, simulacao=None, encoder=None, renderer=None,
+                 recorder=None):
+    """Um tick do controle de sala única: cálculo, planta, publicação e alertas.
+
+    Lê e atualiza os globais ``T_n``, ``erro_anterior`` e ``PCRAC_val``. O
+    PCRAC vem de ``superficie``, da ``simulacao`` do skfuzzy ou, sem nenhuma
+    das duas, do motor vetorizado. As entradas recebidas (`read_inputs`) e
+    uma base de regras oferecida em ``rule_swap`` são aplicadas no início do
+    tick. ``now`` é o instante do tick (relógio monotônico). Com
+    ``recorder`` (`telemetria.TelemetryRecorder`), o ponto de operação do
+    tick é gravado.
+    """
+    global T_n, erro_anterior, PCRAC_val
+    t_tick = t = stage_timer.start()
+    read_inputs()
+    compiled = rule_swap.take()
+    if compiled is not None:
+        apply_rule_base(out, compiled, encoder, renderer)
+    if rule_base is not None:
+        # Base trocada em execução: a superfície dela ou o motor vetorizado
+        superficie = None if superficie is None else rule_base.surface
+        simulacao = None
+    erro_atual = T_n - T_SETPOINT
+    var_erro = erro_atual - erro_anterior
+
+    if superficie is not None:
+        PCRAC_val = superficie(erro_atual, var_erro)
+    elif simulacao is None:
+        saida = float(compute_pcrac_batch(erro_atual, var_erro))
+        if not np.isnan(saida):
+            PCRAC_val = saida
+    else:
+        simulacao.input['errotemp'] = erro_atual
+        simulacao.input['varerrotemp'] = var_erro
+        try:
+            simulacao.compute()
+            PCRAC_val = simulacao.output['pcrac']
+        except Exception:
+            pass
+    t = stage_timer.lap("compute", t)
+    # Buffers reaproveitados entre ticks: válidos até a próxima avaliação
+    inference = motor_esparso.evaluate_into(erro_atual, var_erro)
+    agg_mu, defuzz_val = inference.aggregation, inference.output
+    t = stage_timer.lap("inference", t)
+
+    if INFERENCE_PAYLOAD_MODE in ("json", "both"):
+        out.publish(TOPIC_INFERENCE, inference_json.encode(iso_ts(), T_n, PCRAC_val, erro_atual, var_erro,
+                                                           inference, INFERENCE_INCLUDE_ALL_RULES))
+        t = stage_timer.lap("inference_json", t)
+
+    if encoder is not None:
+        try:
+            frame = encoder.encode(time.time(), T_n, PCRAC_val, erro_atual, var_erro, defuzz_val,
+                                   inference.activations, agg_mu)
+            out.publish(TOPIC_INFERENCE_BIN, frame)
+        except Exception:
+            pass
+        t = stage_timer.lap("inference_bin", t)
+
+    if renderer is not None:
+        renderer.submit(erro_atual, var_erro, agg_mu, defuzz_val)
+        t = stage_timer.lap("render_submit", t)
+
+    T_next = plant_step(T_n, PCRAC_val, Qest, Text)
+
+    publish_step(out, round(PCRAC_val, 2), round(T_next, 2))
+    t = stage_timer.lap("publish", t)
+
+    if recorder is not None:
+        recorder.append(time.time(), T_n, PCRAC_val, erro_atual, var_erro, Text, Qest,
+                        ((r.index, r.activation) for r in inference.records[:inference.n_fired]))
+        t = stage_timer.lap("record", t)
+
+    for alert in alert_engine.update(now, T_next=T_next, pcrac=PCRAC_val, erro=erro_atual):
+        _, alert_type, message, data, severity = alert
+        emit_alert(out, alert_type, message, data, severity, rule=alert.rule)
+    stage_timer.lap("alerts", t)
+
+    erro_anterior = erro_atual
+    T_n = T_next
+    metrics.observe("tick_seconds", time.perf_counter() - t_tick)
+    publish_metrics(out, now)
+
+async def run_async(client, trigger=None, stop=None, superficie=None, simulacao=None, encoder=None,
+                    renderer=None, out=None, recorder=None):
+    """Controlador no runtime asyncio (`assincrono.AsyncRuntime`).
+
+    ``client`` é um `assincrono.AsyncMqttClient` conectado (ou um cliente do
+    `assincrono.MemoryBroker`). As entradas são aplicadas por ``on_message``
+    na thread do event loop. ``trigger`` (padrão: CONTROL_TRIGGER) escolhe
+    entre ticks periódicos e recálculo a cada entrada. ``out`` é o
+    `publicacao.Publisher` (sem thread) usado na saída; por padrão, um novo
+    `build_publisher(client)`.
+    """
+    from assincrono import AsyncRuntime
+    for topic in input_topics():
+        client.subscribe(topic)
+    if out is None:
+        out = build_publisher(client)
+    if zone_controller is not None:
+        step = lambda now: zone_tick(out, zone_controller, now)
+    else:
+        alert_engine = build_alert_engine()
+        step = lambda now: control_step(out, now, alert_engine, superficie, simulacao, encoder, renderer, recorder)
+    runtime = AsyncRuntime(client, out, step, lambda msg: on_message(out, None, msg),
+                           trigger=CONTROL_TRIGGER if trigger is None else trigger,
+                           period=loop_interval, policy=SCHEDULER_POLICY,
+                           min_spacing=ON_CHANGE_MIN_SPACING_SEC, idle_period=ON_CHANGE_IDLE_SEC,
+                           reconnect_min=MQTT_RECONNECT_MIN_SEC, reconnect_max=MQTT_RECONNECT_MAX_SEC)
+    await runtime.run(stop)
+    return runtime
+
+async def main_async(superficie=None, simulacao=None):
+    """Ponto de entrada do runtime asyncio: conecta, publica a imagem das regras e roda."""
+    from assincrono import AsyncMqttClient
+    global client
+    async_client = AsyncMqttClient(MQTT_BROKER, MQTT_PORT, sndbuf=MQTT_SNDBUF)
+    async_client.paho.on_connect = on_connect
+    async_client.paho.on_disconnect = on_disconnect
+    with startup_phase("mqtt_ms"):
+        await async_client.connect()
+    client = async_client.paho
+    with startup_phase("rules_img_ms"):
+        img_data, cached = rules_image()
+        async_client.publish(TOPIC_IMG_RULES, img_data, retain=True)
+    startup_times["rules_img_cache"] = "hit" if cached else "miss"
+
+    out = build_publisher(async_client)
+    renderer = None
+    if INFERENCE_IMG_PERIOD_SEC is not None and zone_controller is None:
+        renderer = build_renderer(out).start()
+    recorder = build_recorder() if zone_controller is None else None
+    encoder = None
+    if INFERENCE_PAYLOAD_MODE in ("compact", "both"):
+        encoder = InferenceEncoder(pcrac_universe.size, mu_bits=INFERENCE_MU_BITS,
+                                   keyframe_interval=INFERENCE_KEYFRAME_INTERVAL)
+        async_client.publish(TOPIC_INFERENCE_META,
+                             json.dumps(inference_metadata(pcrac_universe, motor_lote.rule_labels, INFERENCE_MU_BITS)),
+                             retain=True)
+
+    startup_times["total_ms"] = round((time.perf_counter() - _IMPORT_STARTED) * 1e3, 1)
+    print(f"Partida a frio: {startup_times}")
+    print(f"Sistema Fuzzy Iniciado (asyncio, {CONTROL_TRIGGER}). Aguardando comandos...")
+    register_metrics(out, renderer)
+    if METRICS_HTTP_PORT is not None:
+        serve_http(metrics, METRICS_HTTP_PORT)
+    watcher = start_rules_watcher()
+    runtime = None
+    try:
+        runtime = await run_async(async_client, superficie=superficie, simulacao=simulacao,
+                                  encoder=encoder, renderer=renderer, out=out, recorder=recorder)
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        if renderer is not None:
+            renderer.stop()
+        if recorder is not None:
+            recorder.close()
+        if zone_controller is not None and ZONE_WORKERS:
+            zone_controller.close()
+        print(f"Publicação: {out.stats()}")
+        await async_client.disconnect()
+
+startup_times["import_ms"] = round((time.perf_counter() - _IMPORT_STARTED) * 1e3, 1)
+
 if __name__ == "__main__":
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    client.loop_start()
+    superficie = None
+    simulacao = None
+    if CONTROL_MODE == "surface":
+        with startup_phase("surface_ms"):
+            superficie, report = build_control_surface()
+        print(f"Superfície de controle {superficie.shape[0]}x{superficie.shape[1]} pré-calculada.")
+        if report is not None:
+            print(f"Erro máximo vs. motor exato: {report['max_abs_error']:.4f} em {report['at']}")
+
+    # Criado antes de conectar para que on_connect assine os tópicos por zona
+    if ZONES:
+        zone_controller = build_zone_controller(ZONES, superficie)
+        print(f"Modo multi-zona: {len(zone_controller)} zonas.")
 
-    img_data = gerar_graficos_base64()
-    client.publish(TOPIC_IMG_RULES, img_data, retain=True)
+    elif zone_controller is None and DEFUZZ_METHOD == "skfuzzy":
+        with startup_phase("simulation_ms"):
+            simulacao = control_simulation()
 
+    if RUNTIME == "asyncio":
+        import asyncio
+        try:
+            asyncio.run(main_async(superficie, simulacao))
+        except KeyboardInterrupt:
+            print('\nInterrupção detectada. Encerrando graceful...')
+        raise SystemExit(0)
+
+    start()
+    # Tudo o que o loop publica passa pelas filas limitadas de `out`
+    out = build_publisher(client).start()
+
+    renderer = None
+    if INFERENCE_IMG_PERIOD_SEC is not None and zone_controller is None:
+        renderer = build_renderer(out).start()
+    recorder = build_recorder() if zone_controller is None else None
+
+    encoder = None
+    if INFERENCE_PAYLOAD_MODE in ("compact", "both"):
+        encoder = InferenceEncoder(pcrac_universe.size, mu_bits=INFERENCE_MU_BITS,
+                                   keyframe_interval=INFERENCE_KEYFRAME_INTERVAL)
+        client.publish(TOPIC_INFERENCE_META,
+                       json.dumps(inference_metadata(pcrac_universe, motor_lote.rule_labels, INFERENCE_MU_BITS)),
+                       retain=True)
+
+    startup_times["total_ms"] = round((time.perf_counter() - _IMPORT_STARTED) * 1e3, 1)
+    print(f"Partida a frio: {startup_times}")
     print("Sistema Fuzzy Iniciado. Aguardando comandos...")
 
+    scheduler = TickScheduler(loop_interval, SCHEDULER_POLICY)
+    alert_engine = build_alert_engine()
+    register_metrics(out, renderer, scheduler)
+    if METRICS_HTTP_PORT is not None:
+        serve_http(metrics, METRICS_HTTP_PORT)
+        print(f"Métricas em http://127.0.0.1:{METRICS_HTTP_PORT}/metrics")
+    watcher = start_rules_watcher()
+
     try:
-        while True:
-            erro_atual = T_n - T_SETPOINT
-            var_erro = erro_atual - erro_anterior
-
-            simulacao.input['errotemp'] = erro_atual
-            simulacao.input['varerrotemp'] = var_erro
-
-            try:
-                simulacao.compute()
-                PCRAC_val = simulacao.output['pcrac']
-            except:
-                pass
-            antecedents = {
-                'errotemp': (errotemp.universe, {label: errotemp[label].mf for label in errotemp.terms}),
-                'varerrotemp': (varerrotemp.universe, {label: varerrotemp[label].mf for label in varerrotemp.terms})
-            }
-            consequents_terms = {label: pcrac[label].mf for label in pcrac.terms}
-            pcrac_universe = pcrac.universe
-
-            rule_infos, agg_mu, defuzz_val = inference_debug(erro_atual, var_erro, pcrac_universe, consequents_terms, antecedents)
-
-            inference_payload = {
-                "timestamp": iso_ts(),
-                "operating_point": {"T": round(T_n, 3), "pcrac": round(PCRAC_val, 3), "erro": round(erro_atual, 3), "var_erro": round(var_erro, 3)},
-                "rules": rule_infos,
-                "defuzzified": round(defuzz_val, 3),
-                "aggregation": {"x": pcrac_universe.tolist(), "mu": [round(float(x), 6) for x in agg_mu]}
-            }
-
-            try:
-                client.publish(TOPIC_INFERENCE, json.dumps(inference_payload))
-            except Exception:
-                pass
-
-            try:
-                img_data = plot_inference(erro_atual, var_erro, pcrac_universe, antecedents, consequents_terms, rule_infos, agg_mu, defuzz_val)
-                client.publish(TOPIC_INFERENCE_IMG, img_data, retain=False)
-            except Exception:
-                pass
-
-            T_next = (0.9 * T_n) - (0.072 * PCRAC_val) + (0.045 * Qest) + (0.02 * Text) + 3.5
-
-            client.publish(TOPIC_CONTROL, round(PCRAC_val, 2))
-            client.publish(TOPIC_TEMP, round(T_next, 2))
-
-            if T_next < 18:
-                publish_alert(client,
-                            alert_type="crítico",
-                            message="Temperatura abaixo do limite seguro",
-                            data={"temperature": round(T_next, 2), "limit": 18.0},
-                            severity="crítica")
-            elif T_next > 26:
-                publish_alert(client,
-                            alert_type="crítico",
-                            message="Temperatura acima do limite seguro",
-                            data={"temperature": round(T_next, 2), "limit": 26.0},
-                            severity="crítica")
-
-            if PCRAC_val >= MAX_POWER_THRESHOLD:
-                max_power_counter += 1
-            else:
-                if max_power_counter >= max_power_required_iters:
-                    publish_alert(client,
-                                alert_type="eficiência",
-                                message="CRAC operou em potência máxima por período prolongado",
-                                data={"pcrac": round(PCRAC_val, 2), "duration_sec": max_power_counter * loop_interval},
-                                severity="alta")
-                max_power_counter = 0
-
-            if max_power_counter == max_power_required_iters:
-                publish_alert(client,
-                            alert_type="eficiência",
-                            message="CRAC atingiu potência máxima por tempo prolongado",
-                            data={"pcrac": round(PCRAC_val, 2), "duration_sec": max_power_counter * loop_interval},
-                            severity="alta")
-
-            sign = 0
-            if erro_atual > 0.05:
-                sign = 1
-            elif erro_atual < -0.05:
-                sign = -1
-
-            if len(osc_history) >= OSC_WINDOW:
-                osc_history.pop(0)
-            osc_history.append(sign)
-
-            sign_changes = 0
-            prev = osc_history[0] if osc_history else 0
-            for s in osc_history[1:]:
-                if s != 0 and prev != 0 and s != prev:
-                    sign_changes += 1
-                if s != 0:
-                    prev = s
-                if sign_changes >= OSC_SIGN_CHANGE_THRESHOLD:
-                    publish_alert(client,
-                                alert_type="estabilidade",
-                                message="Oscilações excessivas detectadas no erro de temperatura",
-                                data={"sign_changes": sign_changes, "window_samples": len(osc_history), "erro_atual": round(erro_atual, 3)},
-                                severity="média")
-                    osc_history.clear()
-
-                erro_anterior = erro_atual
-                T_n = T_next
-                time.sleep(loop_interval)
+        if zone_controller is not None:
+            run_zones(out, zone_controller, scheduler)
+
+        for tick in scheduler:
+            control_step(out, tick.time, alert_engine, superficie, simulacao, encoder, renderer, recorder)
 
     except KeyboardInterrupt:
         print('\nInterrupção detectada. Encerrando graceful...')
 
     finally:
+        print(f"Agendador: {scheduler.stats()}")
+        print(f"Alertas: {alert_gate.stats()}")
+        if watcher is not None:
+            watcher.stop()
+            print(f"Base de regras: {rule_swap.stats()}")
+        if renderer is not None:
+            renderer.stop()
+            print(f"Imagens de inferência: {renderer.stats()}")
+            if renderer.cache is not None:
+                print(f"Cache de imagens: {renderer.cache.stats()}")
+        if recorder is not None:
+            recorder.close()
+            print(f"Telemetria: {recorder.stats()}")
+        if zone_controller is not None and ZONE_WORKERS:
+            zone_controller.close()
+            print(f"Processos de zona: {zone_controller.stats()}")
+        out.stop()
+        print(f"Publicação: {out.stats()}")
         graceful_shutdown(client)
         print('Cliente MQTT desconectado e loop parado.')
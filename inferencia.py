@@ -0,0 +1,423 @@
+"""Motor de inferência Mamdani vetorizado para muitos pontos de operação.
+
+Avalia N pares (erro, var_erro) de uma vez com NumPy, sem laço Python por
+amostra. Reproduz as mesmas operações do skfuzzy (``np.interp`` sobre as
+funções de pertinência amostradas, AND = min, acumulação = max e centróide
+trapezoidal), de modo que os resultados batem com ``simulacao.compute()`` e
+com o centróide de ``inference_debug``.
+"""
+from collections import namedtuple
+import numpy as np
+from centroide import PiecewiseLinearCentroid, knots_from_samples
+
+BatchResult = namedtuple("BatchResult", ["output", "activations", "aggregation"])
+BatchResult.__doc__ = """Resultado de `BatchInference.evaluate`.
+
+output      : (N,) saída crisp (NaN quando nenhuma regra dispara)
+activations : (N, R) ativação de cada regra, na ordem de `rule_labels`
+aggregation : (N, M) pertinência agregada sobre o universo de saída, ou None
+"""
+
+SparseResult = namedtuple("SparseResult", ["rules", "erro_degrees", "var_degrees", "aggregation", "output"])
+SparseResult.__doc__ = """Resultado de `SparseInference.evaluate` (um ponto de operação).
+
+rules        : lista de (índice da regra, ativação) só das regras que disparam, em ordem
+erro_degrees : {índice do termo de erro: grau} dos termos não nulos
+var_degrees  : {índice do termo de var_erro: grau} dos termos não nulos
+aggregation  : (M,) pertinência agregada sobre o universo de saída
+output       : centróide sobre o universo (NaN quando nenhuma regra dispara)
+"""
+
+# "skfuzzy": centróide sobre o universo com os pontos de corte inseridos,
+#            como em ControlSystemSimulation.compute();
+# "universe": centróide direto sobre o universo amostrado, como em inference_debug;
+# "analytic": centróide exato do polígono agregado (centroide.py), sem amostragem.
+CENTROID_METHODS = ("skfuzzy", "universe", "analytic")
+
+
+def centroid(x, mu):
+    """Centróide trapezoidal linha a linha, idêntico a ``skfuzzy.defuzzify.centroid``.
+
+    ``x`` tem formato (M,) ou (N, M) e ``mu`` tem formato (N, M). Segmentos de
+    largura zero ou altura zero não contribuem. As somas são acumuladas na
+    mesma ordem do skfuzzy (``np.cumsum``), para que o resultado seja igual
+    bit a bit. Linhas com área nula devolvem NaN.
+    """
+    x = np.asarray(x, dtype=float)
+    mu = np.asarray(mu, dtype=float)
+    x1, x2 = x[..., :-1], x[..., 1:]
+    y1, y2 = mu[:, :-1], mu[:, 1:]
+    w = x2 - x1
+
+    skip = ((y1 == 0.0) & (y2 == 0.0)) | (w == 0.0)
+    rect = y1 == y2
+    up = (y1 == 0.0) & ~rect
+    down = (y2 == 0.0) & ~rect
+    ysum = y1 + y2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        general = (2.0 / 3.0 * w * (y2 + 0.5 * y1)) / ysum + x1
+    moment = np.where(rect, 0.5 * (x1 + x2),
+             np.where(up, 2.0 / 3.0 * w + x1,
+             np.where(down, 1.0 / 3.0 * w + x1, general)))
+    area = np.where(rect, w * y1,
+           np.where(up, 0.5 * w * y2,
+           np.where(down, 0.5 * w * y1, 0.5 * w * ysum)))
+    area = np.where(skip, 0.0, area)
+    moment_area = np.where(skip, 0.0, moment * area)
+
+    sum_moment_area = np.cumsum(moment_area, axis=-1)[:, -1]
+    sum_area = np.cumsum(area, axis=-1)[:, -1]
+    out = sum_moment_area / np.fmax(sum_area, np.finfo(float).eps)
+    # skfuzzy rejeita pertinência agregada nula (EmptyMembershipError)
+    return np.where(mu.sum(axis=-1) == 0, np.nan, out)
+
+
+class BatchInference:
+    """Sistema Mamdani 2 entradas / 1 saída avaliado em lote.
+
+    As regras seguem a ordem de ``inference_debug``: para cada rótulo de
+    ``delta_labels`` (linhas de ``rule_matrix``), cada rótulo de
+    ``erro_labels`` (colunas). A regra ``k = i * len(erro_labels) + j`` tem
+    consequente ``rule_matrix[i][j]``.
+    """
+
+    def __init__(self, erro_universe, erro_mfs, var_universe, var_mfs,
+                 out_universe, out_mfs, rule_matrix, erro_labels, delta_labels):
+        self.erro_universe = np.asarray(erro_universe, dtype=float)
+        self.var_universe = np.asarray(var_universe, dtype=float)
+        self.out_universe = np.asarray(out_universe, dtype=float)
+        self.erro_labels = list(erro_labels)
+        self.delta_labels = list(delta_labels)
+        self.out_labels = list(out_mfs)
+
+        self.erro_mf = np.array([erro_mfs[label] for label in self.erro_labels], dtype=float)
+        self.var_mf = np.array([var_mfs[label] for label in self.delta_labels], dtype=float)
+        self.out_mf = np.array([out_mfs[label] for label in self.out_labels], dtype=float)
+
+        self.rule_labels = []
+        erro_idx, var_idx, cons_idx = [], [], []
+        for i, d_label in enumerate(self.delta_labels):
+            for j, e_label in enumerate(self.erro_labels):
+                consequent = rule_matrix[i][j]
+                self.rule_labels.append((d_label, e_label, consequent))
+                var_idx.append(i)
+                erro_idx.append(j)
+                cons_idx.append(self.out_labels.index(consequent))
+        self.rule_erro = np.array(erro_idx)
+        self.rule_var = np.array(var_idx)
+        self.rule_consequent = np.array(cons_idx)
+        # Máscara (regras x termos de saída) para acumular os cortes por termo
+        self._rule_to_term = self.rule_consequent[:, None] == np.arange(len(self.out_labels))[None, :]
+        self._analytic = PiecewiseLinearCentroid.from_samples(self.out_universe, self.out_mf)
+
+    @classmethod
+    def from_variables(cls, errotemp, varerrotemp, pcrac, rule_matrix, erro_labels, delta_labels):
+        """Constrói o motor a partir das variáveis ``ctrl.Antecedent``/``ctrl.Consequent``."""
+        return cls(errotemp.universe, {label: errotemp[label].mf for label in errotemp.terms},
+                   varerrotemp.universe, {label: varerrotemp[label].mf for label in varerrotemp.terms},
+                   pcrac.universe, {label: pcrac[label].mf for label in pcrac.terms},
+                   rule_matrix, erro_labels, delta_labels)
+
+    @property
+    def n_rules(self):
+        return len(self.rule_labels)
+
+    def fuzzify(self, erro, var_erro):
+        """Graus de pertinência (N, termos) de cada entrada.
+
+        ``np.interp`` satura nas bordas do universo, o que equivale ao
+        ``clip_to_bounds`` de ``simulacao.compute()``. (``inference_debug``
+        usa ``interp_membership`` com pertinência zero fora do universo.)
+        """
+        erro_deg = np.stack([np.interp(erro, self.erro_universe, mf) for mf in self.erro_mf], axis=-1)
+        var_deg = np.stack([np.interp(var_erro, self.var_universe, mf) for mf in self.var_mf], axis=-1)
+        return erro_deg, var_deg
+
+    def term_cuts(self, activations):
+        """Corte de cada termo de saída: máximo das ativações das regras que o usam."""
+        masked = np.where(self._rule_to_term[None, :, :], activations[:, :, None], 0.0)
+        return masked.max(axis=1)
+
+    def aggregate(self, cuts, x=None):
+        """Pertinência agregada max_t min(corte_t, mf_t(x)) sobre ``x`` (padrão: universo)."""
+        if x is None:
+            mfs = self.out_mf[None, :, :]
+        else:
+            mfs = np.stack([np.interp(x, self.out_universe, mf) for mf in self.out_mf], axis=1)
+        return np.minimum(cuts[:, :, None], mfs).max(axis=1)
+
+    def _cut_points(self, cuts):
+        """Pontos onde cada termo cruza o seu corte (``_interp_universe_fast`` do skfuzzy).
+
+        Os termos são convexos (trimf/trapmf), então há no máximo dois
+        cruzamentos por termo: o primeiro e o último.
+        """
+        u = self.out_universe
+        du = np.diff(u)
+        points = []
+        for t, mf in enumerate(self.out_mf):
+            c = cuts[:, t:t + 1]
+            above = np.where(c == 0.0, mf[None, :] > c, mf[None, :] >= c)
+            change = above[:, 1:] != above[:, :-1]
+            n_seg = change.shape[1]
+            first = np.argmax(change, axis=1)
+            last = n_seg - 1 - np.argmax(change[:, ::-1], axis=1)
+            has = change.any(axis=1)
+            for idx in (first, last):
+                dmf = mf[idx + 1] - mf[idx]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    xx = u[idx] + (c[:, 0] - mf[idx]) * du[idx] / dmf
+                # Sem cruzamento: repete a borda do universo (segmento de largura zero)
+                points.append(np.where(has, xx, u[-1]))
+        return np.stack(points, axis=1)
+
+    def evaluate(self, erro, var_erro, centroid_method="skfuzzy", return_aggregation=False):
+        """Avalia o sistema para arrays ``erro`` e ``var_erro`` de mesmo formato.
+
+        Retorna um `BatchResult` com ``output`` no formato das entradas,
+        ``activations`` (N, R) e, se ``return_aggregation``, a pertinência
+        agregada (N, M) sobre o universo de saída.
+        """
+        if centroid_method not in CENTROID_METHODS:
+            raise ValueError(f"centroid_method deve ser um de {CENTROID_METHODS}")
+        erro, var_erro = np.broadcast_arrays(np.asarray(erro, dtype=float),
+                                             np.asarray(var_erro, dtype=float))
+        shape = erro.shape
+        erro_deg, var_deg = self.fuzzify(erro.ravel(), var_erro.ravel())
+
+        activations = np.fmin(var_deg[:, self.rule_var], erro_deg[:, self.rule_erro])
+        cuts = self.term_cuts(activations)
+
+        agg = None
+        if return_aggregation or centroid_method == "universe":
+            agg = self.aggregate(cuts)
+
+        if centroid_method == "universe":
+            output = centroid(self.out_universe, agg)
+        elif centroid_method == "analytic":
+            output = self._analytic.centroid(cuts)
+        else:
+            n = cuts.shape[0]
+            x = np.concatenate([np.broadcast_to(self.out_universe, (n, self.out_universe.size)),
+                                self._cut_points(cuts)], axis=1)
+            x.sort(axis=1)
+            output = centroid(x, self.aggregate(cuts, x))
+
+        return BatchResult(output.reshape(shape), activations, agg)
+
+
+class TermLocator:
+    """Encontra os termos não nulos de uma entrada pela posição entre os vértices.
+
+    Os vértices de todos os termos dividem o universo em trechos; para cada
+    trecho guarda-se quais termos são não nulos nele. Com termos triangulares
+    sobrepostos há no máximo dois por trecho. Fora do universo nenhum termo
+    é ativo (pertinência zero, como ``fuzz.interp_membership``).
+
+    Graus até ``tol`` contam como zero: universos gerados com ``np.arange``
+    de passo fracionário deixam resíduos de ~1e-15 em todos os termos.
+    """
+
+    def __init__(self, universe, mfs, tol=1e-9):
+        self.universe = np.asarray(universe, dtype=float)
+        self.mfs = np.asarray(mfs, dtype=float)
+        self.tol = tol
+        knots = [knots_from_samples(self.universe, np.where(mf > tol, mf, 0.0)) for mf in self.mfs]
+        self.breakpoints = np.unique(np.concatenate([xs for xs, _ in knots]))
+        bp = self.breakpoints
+        # Trecho k = [bp[k], bp[k+1]); o último índice é o ponto bp[-1]
+        probes = np.concatenate([(bp[:-1] + bp[1:]) / 2.0, bp[-1:]])
+        self.segment_terms = []
+        for k in range(bp.size):
+            nz = [t for t, (xs, ys) in enumerate(knots)
+                  if np.interp(probes[k], xs, ys) > tol or np.interp(bp[k], xs, ys) > tol]
+            self.segment_terms.append(tuple(nz))
+
+    def active(self, x):
+        """Lista de (termo, grau) com grau > ``tol`` para o valor escalar ``x``."""
+        bp = self.breakpoints
+        if not bp[0] <= x <= bp[-1]:
+            return []
+        k = int(np.searchsorted(bp, x, side='right')) - 1
+        out = []
+        for t in self.segment_terms[k]:
+            deg = float(np.interp(x, self.universe, self.mfs[t]))
+            if deg > self.tol:
+                out.append((t, deg))
+        return out
+
+    @property
+    def max_active(self):
+        return max(len(terms) for terms in self.segment_terms)
+
+    def active_into(self, x, terms, degrees):
+        """Como `active`, mas escreve nas listas ``terms`` e ``degrees``; devolve quantos.
+
+        As listas precisam ter pelo menos `max_active` posições.
+        """
+        bp = self.breakpoints
+        if not bp[0] <= x <= bp[-1]:
+            return 0
+        k = int(np.searchsorted(bp, x, side='right')) - 1
+        n = 0
+        for t in self.segment_terms[k]:
+            deg = float(np.interp(x, self.universe, self.mfs[t]))
+            if deg > self.tol:
+                terms[n], degrees[n] = t, deg
+                n += 1
+        return n
+
+
+class UniverseCentroid:
+    """`centroid` de uma linha sobre um universo fixo, sem alocar arrays por chamada.
+
+    As constantes de cada segmento do universo são calculadas uma vez e as
+    contas intermediárias usam buffers próprios (``out=``). O resultado é
+    igual bit a bit ao de ``centroid(x, mu[None, :])[0]``.
+    """
+
+    def __init__(self, x):
+        x = np.asarray(x, dtype=float)
+        x1, x2 = x[:-1], x[1:]
+        w = x2 - x1
+        self.x1 = x1.copy()
+        self.two_thirds_w = 2.0 / 3.0 * w
+        self.half_w = 0.5 * w
+        self.mid = 0.5 * (x1 + x2)
+        self.up = 2.0 / 3.0 * w + x1
+        self.down = 1.0 / 3.0 * w + x1
+        self.zero_width = w == 0.0
+        m = w.size
+        self._ysum = np.empty(m)
+        self._moment = np.empty(m)
+        self._area = np.empty(m)
+        self._mask = np.empty(m, dtype=bool)
+        self._eps = np.finfo(float).eps
+
+    def __call__(self, mu):
+        if not mu.any():
+            return float('nan')          # skfuzzy rejeita pertinência agregada nula
+        y1, y2 = mu[:-1], mu[1:]
+        ysum, moment, area, mask = self._ysum, self._moment, self._area, self._mask
+        np.add(y1, y2, out=ysum)
+        # Trecho geral; os casos especiais sobrescrevem, na precedência de `centroid`
+        np.multiply(y1, 0.5, out=moment)
+        np.add(y2, moment, out=moment)
+        np.multiply(self.two_thirds_w, moment, out=moment)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(moment, ysum, out=moment)
+        np.add(moment, self.x1, out=moment)
+        np.equal(y2, 0.0, out=mask)
+        np.copyto(moment, self.down, where=mask)
+        np.equal(y1, 0.0, out=mask)
+        np.copyto(moment, self.up, where=mask)
+        np.equal(y1, y2, out=mask)
+        np.copyto(moment, self.mid, where=mask)
+        # Em todos os casos a área é w * (y1 + y2) / 2 (nula nos trechos ignorados)
+        np.multiply(self.half_w, ysum, out=area)
+        np.copyto(area, 0.0, where=self.zero_width)
+        np.multiply(moment, area, out=moment)
+        sum_moment_area = np.cumsum(moment, out=moment)[-1]
+        sum_area = np.cumsum(area, out=area)[-1]
+        return float(sum_moment_area / max(sum_area, self._eps))
+
+
+class RuleRecord:
+    """Regra disparada num tick de `SparseInference.evaluate_into` (reaproveitada entre ticks)."""
+    __slots__ = ("index", "var_term", "erro_term", "var_degree", "erro_degree", "activation")
+
+    def __init__(self):
+        self.index = self.var_term = self.erro_term = 0
+        self.var_degree = self.erro_degree = self.activation = 0.0
+
+
+class SparseState:
+    """Buffers de `SparseInference.evaluate_into`, atualizados no lugar a cada tick.
+
+    records      : `RuleRecord`; só os ``n_fired`` primeiros valem no tick, em ordem
+    activations  : (R,) ativação de cada regra (zero nas que não disparam)
+    erro_degrees : grau de cada termo de erro (lista, zero nos inativos)
+    var_degrees  : grau de cada termo de var_erro (lista, zero nos inativos)
+    aggregation  : (M,) pertinência agregada sobre o universo de saída
+    output       : centróide sobre o universo (NaN quando nenhuma regra dispara)
+    """
+    __slots__ = ("n_fired", "records", "activations", "erro_degrees", "var_degrees", "aggregation", "output")
+
+    def __init__(self, n_records, n_rules, n_erro, n_var, n_points):
+        self.n_fired = 0
+        self.records = [RuleRecord() for _ in range(n_records)]
+        self.activations = np.zeros(n_rules)
+        self.erro_degrees = [0.0] * n_erro
+        self.var_degrees = [0.0] * n_var
+        self.aggregation = np.zeros(n_points)
+        self.output = float('nan')
+
+
+def _scatter(degrees, terms, values, count):
+    for t in range(len(degrees)):
+        degrees[t] = 0.0
+    for a in range(count):
+        degrees[terms[a]] = values[a]
+
+
+class SparseInference:
+    """Avaliação de um ponto de operação só com as regras que disparam.
+
+    Mesma semântica de ``inference_debug`` (pertinência zero fora do
+    universo, centróide sobre o universo de saída), com os mesmos valores a
+    menos dos resíduos de ponto flutuante descartados por `TermLocator`.
+    Com no máximo dois termos ativos por entrada, no máximo 4 das 25 regras
+    são avaliadas e agregadas.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.erro = TermLocator(engine.erro_universe, engine.erro_mf)
+        self.var = TermLocator(engine.var_universe, engine.var_mf)
+        self.n_erro = len(engine.erro_labels)
+        self._consequent_mf = [engine.out_mf[c] for c in engine.rule_consequent]
+        self._centroid = UniverseCentroid(engine.out_universe)
+        self._erro_terms, self._erro_deg = [0] * self.erro.max_active, [0.0] * self.erro.max_active
+        self._var_terms, self._var_deg = [0] * self.var.max_active, [0.0] * self.var.max_active
+        self._scratch = np.empty_like(engine.out_universe)
+        self.state = SparseState(self.erro.max_active * self.var.max_active, engine.n_rules,
+                                 self.n_erro, len(engine.delta_labels), engine.out_universe.size)
+
+    def evaluate_into(self, erro, var_erro):
+        """Avalia no lugar e devolve `state` (o mesmo objeto a cada chamada).
+
+        Sem alocar listas, dicionários nem arrays: graus, regras, agregação e
+        centróide vão para os buffers de `state`, válidos até a próxima chamada.
+        """
+        state, agg, scratch = self.state, self.state.aggregation, self._scratch
+        n_e = self.erro.active_into(erro, self._erro_terms, self._erro_deg)
+        n_v = self.var.active_into(var_erro, self._var_terms, self._var_deg)
+        _scatter(state.erro_degrees, self._erro_terms, self._erro_deg, n_e)
+        _scatter(state.var_degrees, self._var_terms, self._var_deg, n_v)
+        state.activations.fill(0.0)
+        agg.fill(0.0)
+        n = 0
+        for a in range(n_v):
+            i, deg_var = self._var_terms[a], self._var_deg[a]
+            for b in range(n_e):
+                j, deg_erro = self._erro_terms[b], self._erro_deg[b]
+                k = i * self.n_erro + j
+                activation = min(deg_var, deg_erro)
+                rec = state.records[n]
+                rec.index, rec.var_term, rec.erro_term = k, i, j
+                rec.var_degree, rec.erro_degree, rec.activation = deg_var, deg_erro, activation
+                state.activations[k] = activation
+                np.fmin(activation, self._consequent_mf[k], out=scratch)
+                np.fmax(agg, scratch, out=agg)
+                n += 1
+        state.n_fired = n
+        state.output = self._centroid(agg)
+        return state
+
+    def evaluate(self, erro, var_erro):
+        state = self.evaluate_into(erro, var_erro)
+        return SparseResult([(r.index, r.activation) for r in state.records[:state.n_fired]],
+                            {t: d for t, d in enumerate(state.erro_degrees) if d > 0.0},
+                            {t: d for t, d in enumerate(state.var_degrees) if d > 0.0},
+                            state.aggregation.copy(), state.output)
@@ -0,0 +1,184 @@
+"""Ingestão das entradas de sensores fora do loop de controle.
+
+Cada tópico de entrada tem um decodificador na tabela de `SensorIngest`.
+Um payload pode trazer uma amostra ou um lote:
+
+    texto   "28.5"                         uma amostra, no instante da chegada
+    JSON    [28.5, 28.7, 29.0]             lote sem instantes (vale o último)
+            [[1718000000.0, 28.5], ...]    lote de pares (timestamp, valor)
+    binário n x "<df": timestamp (s, epoch), valor   (`PACKED_SAMPLE`)
+
+O lote é decodificado de uma vez com numpy, sem um ``float()`` por amostra.
+Só a amostra mais recente de cada lote chega ao controle. Amostras
+ilegíveis, não finitas ou com timestamp mais de ``max_skew`` segundos no
+futuro contam como ``malformed``. Amostras mais antigas que a já aceita no
+canal, ou mais velhas que ``max_age``, contam como ``stale``.
+
+A thread de rede escreve em `InputSnapshot`, e o loop lê o estado mais
+recente sem travas (`InputSnapshot.read`).
+"""
+import json
+import math
+import threading
+import time
+from typing import NamedTuple
+import numpy as np
+
+PACKED_SAMPLE = np.dtype([("t", "<f8"), ("v", "<f4")])
+
+
+def decode_text(payload):
+    """Valor único ou lote JSON; devolve ``(timestamps ou None, valores)``.
+
+    Um valor único volta como ``float`` (caminho rápido de `SensorIngest.handle`).
+    """
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        payload = bytes(payload).decode()
+    text = payload.strip()
+    if not text.startswith("["):
+        return None, float(text)
+    data = json.loads(text)
+    if not isinstance(data, list) or not data:
+        raise ValueError("lote vazio")
+    arr = np.asarray(data, dtype=float)
+    if arr.ndim == 1:
+        return None, arr
+    if arr.ndim != 2 or arr.shape[1] != 2:
+        raise ValueError("lote deve ser [valor, ...] ou [[timestamp, valor], ...]")
+    return arr[:, 0], arr[:, 1]
+
+
+def decode_packed(payload):
+    """Lote binário de `PACKED_SAMPLE`; devolve ``(timestamps, valores)``."""
+    if not payload or len(payload) % PACKED_SAMPLE.itemsize:
+        raise ValueError(f"tamanho deve ser múltiplo de {PACKED_SAMPLE.itemsize} bytes")
+    samples = np.frombuffer(payload, dtype=PACKED_SAMPLE)
+    return samples["t"], samples["v"].astype(float)
+
+
+def pack_samples(timestamps, values):
+    """Monta um payload binário de `decode_packed`."""
+    samples = np.empty(len(values), dtype=PACKED_SAMPLE)
+    samples["t"] = timestamps
+    samples["v"] = values
+    return samples.tobytes()
+
+
+class Reading(NamedTuple):
+    """Estado das entradas: valores e instantes na ordem de ``channels``."""
+    values: tuple
+    stamps: tuple
+    version: int
+
+
+class InputSnapshot:
+    """Valores mais recentes de cada canal: uma thread escreve, o loop lê sem trava.
+
+    O escritor monta a próxima leitura à parte (buffer de trás) e a publica
+    com uma única atribuição de referência (buffer da frente), que é atômica
+    no CPython. O leitor pega essa referência e nunca vê uma escrita pela
+    metade. Escritores concorrentes se excluem por uma trava só deles.
+    """
+
+    def __init__(self, channels, initial, stamp=0.0):
+        self.channels = tuple(channels)
+        self.index = {name: i for i, name in enumerate(self.channels)}
+        self._write_lock = threading.Lock()
+        self._front = Reading(tuple(float(v) for v in initial), (float(stamp),) * len(self.channels), 0)
+
+    def read(self):
+        return self._front
+
+    def write(self, updates):
+        """Publica ``{canal: (valor, instante)}`` numa nova versão."""
+        with self._write_lock:
+            front = self._front
+            values, stamps = list(front.values), list(front.stamps)
+            for name, (value, stamp) in updates.items():
+                i = self.index[name]
+                values[i], stamps[i] = float(value), float(stamp)
+            self._front = Reading(tuple(values), tuple(stamps), front.version + 1)
+
+
+class SensorIngest:
+    """Tabela tópico -> (canal, decodificador) sobre um `InputSnapshot`.
+
+    ``channels`` é ``{canal: valor inicial}``. ``clock`` (padrão:
+    ``time.time``) dá o instante de chegada, na mesma escala dos timestamps
+    dos lotes. Um timestamp à frente do relógio em mais de ``max_skew``
+    segundos é recusado: aceito, ele faria o canal descartar como antigas
+    todas as amostras seguintes até o relógio alcançá-lo.
+    """
+
+    def __init__(self, channels, clock=time.time, max_age=None, max_skew=5.0):
+        self.clock = clock
+        self.max_age = max_age
+        self.max_skew = max_skew
+        self.snapshot = InputSnapshot(channels.keys(), channels.values())
+        self.handlers = {}
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.samples = 0
+        self.malformed = 0
+        self.stale = 0
+
+    def route(self, topic, channel, decoder=decode_text):
+        if channel not in self.snapshot.index:
+            raise ValueError(f"canal desconhecido: {channel}")
+        self.handlers[topic] = (channel, decoder)
+        return self
+
+    def read(self):
+        return self.snapshot.read()
+
+    def set(self, **values):
+        """Define canais diretamente (reset), no instante atual."""
+        now = self.clock()
+        self.snapshot.write({name: (value, now) for name, value in values.items()})
+
+    def handle(self, topic, payload):
+        """Aplica uma mensagem; devolve False se o tópico não está na tabela."""
+        entry = self.handlers.get(topic)
+        if entry is None:
+            return False
+        channel, decoder = entry
+        now = self.clock()
+        with self._lock:
+            self.messages += 1
+            try:
+                stamps, values = decoder(payload)
+            except (ValueError, TypeError, UnicodeDecodeError, OverflowError):
+                self.malformed += 1
+                return True
+            if isinstance(values, float):
+                if not math.isfinite(values):
+                    self.malformed += 1
+                elif now < self.snapshot.read().stamps[self.snapshot.index[channel]]:
+                    self.stale += 1
+                else:
+                    self.samples += 1
+                    self.snapshot.write({channel: (values, now)})
+                return True
+            if stamps is None:
+                stamps = np.full(values.shape, now)
+            valid = np.isfinite(values) & np.isfinite(stamps)
+            if self.max_skew is not None:
+                valid &= stamps <= now + self.max_skew
+            fresh = valid & (stamps >= self.snapshot.read().stamps[self.snapshot.index[channel]])
+            if self.max_age is not None:
+                fresh &= stamps >= now - self.max_age
+            n_valid, n_fresh = int(valid.sum()), int(fresh.sum())
+            self.malformed += values.size - n_valid
+            self.stale += n_valid - n_fresh
+            if not n_fresh:
+                return True
+            self.samples += n_fresh
+            # Mais recente do lote; em empate, o que veio por último
+            k = values.size - 1 - int(np.argmax(np.where(fresh, stamps, -np.inf)[::-1]))
+            self.snapshot.write({channel: (values[k], stamps[k])})
+        return True
+
+    def stats(self):
+        return {"messages": self.messages, "samples": self.samples,
+                "malformed": self.malformed, "stale": self.stale,
+                "version": self.snapshot.read().version}
@@ -0,0 +1,230 @@
+"""Métricas de execução: histogramas e contadores de baixo custo.
+
+Feito para ficar sempre ligado no loop de 10 Hz ou mais rápido. Cada
+observação custa um ``bisect`` em limites fixos e algumas somas, sem
+alocação, trava nem armazenamento das amostras. Os valores são lidos sob
+demanda:
+
+- `Metrics.snapshot`: dicionário para publicar como JSON (tópico retido de
+  métricas em ``fuzzy_miso``);
+- `Metrics.prometheus_text`: formato texto do Prometheus, servido por
+  `serve_http` num endpoint local opcional.
+
+`StageTimer.lap` mede etapas consecutivas de um tick com uma única leitura
+de relógio por etapa. Leituras concorrentes (thread HTTP, thread do paho)
+podem ver um histograma no meio de uma atualização; para monitoramento
+isso é aceitável e evita travas no caminho quente.
+"""
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites dos buckets em segundos (50 µs a 1 s; acima disso cai em +Inf)
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram:
+    """Histograma de buckets fixos com soma, contagem e máximo."""
+
+    __slots__ = ("bounds", "counts", "sum", "count", "max")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Quantil aproximado: limite superior do bucket que contém ``q``."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        acc = 0
+        for k, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return self.bounds[k] if k < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "sum": self.sum, "max": self.max,
+                "mean": self.sum / self.count if self.count else 0.0,
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+
+class Metrics:
+    """Registro de histogramas, contadores e medidores.
+
+    Os nomes são os do Prometheus sem o prefixo; histogramas podem ter um
+    rótulo (por exemplo ``stage``). Medidores (``gauge``) são funções lidas só
+    na exportação, úteis para contadores que já existem em outros objetos
+    (`publicacao.Publisher.stats`, `renderizador.InferenceRenderer.stats`).
+    """
+
+    def __init__(self, prefix="fuzzy", buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.help = {}
+        self.histograms = {}   # nome -> {rótulo: Histogram}
+        self.labels = {}       # nome -> nome do rótulo (ou None)
+        self.counters = {}
+        self.gauges = {}
+        self._next_publish = None
+
+    def describe(self, name, help_text, label=None):
+        self.help[name] = help_text
+        if label is not None:
+            self.labels[name] = label
+
+    def histogram(self, name, label_value=None):
+        series = self.histograms.get(name)
+        if series is None:
+            series = self.histograms[name] = {}
+        hist = series.get(label_value)
+        if hist is None:
+            hist = series[label_value] = Histogram(self.buckets)
+        return hist
+
+    def observe(self, name, value, label_value=None):
+        self.histogram(name, label_value).observe(value)
+
+    def inc(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, fn, help_text=None):
+        """Registra ``fn()`` (número ou {rótulo: número}) como medidor ``name``."""
+        self.gauges[name] = fn
+        if help_text is not None:
+            self.help[name] = help_text
+
+    def timer(self, name, clock=time.perf_counter):
+        return StageTimer(self, name, clock)
+
+    def due(self, now, period):
+        """True uma vez a cada ``period`` segundos (para publicar o snapshot)."""
+        if period is None:
+            return False
+        if self._next_publish is None or now >= self._next_publish:
+            self._next_publish = now + period
+            return True
+        return False
+
+    def snapshot(self):
+        """Resumo serializável: histogramas (ms), contadores e medidores."""
+        hists = {}
+        for name, series in self.histograms.items():
+            for label_value, hist in list(series.items()):
+                key = name if label_value is None else f"{name}.{label_value}"
+                s = hist.summary()
+                hists[key] = {"count": s["count"], "mean_ms": s["mean"] * 1e3, "p50_ms": s["p50"] * 1e3,
+                              "p99_ms": s["p99"] * 1e3, "max_ms": s["max"] * 1e3}
+        return {"histograms": hists, "counters": dict(self.counters),
+                "gauges": {name: _read_gauge(fn) for name, fn in self.gauges.items()}}
+
+    def prometheus_text(self):
+        """Exposição no formato texto 0.0.4 do Prometheus."""
+        p = self.prefix
+        lines = []
+        for name, series in self.histograms.items():
+            full = f"{p}_{name}"
+            lines += _header(full, self.help.get(name), "histogram")
+            label = self.labels.get(name, "label")
+            for label_value, hist in list(series.items()):
+                base = "" if label_value is None else f'{label}="{label_value}",'
+                acc = 0
+                for bound, c in zip(hist.bounds, hist.counts):
+                    acc += c
+                    lines.append(f'{full}_bucket{{{base}le="{bound:g}"}} {acc}')
+                lines.append(f'{full}_bucket{{{base}le="+Inf"}} {hist.count}')
+                tags = "" if label_value is None else f"{{{base[:-1]}}}"
+                lines.append(f"{full}_sum{tags} {hist.sum!r}")
+                lines.append(f"{full}_count{tags} {hist.count}")
+        for name, value in list(self.counters.items()):
+            lines += _header(f"{p}_{name}", self.help.get(name), "counter")
+            lines.append(f"{p}_{name} {value}")
+        for name, fn in self.gauges.items():
+            value = _read_gauge(fn)
+            lines += _header(f"{p}_{name}", self.help.get(name), "gauge")
+            if isinstance(value, dict):
+                for key, v in value.items():
+                    lines.append(f'{p}_{name}{{key="{key}"}} {v}')
+            elif value is not None:
+                lines.append(f"{p}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Cronômetro de etapas consecutivas, registradas em ``name{label=etapa}``.
+
+    Uso::
+
+        t = timer.start()
+        ...                     # etapa 1
+        t = timer.lap("compute", t)
+        ...                     # etapa 2
+        t = timer.lap("publish", t)
+    """
+
+    __slots__ = ("metrics", "name", "clock")
+
+    def __init__(self, metrics, name, clock=time.perf_counter):
+        self.metrics = metrics
+        self.name = name
+        self.clock = clock
+
+    def start(self):
+        return self.clock()
+
+    def lap(self, stage, t0):
+        now = self.clock()
+        self.metrics.histogram(self.name, stage).observe(now - t0)
+        return now
+
+
+def _header(name, help_text, kind):
+    lines = []
+    if help_text:
+        lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    return lines
+
+
+def _read_gauge(fn):
+    try:
+        return fn()
+    except Exception:
+        return None
+
+
+def serve_http(metrics, port, host="127.0.0.1"):
+    """Serve ``/metrics`` (texto do Prometheus) numa thread daemon; devolve o servidor."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
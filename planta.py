@@ -0,0 +1,19 @@
+"""Modelo térmico da sala (planta) usado pelo controlador.
+
+Equação de diferenças de primeira ordem:
+
+    T_next = 0.9*T_n - 0.072*PCRAC + 0.045*Qest + 0.02*Text + 3.5
+
+Funciona tanto com escalares quanto com arrays NumPy (uma posição por zona
+ou por cenário).
+"""
+
+# Coeficientes de inércia, resfriamento, carga térmica, temperatura externa
+# e aquecimento de base, nesta ordem.
+PLANT_COEFFS = (0.9, 0.072, 0.045, 0.02, 3.5)
+
+
+def plant_step(T_n, pcrac, Qest, Text, coeffs=PLANT_COEFFS):
+    """Temperatura da sala no próximo passo."""
+    a, b, c, d, e = coeffs
+    return (a * T_n) - (b * pcrac) + (c * Qest) + (d * Text) + e
@@ -0,0 +1,271 @@
+"""Controlador multi-zona dividido entre processos.
+
+O processo principal é o gateway: é o único com conexão MQTT, recebe as
+entradas, publica as saídas e roda os alertas. Cada um dos N processos de
+zona calcula o passo fuzzy e a planta de uma fatia contígua das zonas. Nada
+de estado passa por mensagens serializadas. Tudo fica num bloco de
+`multiprocessing.shared_memory` com um array float64 (zonas,) por campo
+(`STATE_FIELDS`), e cada tick é sinalizado por semáforos.
+
+A cada tick, o worker lê o estado confirmado (``T``, ``erro_anterior``,
+``pcrac``) e as entradas (``Text``, ``Qest``) da sua fatia. Ele escreve só
+os campos de saída (``erro``, ``var_erro``, ``pcrac_next``, ``T_next``).
+Quem confirma o novo estado é o gateway, depois que todos terminam. Se um
+worker morre no meio do tick, o estado confirmado continua intacto. O
+worker é recriado e refaz o mesmo tick, com o mesmo resultado.
+"""
+import multiprocessing
+import signal
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from zonas import ZoneController, ZoneStep
+
+STATE_FIELDS = ("T", "erro_anterior", "pcrac", "Text", "Qest", "erro", "var_erro", "pcrac_next", "T_next")
+
+
+class SharedZoneState:
+    """Um array (zonas,) float64 por campo de `STATE_FIELDS`, em memória compartilhada.
+
+    Sem ``name`` cria o bloco; com ``name`` se conecta a um bloco existente.
+    """
+
+    def __init__(self, n, name=None):
+        create = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=create,
+                                              size=max(len(STATE_FIELDS) * n * 8, 8))
+        self.name = self.shm.name
+        self._data = np.ndarray((len(STATE_FIELDS), n), dtype=float, buffer=self.shm.buf)
+        if create:
+            self._data[:] = 0.0
+        for i, field in enumerate(STATE_FIELDS):
+            setattr(self, field, self._data[i])
+
+    def close(self):
+        # O bloco só pode ser fechado sem nenhuma view numpy viva
+        for field in STATE_FIELDS:
+            setattr(self, field, None)
+        self._data = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class EngineCompute:
+    """``compute_pcrac`` que pode ser enviado aos processos: um `inferencia.BatchInference`."""
+
+    def __init__(self, engine, centroid_method="skfuzzy"):
+        self.engine = engine
+        self.centroid_method = centroid_method
+
+    def __call__(self, erro, var_erro):
+        return self.engine.evaluate(erro, var_erro, centroid_method=self.centroid_method).output
+
+
+def _worker_main(shm_name, n, lo, hi, compute, plant, setpoint, ready, start, done, stop, conn):
+    """Processo de zona: a cada sinal em ``start``, calcula a fatia ``[lo, hi)``."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl+C é tratado pelo gateway, que encerra os workers
+    state = SharedZoneState(n, shm_name)
+    sl = slice(lo, hi)
+    ready.set()
+    try:
+        while True:
+            start.acquire()
+            if stop.is_set():
+                break
+            while conn.poll():
+                compute = conn.recv()    # base de regras trocada em execução
+            erro = state.T[sl] - setpoint
+            var_erro = erro - state.erro_anterior[sl]
+            out = np.asarray(compute(erro, var_erro), dtype=float)
+            pcrac = np.where(np.isnan(out), state.pcrac[sl], out)
+            state.erro[sl] = erro
+            state.var_erro[sl] = var_erro
+            state.pcrac_next[sl] = pcrac
+            state.T_next[sl] = plant(state.T[sl], pcrac, state.Qest[sl], state.Text[sl])
+            done.release()
+    finally:
+        state.close()
+
+
+class _Worker:
+    def __init__(self, ctx, lo, hi):
+        self.lo, self.hi = lo, hi
+        self.ready = ctx.Event()
+        self.start = ctx.Semaphore(0)
+        self.done = ctx.Semaphore(0)
+        self.conn, self.child_conn = ctx.Pipe()
+        self.process = None
+        self.failures = 0
+
+
+class ShardedZoneController(ZoneController):
+    """`zonas.ZoneController` com o passo dividido entre ``workers`` processos.
+
+    Mesma interface (entradas, reset, ``step``, alertas), então serve para
+    `fuzzy_miso.run_zones` sem mudanças. Os arrays ``T``, ``erro_anterior``,
+    ``pcrac``, ``Text`` e ``Qest`` são views da memória compartilhada.
+    ``compute_pcrac`` precisa poder ser serializado (uma ``ControlSurface``
+    ou um `EngineCompute`). Atribuir um novo valor a ele envia a troca aos
+    processos, que a aplicam no tick seguinte. Um worker que morre é
+    recriado. Um worker que não termina em ``timeout`` segundos é encerrado
+    e recriado. ``max_restarts`` falhas seguidas do mesmo worker levantam
+    RuntimeError.
+    """
+
+    def __init__(self, zones, compute_pcrac, *, workers=2, timeout=5.0, startup_timeout=60.0,
+                 max_restarts=5, **kwargs):
+        super().__init__(zones, compute_pcrac, **kwargs)
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        n = len(self.zones)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._state = SharedZoneState(n)
+        for field in ("T", "erro_anterior", "pcrac", "Text", "Qest"):
+            shared = getattr(self._state, field)
+            shared[:] = getattr(self, field)
+            setattr(self, field, shared)
+        bounds = np.linspace(0, n, min(workers, n) + 1).round().astype(int)
+        self._workers = [_Worker(self._ctx, int(lo), int(hi)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        for worker in self._workers:
+            self._spawn(worker)
+        for worker in self._workers:
+            if not worker.ready.wait(startup_timeout):
+                self.close()
+                raise RuntimeError(f"processo das zonas {worker.lo}..{worker.hi - 1} não iniciou")
+
+    @property
+    def compute_pcrac(self):
+        return self._compute
+
+    @compute_pcrac.setter
+    def compute_pcrac(self, compute):
+        self._compute = compute
+        for worker in getattr(self, "_workers", ()):
+            worker.conn.send(compute)
+
+    def _spawn(self, worker):
+        while worker.conn.poll():        # trocas antigas: o processo novo já recebe a atual
+            worker.conn.recv()
+        worker.process = self._ctx.Process(
+            target=_worker_main, name=f"zonas-{worker.lo}-{worker.hi}", daemon=True,
+            args=(self._state.name, len(self.zones), worker.lo, worker.hi, self._compute, self.plant,
+                  self.setpoint, worker.ready, worker.start, worker.done, self._stop, worker.child_conn))
+        worker.process.start()
+
+    def _restart(self, i):
+        old = self._workers[i]
+        if old.process.is_alive():
+            old.process.terminate()
+        old.process.join(1.0)
+        old.failures += 1
+        if old.failures > self.max_restarts:
+            raise RuntimeError(f"processo das zonas {old.lo}..{old.hi - 1} falhou {old.failures} vezes seguidas")
+        # Semáforos novos: o processo morto pode ter consumido o sinal do tick
+        worker = _Worker(self._ctx, old.lo, old.hi)
+        worker.failures = old.failures
+        self._workers[i] = worker
+        self._spawn(worker)
+        self.restarts += 1
+        # O tempo de partida não conta para ``timeout``; se não iniciar, _wait tenta de novo
+        worker.ready.wait(self.startup_timeout)
+        worker.start.release()
+
+    def _wait(self, i, started):
+        while True:
+            worker = self._workers[i]
+            if worker.done.acquire(timeout=0.05):
+                worker.failures = 0
+                return
+            if not worker.process.is_alive() or time.monotonic() - started > self.timeout:
+                self._restart(i)
+                started = time.monotonic()
+
+    def step(self, now=None):
+        if now is None:
+            now = self.ticks * self.loop_interval
+        self.ticks += 1
+        self.apply_inputs()              # com os processos parados
+        for worker in self._workers:
+            worker.start.release()
+        started = time.monotonic()
+        for i in range(len(self._workers)):
+            self._wait(i, started)
+
+        # Todos terminaram: o gateway confirma o novo estado
+        s = self._state
+        erro, var_erro, T_next = s.erro.copy(), s.var_erro.copy(), s.T_next.copy()
+        self.pcrac[:] = s.pcrac_next
+        alerts = self._check_alerts(erro, T_next, now)
+        self.erro_anterior[:] = erro
+        self.T[:] = T_next
+        return ZoneStep(erro, var_erro, self.pcrac.copy(), T_next, alerts)
+
+    def worker_pids(self):
+        return [w.process.pid for w in self._workers]
+
+    def stats(self):
+        return {"workers": len(self._workers), "ticks": self.ticks, "restarts": self.restarts,
+                "slices": [(w.lo, w.hi) for w in self._workers]}
+
+    def close(self, timeout=2.0):
+        """Para os processos e libera a memória compartilhada (o estado é copiado antes)."""
+        if self._state is None:
+            return
+        self._stop.set()
+        for worker in self._workers:
+            worker.start.release()
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        for field in ("T", "erro_anterior", "pcrac", "Text", "Qest"):
+            setattr(self, field, getattr(self, field).copy())
+        self._state.close()
+        self._state.unlink()
+        self._state = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def measure_scaling(make_controller, zones, worker_counts, ticks=50):
+    """Ticks por segundo para cada quantidade de processos (0: um processo só)."""
+    results = []
+    for workers in worker_counts:
+        controller = make_controller(zones, workers)
+        try:
+            controller.Qest[:] = np.linspace(10.0, 90.0, zones)
+            controller.Text[:] = np.linspace(15.0, 40.0, zones)
+            controller.step()                  # aquece os processos
+            t0 = time.perf_counter()
+            for _ in range(ticks):
+                controller.step()
+            elapsed = time.perf_counter() - t0
+        finally:
+            if workers:
+                controller.close()
+        results.append({"workers": workers, "ticks_per_sec": ticks / elapsed,
+                        "zone_steps_per_sec": ticks * zones / elapsed})
+    return results
+
+
+if __name__ == "__main__":
+    import os
+    import fuzzy_miso as app
+
+    def make(zones, workers):
+        app.ZONE_WORKERS = workers
+        return app.build_zone_controller(zones)
+
+    counts = [0] + [w for w in (1, 2, 4, 8, 16) if w <= (os.cpu_count() or 1)]
+    for row in measure_scaling(make, 20000, counts, ticks=20):
+        print(f"{row['workers']:>2} processos: {row['ticks_per_sec']:.1f} ticks/s, "
+              f"{row['zone_steps_per_sec']:.0f} zonas/s")
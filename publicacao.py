@@ -0,0 +1,202 @@
+"""Camada de publicação MQTT com filas limitadas por tópico.
+
+O loop de controle chama `Publisher.publish` no lugar de ``client.publish``.
+A chamada só coloca a mensagem numa fila em memória e nunca espera pela rede.
+Uma thread em segundo plano entrega as filas ao cliente paho e limita as
+mensagens em voo, ou seja, entregues ao paho e ainda não escritas no
+socket. Com o broker lento, a fila interna do paho não cresce sem limite:
+as mensagens esperam nas filas daqui, que têm tamanho máximo.
+
+Cada tópico tem uma política (`TopicPolicy`):
+
+- ``latest=True``: só o valor mais recente importa (telemetria, controle,
+  imagens). Uma nova mensagem substitui a pendente, e a substituída conta
+  como descartada;
+- ``latest=False``: fila FIFO com até ``maxlen`` mensagens (alertas, quadros
+  binários). Quando a fila está cheia, a mais antiga é descartada.
+
+As políticas são indexadas por filtro de tópico MQTT (``+`` e ``#``), por
+exemplo ``"datacenter/fuzzy/+/control"``. Contadores de enfileiradas,
+enviadas, descartadas, erros e em voo ficam em `Publisher.stats`.
+"""
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+TopicPolicy = namedtuple("TopicPolicy", ["latest", "maxlen"])
+TopicPolicy.__new__.__defaults__ = (False, 100)
+TopicPolicy.__doc__ = """Política de fila de um tópico.
+
+latest : True mantém só a mensagem mais recente pendente
+maxlen : tamanho máximo da fila FIFO (ignorado com latest)
+"""
+
+LATEST = TopicPolicy(latest=True, maxlen=1)
+
+
+def topic_matches(pattern, topic):
+    """True se ``topic`` casa com o filtro MQTT ``pattern`` (``+`` e ``#``)."""
+    p_parts = pattern.split("/")
+    t_parts = topic.split("/")
+    for k, part in enumerate(p_parts):
+        if part == "#":
+            return True
+        if k >= len(t_parts) or (part != "+" and part != t_parts[k]):
+            return False
+    return len(p_parts) == len(t_parts)
+
+
+class Publisher:
+    """Filas de saída limitadas na frente de um cliente MQTT.
+
+    Tem a mesma assinatura de ``client.publish(topic, payload, qos, retain)``
+    e pode ser passado onde o código espera um cliente
+    (`fuzzy_miso.publish_alert`, `fuzzy_miso.publish_zone_step`, ...).
+    ``policies`` é ``{filtro: TopicPolicy}``; o primeiro filtro que casa
+    vale, e tópicos sem filtro usam ``default``. ``max_inflight`` limita as
+    mensagens entregues ao paho e ainda não publicadas.
+
+    Sem `start`, nada é enviado até uma chamada a `drain` (útil em testes e
+    em loops síncronos).
+    """
+
+    def __init__(self, client, policies=None, default=TopicPolicy(), max_inflight=20,
+                 poll_interval=0.01):
+        if max_inflight < 1:
+            raise ValueError("max_inflight deve ser >= 1")
+        self.client = client
+        self.policies = list((policies or {}).items())
+        self.default = default
+        self.max_inflight = max_inflight
+        self.poll_interval = poll_interval
+
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()   # tópico -> deque de (payload, qos, retain)
+        self._policy_cache = {}
+        self._inflight = deque()
+        self._stopping = False
+        self._thread = None
+
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        self.dropped_by_topic = {}
+
+    def policy(self, topic):
+        """Política aplicada a ``topic`` (resolvida uma vez por tópico)."""
+        policy = self._policy_cache.get(topic)
+        if policy is None:
+            policy = next((p for pattern, p in self.policies if topic_matches(pattern, topic)), self.default)
+            self._policy_cache[topic] = policy
+        return policy
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        """Enfileira a mensagem; retorna imediatamente, sem I/O de rede."""
+        with self._cond:
+            queue = self._queues.get(topic)
+            if queue is None:
+                policy = self.policy(topic)
+                queue = self._queues[topic] = deque(maxlen=1 if policy.latest else policy.maxlen)
+            if len(queue) == queue.maxlen:
+                self.dropped += 1
+                self.dropped_by_topic[topic] = self.dropped_by_topic.get(topic, 0) + 1
+            queue.append((payload, qos, retain))
+            self.enqueued += 1
+            self._cond.notify()
+
+    def queued(self):
+        """Mensagens aguardando envio, somadas em todas as filas."""
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    def inflight(self):
+        """Mensagens entregues ao cliente e ainda não publicadas."""
+        with self._cond:
+            self._prune()
+            return len(self._inflight)
+
+    def drain(self):
+        """Entrega ao cliente o que couber no limite de voo; retorna quantas enviou."""
+        count = 0
+        while True:
+            with self._cond:
+                self._prune()
+                if len(self._inflight) >= self.max_inflight:
+                    return count
+                item = self._next()
+            if item is None:
+                return count
+            topic, (payload, qos, retain) = item
+            try:
+                info = self.client.publish(topic, payload, qos=qos, retain=retain)
+            except Exception:
+                info = None
+            with self._cond:
+                rc = getattr(info, "rc", 0)
+                if info is None or (isinstance(rc, int) and rc != 0):
+                    self.errors += 1
+                else:
+                    self.sent += 1
+                    if hasattr(info, "is_published"):
+                        self._inflight.append(info)
+            count += 1
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="mqtt-publisher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """Tenta esvaziar as filas por até ``timeout`` segundos e para a thread."""
+        deadline = time.monotonic() + timeout
+        if self._thread is None:
+            self.drain()
+        else:
+            while self.queued() and time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+            with self._cond:
+                self._stopping = True
+                self._cond.notify()
+            self._thread.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        with self._cond:
+            self._prune()
+            return {"enqueued": self.enqueued, "sent": self.sent, "dropped": self.dropped,
+                    "errors": self.errors, "queued": sum(len(q) for q in self._queues.values()),
+                    "inflight": len(self._inflight), "dropped_by_topic": dict(self.dropped_by_topic)}
+
+    def _prune(self):
+        inflight = self._inflight
+        while inflight and _is_published(inflight[0]):
+            inflight.popleft()
+
+    def _next(self):
+        # Um por tópico, em rodízio, para que uma fila cheia não atrase as outras
+        for topic, queue in self._queues.items():
+            if queue:
+                self._queues.move_to_end(topic)
+                return topic, queue.popleft()
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping and not any(self._queues.values()):
+                    self._cond.wait()
+                if self._stopping:
+                    return
+            self.drain()
+            with self._cond:
+                if len(self._inflight) >= self.max_inflight and not self._stopping:
+                    # paho ainda não escreveu no socket: espera em vez de empilhar
+                    self._cond.wait(self.poll_interval)
+
+
+def _is_published(info):
+    try:
+        return bool(info.is_published())
+    except Exception:
+        return True
@@ -0,0 +1,346 @@
+"""Renderização da imagem de inferência fora do loop de controle.
+
+O loop entrega o ponto de operação mais recente com `InferenceRenderer.submit`
+sem bloquear. Um worker em segundo plano renderiza apenas o pedido mais
+recente (pedidos antigos ainda não renderizados são descartados), respeita o
+período mínimo entre publicações e reutiliza uma única figura, atualizando
+os artistas em vez de recriar os eixos a cada quadro.
+
+No modo "thread" a figura vive numa thread do próprio processo; no modo
+"process" ela vive num processo filho, e a thread do worker apenas espera o
+PNG pelo pipe, sem disputar o GIL com o loop de controle.
+
+Com um `RenderCache`, imagens já renderizadas são reaproveitadas pelo ponto
+de operação quantizado, e um ponto que não mudou desde a última publicação
+não é publicado de novo. `InferenceRenderer.set_terms` troca as funções de
+pertinência desenhadas (base de regras trocada em execução) e esvazia o cache.
+"""
+import base64
+import io
+import math
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+RENDER_MODES = ("thread", "process")
+
+
+class InferenceFigure:
+    """Figura de 3 eixos (erro, var_erro, pcrac) reutilizada entre quadros.
+
+    Mesmo layout de `fuzzy_miso.plot_inference`; só as linhas verticais, a
+    área de agregação e os textos da legenda mudam a cada quadro.
+    """
+
+    def __init__(self, pcrac_universe, antecedents, consequents_terms):
+        self.pcrac_universe = np.asarray(pcrac_universe, dtype=float)
+        self.fig = Figure(figsize=(9, 12))
+        self.canvas = FigureCanvasAgg(self.fig)
+        axes = self.fig.subplots(3, 1)
+
+        ax = axes[0]
+        for label, mf in antecedents['errotemp'][1].items():
+            ax.plot(antecedents['errotemp'][0], mf, label=f"erro:{label}")
+        self.erro_line = ax.axvline(0.0, color='k', linestyle='--', label="erro=0.00")
+        ax.set_title("Erro (errotemp)")
+        self.erro_text = self._legend_text(ax.legend(loc='upper right', fontsize='small'), "erro=")
+
+        ax = axes[1]
+        for label, mf in antecedents['varerrotemp'][1].items():
+            ax.plot(antecedents['varerrotemp'][0], mf, label=f"var:{label}")
+        self.var_line = ax.axvline(0.0, color='k', linestyle='--', label="var=0.000")
+        ax.set_title("Variação do erro (varerrotemp)")
+        self.var_text = self._legend_text(ax.legend(loc='upper right', fontsize='small'), "var=")
+
+        ax = axes[2]
+        for label, mf in consequents_terms.items():
+            ax.plot(self.pcrac_universe, mf, color='gray', alpha=0.4)
+        self.agg_fill = ax.fill_between(self.pcrac_universe, np.zeros_like(self.pcrac_universe),
+                                        color='red', alpha=0.5, label='agregação')
+        self.defuzz_line = ax.axvline(0.0, color='blue', linestyle='--', linewidth=1.5, label='defuzz=0.00')
+        ax.set_title("Consequente (pcrac) - agregação e defuzzificação")
+        self.defuzz_text = self._legend_text(ax.legend(loc='upper right', fontsize='small'), "defuzz=")
+
+        self.fig.tight_layout()
+
+    @staticmethod
+    def _legend_text(legend, prefix):
+        for text in legend.get_texts():
+            if text.get_text().startswith(prefix):
+                return text
+        raise ValueError(prefix)
+
+    def render(self, erro_val, varerro_val, agg_mu, defuzz_val):
+        """Atualiza os artistas e devolve o PNG como data URI base64."""
+        self.erro_line.set_xdata([erro_val, erro_val])
+        self.erro_text.set_text(f"erro={erro_val:.2f}")
+        self.var_line.set_xdata([varerro_val, varerro_val])
+        self.var_text.set_text(f"var={varerro_val:.3f}")
+
+        x = self.pcrac_universe
+        mu = np.asarray(agg_mu, dtype=float)
+        verts = np.concatenate([[[x[0], 0.0]], np.column_stack([x, mu]), [[x[-1], 0.0]]])
+        self.agg_fill.set_verts([verts])
+        self.defuzz_line.set_xdata([defuzz_val, defuzz_val])
+        self.defuzz_text.set_text(f"defuzz={defuzz_val:.2f}")
+
+        buf = io.BytesIO()
+        self.canvas.print_png(buf)
+        return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode('utf-8')
+
+
+class RenderCache:
+    """Cache LRU de data URIs, endereçado pelo ponto de operação quantizado.
+
+    A chave é ``(erro, var_erro, defuzz)`` dividido por ``quantum`` e
+    arredondado; pontos na mesma célula reaproveitam a imagem da primeira
+    renderização. O cache respeita ``max_entries`` e ``max_bytes`` (tamanho
+    das strings), descartando as menos usadas recentemente.
+    """
+
+    def __init__(self, quantum=(0.1, 0.01, 0.5), max_entries=64, max_bytes=16 * 1024 * 1024):
+        if len(quantum) != 3 or min(quantum) <= 0:
+            raise ValueError("quantum deve ter 3 passos positivos (erro, var_erro, defuzz)")
+        self.quantum = tuple(float(q) for q in quantum)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, erro_val, varerro_val, defuzz_val):
+        """Célula do ponto de operação; None (sem cache) se algum valor não é finito."""
+        if not (math.isfinite(erro_val) and math.isfinite(varerro_val) and math.isfinite(defuzz_val)):
+            return None             # defuzz é NaN quando nenhuma regra dispara
+        qe, qv, qd = self.quantum
+        return (round(erro_val / qe), round(varerro_val / qv), round(defuzz_val / qd))
+
+    def get(self, key):
+        img = self._entries.get(key)
+        if img is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return img
+
+    def put(self, key, img):
+        if key in self._entries:
+            self.bytes -= len(self._entries.pop(key))
+        if len(img) > self.max_bytes:
+            return
+        self._entries[key] = img
+        self.bytes += len(img)
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.bytes -= len(old)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "bytes": self.bytes, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+def _render_process_main(conn, figure_args):
+    """Processo filho: mantém a figura e responde a cada pedido com o PNG."""
+    figure = InferenceFigure(*figure_args)
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        if job[0] == "figure":
+            figure = InferenceFigure(*job[1])
+            continue
+        try:
+            conn.send(figure.render(*job))
+        except Exception as exc:
+            conn.send(exc)
+    conn.close()
+
+
+class InferenceRenderer:
+    """Worker de renderização "só o mais recente" com período mínimo de publicação.
+
+    ``publish(img_data)`` é chamado pelo worker com cada imagem renderizada.
+    ``submit`` nunca espera pela renderização: se já houver um pedido
+    pendente, ele é substituído e contado em ``dropped``.
+
+    Com ``cache`` (`RenderCache`), um ponto cuja chave é igual à da última
+    publicação é descartado e contado em ``suppressed``, exceto quando a
+    última publicação tem mais de ``resend_after`` segundos (para quem
+    assinar o tópico depois); nas demais, a imagem vem do cache se possível.
+    """
+
+    def __init__(self, publish, pcrac_universe, antecedents, consequents_terms,
+                 period=10.0, mode="thread", clock=time.monotonic, cache=None, resend_after=None):
+        if mode not in RENDER_MODES:
+            raise ValueError(f"mode deve ser um de {RENDER_MODES}")
+        self.publish = publish
+        self.period = period
+        self.mode = mode
+        self.clock = clock
+        self.cache = cache
+        self.resend_after = resend_after
+        self._figure_args = self._make_figure_args(pcrac_universe, antecedents, consequents_terms)
+        self._new_figure_args = None
+
+        self._cond = threading.Condition()
+        self._pending = None
+        self._stopping = False
+        self._thread = None
+        self._figure = None
+        self._proc = None
+        self._conn = None
+        self._last_render_at = None
+        self._last_key = None
+
+        self.submitted = 0
+        self.rendered = 0
+        self.published = 0
+        self.suppressed = 0
+        self.dropped = 0
+        self.errors = 0
+
+    @staticmethod
+    def _make_figure_args(pcrac_universe, antecedents, consequents_terms):
+        return (np.asarray(pcrac_universe, dtype=float),
+                {name: (np.asarray(u), {label: np.asarray(mf) for label, mf in terms.items()})
+                 for name, (u, terms) in antecedents.items()},
+                {label: np.asarray(mf) for label, mf in consequents_terms.items()})
+
+    def set_terms(self, pcrac_universe, antecedents, consequents_terms):
+        """Troca as funções de pertinência desenhadas a partir do próximo quadro."""
+        args = self._make_figure_args(pcrac_universe, antecedents, consequents_terms)
+        with self._cond:
+            self._new_figure_args = args
+
+    def _replace_figure(self, figure_args):
+        # Imagens antigas mostram as funções anteriores: nada do cache vale mais
+        self._figure_args = figure_args
+        self._figure = None
+        if self._proc is not None:
+            self._conn.send(("figure", figure_args))
+        if self.cache is not None:
+            self.cache.clear()
+        self._last_key = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        if self.mode == "process":
+            ctx = multiprocessing.get_context("spawn")
+            self._conn, child_conn = ctx.Pipe()
+            proc = ctx.Process(target=_render_process_main, args=(child_conn, self._figure_args),
+                               daemon=True, name="inference-renderer")
+            proc.start()
+            child_conn.close()
+            self._proc = proc
+        self._thread = threading.Thread(target=self._run, name="inference-renderer", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, erro_val, varerro_val, agg_mu, defuzz_val):
+        """Entrega o ponto de operação mais recente ao worker (não bloqueia)."""
+        job = (float(erro_val), float(varerro_val), np.array(agg_mu, dtype=float), float(defuzz_val))
+        with self._cond:
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = job
+            self.submitted += 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {"submitted": self.submitted, "rendered": self.rendered,
+                    "published": self.published, "suppressed": self.suppressed,
+                    "dropped": self.dropped, "errors": self.errors,
+                    "pending": self._pending is not None}
+
+    def stop(self, timeout=2.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._proc is not None:
+            try:
+                self._conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            self._proc.join(timeout)
+            if self._proc.is_alive():
+                self._proc.terminate()
+            self._conn.close()
+
+    def _resend_due(self):
+        return self.resend_after is not None and self.clock() - self._last_render_at >= self.resend_after
+
+    def _render(self, job):
+        if self._proc is None:
+            if self._figure is None:
+                self._figure = InferenceFigure(*self._figure_args)
+            return self._figure.render(*job)
+        self._conn.send(job)
+        result = self._conn.recv()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                if self._last_render_at is not None and self.period:
+                    wait_s = self._last_render_at + self.period - self.clock()
+                    if wait_s > 0:
+                        # Novos pedidos que chegarem até lá substituem este
+                        self._cond.wait(wait_s)
+                        continue
+                job = self._pending
+                self._pending = None
+                figure_args, self._new_figure_args = self._new_figure_args, None
+                if figure_args is not None:
+                    self._replace_figure(figure_args)
+                try:
+                    key = None if self.cache is None else self.cache.key(job[0], job[1], job[3])
+                except Exception:
+                    self.errors += 1
+                    continue
+                if key is not None and key == self._last_key and not self._resend_due():
+                    # Ponto parado: a última imagem publicada continua valendo
+                    self.suppressed += 1
+                    continue
+                self._last_render_at = self.clock()
+            try:
+                img_data = None if key is None else self.cache.get(key)
+                fresh = img_data is None
+                if fresh:
+                    img_data = self._render(job)
+                    if key is not None:
+                        self.cache.put(key, img_data)
+                self.publish(img_data)
+                self._last_key = key
+                with self._cond:
+                    self.rendered += fresh
+                    self.published += 1
+            except Exception:
+                with self._cond:
+                    self.errors += 1
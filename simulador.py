@@ -0,0 +1,122 @@
+"""Simulação headless (sem MQTT e sem sleep) do controlador com a planta.
+
+Avança o controlador fuzzy e o modelo térmico o mais rápido possível a
+partir de séries temporais de ``Text`` e ``Qest``. Vários cenários rodam lado
+a lado como zonas de um `zonas.ZoneController`, então uma varredura de
+milhares de perfis de clima/carga custa um laço Python por passo, não por
+cenário.
+
+Exemplo::
+
+    from simulador import simulate_scenarios
+    res = simulate_scenarios(Text=np.full((3600, 500), 30.0), Qest=perfis_carga, T0=22.0)
+    res.T[-1], res.alerts
+"""
+from collections import namedtuple
+import numpy as np
+
+SimulationResult = namedtuple("SimulationResult", ["T", "pcrac", "erro", "var_erro", "alerts", "zones"])
+SimulationResult.__doc__ = """Trajetórias de uma simulação headless.
+
+T        : (passos + 1, cenários) temperatura; T[0] é a condição inicial
+pcrac    : (passos, cenários) PCRAC aplicado em cada passo
+erro     : (passos, cenários) erro T_n - setpoint
+var_erro : (passos, cenários) variação do erro
+alerts   : lista de (passo, zona, alert_type, message, data, severity)
+zones    : nomes dos cenários, na ordem das colunas
+"""
+
+
+def _series(values, steps, n, name):
+    arr = np.asarray(values, dtype=float)
+    if arr.ndim == 0:
+        return np.broadcast_to(arr, (steps, n))
+    if arr.ndim == 1:
+        arr = arr[:, None]
+    if arr.ndim != 2 or arr.shape[0] < steps or arr.shape[1] not in (1, n):
+        raise ValueError(f"{name} deve ser escalar, (passos,) ou (passos, {n}); recebido {np.shape(values)}")
+    return np.broadcast_to(arr[:steps], (steps, n))
+
+
+def _series_length(*series):
+    lengths = [np.shape(s)[0] for s in series if np.ndim(s) > 0]
+    return min(lengths) if lengths else None
+
+
+def simulate(controller, Text, Qest, steps=None):
+    """Executa ``steps`` ticks do ``controller`` com as perturbações dadas.
+
+    ``Text`` e ``Qest`` podem ser escalares (constantes), séries (passos,)
+    comuns a todas as zonas ou matrizes (passos, zonas). Sem ``steps``, usa o
+    comprimento das séries. O estado do controlador avança; para repetir a
+    simulação crie um controlador novo.
+    """
+    if steps is None:
+        steps = _series_length(Text, Qest)
+        if steps is None:
+            raise ValueError("informe steps quando Text e Qest forem constantes")
+    n = len(controller)
+    Text = _series(Text, steps, n, "Text")
+    Qest = _series(Qest, steps, n, "Qest")
+
+    T = np.empty((steps + 1, n))
+    pcrac = np.empty((steps, n))
+    erro = np.empty((steps, n))
+    var_erro = np.empty((steps, n))
+    alerts = []
+
+    T[0] = controller.T
+    for k in range(steps):
+        controller.Text[:] = Text[k]
+        controller.Qest[:] = Qest[k]
+        res = controller.step()
+        T[k + 1] = res.T_next
+        pcrac[k] = res.pcrac
+        erro[k] = res.erro
+        var_erro[k] = res.var_erro
+        for alert in res.alerts:
+            alerts.append((k,) + alert)
+
+    return SimulationResult(T, pcrac, erro, var_erro, alerts, list(controller.zones))
+
+
+def simulate_scenarios(Text, Qest, T0=22.0, steps=None, factory=None, names=None):
+    """Cria um controlador com um cenário por coluna e simula todos juntos.
+
+    O número de cenários vem das colunas de ``Text``/``Qest`` (matrizes
+    (passos, cenários)), do tamanho de ``T0`` ou de ``names``. ``factory(zonas)``
+    cria o `ZoneController` (padrão: ``fuzzy_miso.build_zone_controller``).
+    """
+    sizes = {np.shape(s)[1] for s in (Text, Qest) if np.ndim(s) == 2}
+    if np.ndim(T0) == 1:
+        sizes.add(np.shape(T0)[0])
+    if names is not None:
+        sizes.add(len(names))
+    sizes.discard(1)
+    if len(sizes) > 1:
+        raise ValueError(f"quantidades de cenários incompatíveis: {sorted(sizes)}")
+    n = sizes.pop() if sizes else 1
+    if names is None:
+        names = [str(i) for i in range(n)]
+
+    if factory is None:
+        from fuzzy_miso import build_zone_controller as factory
+    controller = factory(list(names))
+    controller.T[:] = T0
+    return simulate(controller, Text, Qest, steps)
+
+
+def summarize(result, loop_interval, t_low, t_high):
+    """Métricas por cenário: energia (PCRAC integrado), tempo fora da faixa, extremos e alertas."""
+    T = result.T[1:]
+    alert_counts = np.zeros(T.shape[1], dtype=int)
+    index = {z: i for i, z in enumerate(result.zones)}
+    for alert in result.alerts:
+        alert_counts[index[alert[1]]] += 1
+    return {
+        "energy": result.pcrac.sum(axis=0) * loop_interval,
+        "time_out_of_band": ((T < t_low) | (T > t_high)).sum(axis=0) * loop_interval,
+        "T_min": T.min(axis=0),
+        "T_max": T.max(axis=0),
+        "alerts": alert_counts,
+    }
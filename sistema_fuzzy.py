@@ -0,0 +1,132 @@
+"""Definição do sistema fuzzy MISO (funções de pertinência e regras).
+
+Importar este módulo só calcula as funções de pertinência (arrays NumPy) e
+monta o motor vetorizado, sem rede, matplotlib ou outros efeitos
+colaterais. As variáveis ``ctrl.Antecedent``/``ctrl.Consequent``, as regras
+e o ``ControlSystemSimulation`` do skfuzzy dependem de ``skfuzzy.control``,
+que importa matplotlib e networkx (~0,7 s), e são criados no primeiro acesso
+a ``errotemp``, ``varerrotemp``, ``pcrac``, ``rules``, ``sistema_controle``
+ou ``simulacao``, uma única vez.
+"""
+import functools
+import hashlib
+import numpy as np
+import skfuzzy as fuzz
+from inferencia import BatchInference, SparseInference
+
+errotemp_universe = np.arange(-16, 16.1, 1)
+varerrotemp_universe = np.arange(-2, 2.1, 0.1)
+pcrac_universe = np.arange(0, 101, 1)
+
+errotemp_mfs = {
+    'MN': fuzz.trapmf(errotemp_universe, [-16, -16, -12, -6]),
+    'PN': fuzz.trimf(errotemp_universe, [-12, -6, 0]),
+    'ZE': fuzz.trimf(errotemp_universe, [-6, 0, 6]),
+    'PP': fuzz.trimf(errotemp_universe, [0, 6, 12]),
+    'MP': fuzz.trapmf(errotemp_universe, [6, 12, 16, 16]),
+}
+
+varerrotemp_mfs = {
+    'MN': fuzz.trapmf(varerrotemp_universe, [-2, -2, -0.8, -0.4]),
+    'PN': fuzz.trimf(varerrotemp_universe, [-0.8, -0.4, 0]),
+    'ZE': fuzz.trimf(varerrotemp_universe, [-0.4, 0, 0.4]),
+    'PP': fuzz.trimf(varerrotemp_universe, [0, 0.4, 0.8]),
+    'MP': fuzz.trapmf(varerrotemp_universe, [0.4, 0.8, 2.1, 2.1]),
+}
+
+consequents_terms = {
+    'MB': fuzz.trimf(pcrac_universe, [0, 0, 25]),
+    'B':  fuzz.trimf(pcrac_universe, [0, 25, 50]),
+    'M':  fuzz.trimf(pcrac_universe, [25, 50, 75]),
+    'A':  fuzz.trimf(pcrac_universe, [50, 75, 100]),
+    'MA': fuzz.trimf(pcrac_universe, [75, 100, 100]),
+}
+
+# Mesmo formato usado por inference_debug e pelo renderizador
+antecedents = {
+    'errotemp': (errotemp_universe, errotemp_mfs),
+    'varerrotemp': (varerrotemp_universe, varerrotemp_mfs),
+}
+
+erro_labels = ['MN', 'PN', 'ZE', 'PP', 'MP']
+delta_labels = ['MN', 'PN', 'ZE', 'PP', 'MP']
+
+matriz_saida = [
+    ['MB',  'MB',  'B',  'M',  'A' ],
+    ['MB', 'B',  'M',  'A',  'MA' ],
+    ['MB', 'B',  'M',  'A',  'MA' ],
+    ['MB', 'B', 'M',  'A',  'MA' ],
+    ['B', 'M', 'A', 'MA',  'MA'  ]
+]
+
+# Motor vetorizado: mesmas regras e funções de pertinência, avaliado em lote
+motor_lote = BatchInference(errotemp_universe, errotemp_mfs, varerrotemp_universe, varerrotemp_mfs,
+                            pcrac_universe, consequents_terms, matriz_saida, erro_labels, delta_labels)
+# Um ponto por vez, só com as regras que disparam (relatório de inferência)
+motor_esparso = SparseInference(motor_lote)
+
+
+@functools.lru_cache(maxsize=None)
+def control_system():
+    """Variáveis, regras e simulação do skfuzzy, criadas no primeiro uso."""
+    from skfuzzy import control as ctrl
+
+    errotemp = ctrl.Antecedent(errotemp_universe, 'errotemp')
+    varerrotemp = ctrl.Antecedent(varerrotemp_universe, 'varerrotemp')
+    pcrac = ctrl.Consequent(pcrac_universe, 'pcrac')
+    for label, mf in errotemp_mfs.items():
+        errotemp[label] = mf
+    for label, mf in varerrotemp_mfs.items():
+        varerrotemp[label] = mf
+    for label, mf in consequents_terms.items():
+        pcrac[label] = mf
+
+    rules = []
+    for i, d_label in enumerate(delta_labels):
+        for j, e_label in enumerate(erro_labels):
+            rules.append(ctrl.Rule(varerrotemp[d_label] & errotemp[e_label],
+                                   pcrac[matriz_saida[i][j]]))
+
+    sistema_controle = ctrl.ControlSystem(rules)
+    return {
+        "errotemp": errotemp,
+        "varerrotemp": varerrotemp,
+        "pcrac": pcrac,
+        "rules": rules,
+        "sistema_controle": sistema_controle,
+        "simulacao": ctrl.ControlSystemSimulation(sistema_controle),
+    }
+
+
+def control_simulation():
+    """``ControlSystemSimulation`` do skfuzzy (criado no primeiro uso)."""
+    return control_system()["simulacao"]
+
+
+LAZY_NAMES = ("errotemp", "varerrotemp", "pcrac", "rules", "sistema_controle", "simulacao")
+
+
+def __getattr__(name):
+    if name in LAZY_NAMES:
+        return control_system()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def mf_definitions_hash(definitions=None):
+    """Hash (sha256, hex) dos universos e funções de pertinência amostradas.
+
+    ``definitions`` é ``{nome: (universo, {rótulo: mf})}``; por padrão, as
+    duas entradas e a saída deste módulo. Muda sempre que um universo,
+    rótulo ou parâmetro de pertinência muda, e serve de chave para o cache
+    da imagem das regras.
+    """
+    if definitions is None:
+        definitions = dict(antecedents, pcrac=(pcrac_universe, consequents_terms))
+    h = hashlib.sha256()
+    for name, (universe, terms) in definitions.items():
+        h.update(name.encode())
+        h.update(np.ascontiguousarray(universe, dtype=float).tobytes())
+        for label, mf in terms.items():
+            h.update(label.encode())
+            h.update(np.ascontiguousarray(mf, dtype=float).tobytes())
+    return h.hexdigest()
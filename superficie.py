@@ -0,0 +1,92 @@
+"""Superfície de controle pré-calculada (lookup table) do controlador fuzzy.
+
+A base de regras e as funções de pertinência não mudam em tempo de execução,
+então a saída ``pcrac`` é uma função fixa de (erro, var_erro). Esta superfície
+é amostrada uma única vez numa grade uniforme e, a cada tick, a saída é obtida
+por interpolação bilinear, em vez de executar todo o pipeline Mamdani.
+"""
+import numpy as np
+
+
+class ControlSurface:
+    """Tabela ``pcrac(erro, var_erro)`` numa grade uniforme com interpolação bilinear.
+
+    Entradas fora da grade são saturadas nas bordas, assim como o
+    ``ControlSystemSimulation`` do skfuzzy faz com ``clip_to_bounds=True``.
+    """
+
+    def __init__(self, erro_grid, var_grid, table):
+        self.erro_grid = np.asarray(erro_grid, dtype=float)
+        self.var_grid = np.asarray(var_grid, dtype=float)
+        self.table = np.asarray(table, dtype=float)
+        if self.table.shape != (self.erro_grid.size, self.var_grid.size):
+            raise ValueError("table deve ter formato (len(erro_grid), len(var_grid))")
+        if self.erro_grid.size < 2 or self.var_grid.size < 2:
+            raise ValueError("a grade precisa de pelo menos 2 pontos por eixo")
+
+        self._e0 = self.erro_grid[0]
+        self._e1 = self.erro_grid[-1]
+        self._de = (self._e1 - self._e0) / (self.erro_grid.size - 1)
+        self._v0 = self.var_grid[0]
+        self._v1 = self.var_grid[-1]
+        self._dv = (self._v1 - self._v0) / (self.var_grid.size - 1)
+
+    @staticmethod
+    def uniform_grid(lo, hi, step):
+        """Grade uniforme de ``lo`` até ``hi`` (inclusive) com passo próximo de ``step``."""
+        n = max(int(round((hi - lo) / step)), 1) + 1
+        return np.linspace(lo, hi, n)
+
+    @classmethod
+    def build(cls, compute, erro_range, var_range, erro_step, var_step):
+        """Amostra ``compute(erro, var_erro)`` numa grade uniforme.
+
+        ``compute`` recebe dois arrays de mesmo formato e devolve o ``pcrac``
+        exato de cada ponto.
+        """
+        erro_grid = cls.uniform_grid(erro_range[0], erro_range[1], erro_step)
+        var_grid = cls.uniform_grid(var_range[0], var_range[1], var_step)
+        E, V = np.meshgrid(erro_grid, var_grid, indexing='ij')
+        table = np.asarray(compute(E, V), dtype=float).reshape(E.shape)
+        return cls(erro_grid, var_grid, table)
+
+    @property
+    def shape(self):
+        return self.table.shape
+
+    def __call__(self, erro, var_erro):
+        scalar = np.ndim(erro) == 0 and np.ndim(var_erro) == 0
+        e = np.clip(np.asarray(erro, dtype=float), self._e0, self._e1)
+        v = np.clip(np.asarray(var_erro, dtype=float), self._v0, self._v1)
+
+        fe = (e - self._e0) / self._de
+        fv = (v - self._v0) / self._dv
+        i = np.minimum(fe.astype(int), self.erro_grid.size - 2)
+        j = np.minimum(fv.astype(int), self.var_grid.size - 2)
+        te = fe - i
+        tv = fv - j
+
+        t = self.table
+        out = ((1.0 - te) * ((1.0 - tv) * t[i, j] + tv * t[i, j + 1])
+               + te * ((1.0 - tv) * t[i + 1, j] + tv * t[i + 1, j + 1]))
+        return float(out) if scalar else out
+
+    def max_error(self, compute, refine=2):
+        """Compara a superfície com o motor exato numa grade ``refine`` vezes mais fina.
+
+        Retorna um dicionário com o erro absoluto máximo, onde ele ocorre e o
+        erro médio, para escolher uma resolução de grade adequada.
+        """
+        erro_fine = np.linspace(self._e0, self._e1, (self.erro_grid.size - 1) * refine + 1)
+        var_fine = np.linspace(self._v0, self._v1, (self.var_grid.size - 1) * refine + 1)
+        E, V = np.meshgrid(erro_fine, var_fine, indexing='ij')
+        exact = np.asarray(compute(E, V), dtype=float).reshape(E.shape)
+        diff = np.abs(self(E, V) - exact)
+        k = np.unravel_index(np.argmax(diff), diff.shape)
+        return {
+            "max_abs_error": float(diff[k]),
+            "mean_abs_error": float(diff.mean()),
+            "at": {"erro": float(E[k]), "var_erro": float(V[k])},
+            "grid": list(self.shape),
+            "samples": int(diff.size),
+        }
@@ -0,0 +1,309 @@
+"""Gravação colunar da telemetria do loop em segmentos mapeados em memória.
+
+Cada tick vira um registro de tamanho fixo, gravado em colunas (instante,
+``T``, ``pcrac``, ``erro``, ``var_erro``, ``Text``, ``Qest`` e as ativações
+das regras) dentro de arquivos de segmento pré-alocados::
+
+    <diretório>/<prefixo>-000000.tlm
+    <diretório>/<prefixo>-000001.tlm      # aberto quando o anterior enche
+    ...
+
+Um segmento tem um cabeçalho de `HEADER_SIZE` bytes (assinatura, contagem de
+registros e os metadados em JSON) seguido das colunas, cada uma contígua e
+alinhada. Gravar um tick são algumas atribuições num ``numpy.memmap``; quem
+leva as páginas ao disco é o sistema operacional, então uma queda do
+processo não perde registros já contados (uma queda da máquina pode perder
+os últimos segundos, a não ser que se chame `TelemetryRecorder.flush`).
+
+As ativações são quantizadas em ``uint8`` (``valor * ACTIVATION_SCALE``). A
+10 Hz um registro ocupa 57 bytes com as 25 regras, cerca de 50 MB por dia
+e por sala.
+
+`TelemetryReader` abre os segmentos só para leitura e devolve as colunas
+como arrays sobre o próprio mapeamento, sem cópia. `replay` reinjeta os
+``Text``/``Qest`` gravados no controlador e na planta, o mais rápido
+possível, para reproduzir um incidente.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+import numpy as np
+
+MAGIC = b"FZTLM\x00\x00\x01"
+HEADER_SIZE = 4096
+TELEMETRY_FORMAT_VERSION = 1
+ACTIVATION_SCALE = 255
+# (nome, dtype); as ativações entram depois, com uma coluna por regra
+COLUMNS = (("t", "<f8"), ("T", "<f4"), ("pcrac", "<f4"), ("erro", "<f4"),
+           ("var_erro", "<f4"), ("Text", "<f4"), ("Qest", "<f4"))
+_ALIGN = 64
+
+
+def _layout(capacity, n_rules):
+    """[(nome, dtype, formato, offset)] das colunas de um segmento."""
+    cols = []
+    offset = HEADER_SIZE
+    for name, dtype, shape in [(n, d, (capacity,)) for n, d in COLUMNS] + [("activations", "u1", (capacity, n_rules))]:
+        cols.append((name, dtype, shape, offset))
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        offset += -(-size // _ALIGN) * _ALIGN
+    return cols, offset
+
+
+class Segment:
+    """Um arquivo de segmento mapeado em memória.
+
+    ``columns`` tem arrays com a capacidade inteira; `column` devolve só os
+    registros válidos. A contagem é lida do cabeçalho a cada acesso, então
+    um leitor acompanha um segmento que ainda está sendo gravado.
+    """
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode=mode)
+        if bytes(self._mm[:8]) != MAGIC:
+            raise ValueError(f"{path}: não é um segmento de telemetria")
+        self._count = self._mm[8:16].view("<u8")
+        self.meta = json.loads(bytes(self._mm[16:HEADER_SIZE]).rstrip(b" \x00"))
+        if self.meta["version"] != TELEMETRY_FORMAT_VERSION:
+            raise ValueError(f"{path}: versão {self.meta['version']} não suportada")
+        self.capacity = self.meta["capacity"]
+        self.n_rules = self.meta["n_rules"]
+        self.columns = {}
+        for name, dtype, shape, offset in _layout(self.capacity, self.n_rules)[0]:
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            self.columns[name] = self._mm[offset:offset + size].view(dtype).reshape(shape)
+
+    @classmethod
+    def create(cls, path, capacity, n_rules, meta=None):
+        """Cria o arquivo (esparso) com o cabeçalho e abre para gravação."""
+        size = _layout(capacity, n_rules)[1]
+        header = dict(meta or {}, version=TELEMETRY_FORMAT_VERSION, capacity=capacity, n_rules=n_rules,
+                      columns=[name for name, _ in COLUMNS] + ["activations"],
+                      activation_scale=ACTIVATION_SCALE)
+        text = json.dumps(header).encode()
+        if len(text) > HEADER_SIZE - 16:
+            raise ValueError("metadados grandes demais para o cabeçalho")
+        with open(path, "wb") as f:
+            f.write(MAGIC + np.uint64(0).tobytes() + text.ljust(HEADER_SIZE - 16))
+            f.truncate(size)
+        return cls(path, mode="r+")
+
+    def __len__(self):
+        return int(self._count[0])
+
+    def column(self, name):
+        return self.columns[name][:len(self)]
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        if self._mm is not None:
+            if self._mm.mode != "r":
+                self._mm.flush()
+            self.columns = {}
+            self._count = None
+            self._mm = None
+
+
+class TelemetryRecorder:
+    """Grava um registro por tick, com rotação e retenção de segmentos.
+
+    ``segment_records`` é a capacidade de cada arquivo (864000 = um dia a
+    10 Hz). Quando um segmento enche, o próximo é criado e, com
+    ``max_segments``, os mais antigos além desse número são apagados. Um
+    gravador novo nunca reabre segmentos existentes: continua a numeração.
+    """
+
+    def __init__(self, directory, n_rules, segment_records=864000, max_segments=None,
+                 prefix="telemetria", meta=None):
+        self.directory = directory
+        self.n_rules = n_rules
+        self.segment_records = segment_records
+        self.max_segments = max_segments
+        self.prefix = prefix
+        self.meta = dict(meta or {})
+        os.makedirs(directory, exist_ok=True)
+        existing = segment_paths(directory, prefix)
+        self._seq = int(existing[-1].rsplit("-", 1)[1].split(".")[0]) + 1 if existing else 0
+        self._segment = None
+        self.records = 0
+        self.segments_created = 0
+        self.segments_deleted = 0
+
+    def _open_next(self):
+        if self._segment is not None:
+            self._segment.close()
+        path = os.path.join(self.directory, f"{self.prefix}-{self._seq:06d}.tlm")
+        self._seq += 1
+        self._segment = Segment.create(path, self.segment_records, self.n_rules,
+                                       dict(self.meta, created=time.time()))
+        cols = self._segment.columns
+        self._t, self._T, self._pcrac = cols["t"], cols["T"], cols["pcrac"]
+        self._erro, self._var, self._Text, self._Qest = cols["erro"], cols["var_erro"], cols["Text"], cols["Qest"]
+        self._act = cols["activations"]
+        self._count = self._segment._count
+        self._row = 0
+        self.segments_created += 1
+        self._apply_retention()
+
+    def _apply_retention(self):
+        if self.max_segments is None:
+            return
+        paths = segment_paths(self.directory, self.prefix)
+        for path in paths[:max(0, len(paths) - self.max_segments)]:
+            os.remove(path)
+            self.segments_deleted += 1
+
+    def append(self, t, T, pcrac, erro, var_erro, Text, Qest, rules=()):
+        """Grava um tick. ``rules`` são pares (índice da regra, ativação) das regras ativas."""
+        if self._segment is None or self._row >= self.segment_records:
+            self._open_next()
+        i = self._row
+        self._t[i] = t
+        self._T[i] = T
+        self._pcrac[i] = pcrac
+        self._erro[i] = erro
+        self._var[i] = var_erro
+        self._Text[i] = Text
+        self._Qest[i] = Qest
+        act = self._act[i]
+        for k, value in rules:
+            act[k] = round(value * ACTIVATION_SCALE)
+        # A contagem só avança depois do registro completo
+        self._row = i + 1
+        self._count[0] = self._row
+        self.records += 1
+
+    def flush(self):
+        if self._segment is not None:
+            self._segment.flush()
+
+    def close(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def stats(self):
+        return {"records": self.records, "segments_created": self.segments_created,
+                "segments_deleted": self.segments_deleted}
+
+
+def segment_paths(directory, prefix="telemetria"):
+    return sorted(glob.glob(os.path.join(directory, f"{prefix}-*.tlm")))
+
+
+class TelemetryReader:
+    """Leitura dos segmentos de um diretório, do mais antigo ao mais novo."""
+
+    def __init__(self, directory, prefix="telemetria"):
+        self.segments = [Segment(path) for path in segment_paths(directory, prefix)]
+
+    def __len__(self):
+        return sum(len(s) for s in self.segments)
+
+    def columns(self, names=None, start=None, end=None):
+        """{coluna: array} dos registros com ``start <= t < end``.
+
+        Quando o intervalo cai num único segmento, os arrays são fatias do
+        mapeamento (sem cópia, somente leitura); abrangendo vários segmentos,
+        eles são concatenados.
+        """
+        names = [name for name, _ in COLUMNS] + ["activations"] if names is None else list(names)
+        parts = []
+        for seg in self.segments:
+            t = seg.column("t")
+            if not t.size:
+                continue
+            lo = 0 if start is None else int(np.searchsorted(t, start, "left"))
+            hi = t.size if end is None else int(np.searchsorted(t, end, "left"))
+            if hi > lo:
+                parts.append({name: seg.column(name)[lo:hi] for name in names})
+        if not parts:
+            n_rules = self.segments[0].n_rules if self.segments else 0
+            return {name: np.empty((0, n_rules) if name == "activations" else 0,
+                                   dtype=dict(COLUMNS).get(name, "u1")) for name in names}
+        if len(parts) == 1:
+            return parts[0]
+        return {name: np.concatenate([p[name] for p in parts]) for name in names}
+
+    def close(self):
+        for seg in self.segments:
+            seg.close()
+        self.segments = []
+
+
+ReplayResult = namedtuple("ReplayResult", ["simulation", "recorded", "max_abs_dT", "max_abs_dpcrac", "speedup"])
+ReplayResult.__doc__ = """Resultado de `replay`.
+
+simulation     : `simulador.SimulationResult` da reexecução (um cenário)
+recorded       : colunas gravadas no intervalo
+max_abs_dT     : maior diferença entre o T reexecutado e o gravado
+max_abs_dpcrac : idem para o PCRAC
+speedup        : duração gravada / tempo de reexecução
+"""
+
+
+def replay(reader, start=None, end=None, factory=None):
+    """Reexecuta controlador e planta com os ``Text``/``Qest`` gravados.
+
+    O estado inicial (``T`` e o erro anterior) vem do primeiro registro do
+    intervalo. ``factory(zonas)`` cria o controlador (padrão:
+    ``fuzzy_miso.build_zone_controller``), então mudanças na base de regras
+    ou na planta podem ser comparadas com o que aconteceu de fato.
+    """
+    from simulador import simulate
+    rec = reader.columns(("t", "T", "pcrac", "erro", "var_erro", "Text", "Qest"), start, end)
+    n = rec["t"].size
+    if n == 0:
+        raise ValueError("nenhum registro no intervalo")
+    if factory is None:
+        from fuzzy_miso import build_zone_controller as factory
+    controller = factory(["replay"])
+    controller.T[:] = float(rec["T"][0])
+    controller.erro_anterior[:] = float(rec["erro"][0]) - float(rec["var_erro"][0])
+    controller.pcrac[:] = float(rec["pcrac"][0])
+
+    t0 = time.perf_counter()
+    sim = simulate(controller, rec["Text"].astype(float), rec["Qest"].astype(float))
+    elapsed = time.perf_counter() - t0
+
+    duration = float(rec["t"][-1] - rec["t"][0]) if n > 1 else 0.0
+    return ReplayResult(sim, rec,
+                        float(np.abs(sim.T[:n, 0] - rec["T"]).max()),
+                        float(np.abs(sim.pcrac[:, 0] - rec["pcrac"]).max()),
+                        duration / elapsed if elapsed > 0 else float("inf"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="diretório dos segmentos")
+    parser.add_argument("--prefix", default="telemetria")
+    parser.add_argument("--start", type=float, help="instante inicial (epoch, s)")
+    parser.add_argument("--end", type=float, help="instante final (epoch, s)")
+    parser.add_argument("--replay", action="store_true", help="reexecuta o intervalo no controlador")
+    args = parser.parse_args(argv)
+
+    reader = TelemetryReader(args.directory, args.prefix)
+    for seg in reader.segments:
+        t = seg.column("t")
+        span = f"{t[0]:.1f} .. {t[-1]:.1f}" if t.size else "vazio"
+        print(f"{os.path.basename(seg.path)}: {len(seg)}/{seg.capacity} registros ({span})")
+    cols = reader.columns(("T", "pcrac"), args.start, args.end)
+    if cols["T"].size:
+        print(f"T: {cols['T'].min():.2f} .. {cols['T'].max():.2f}  PCRAC médio: {cols['pcrac'].mean():.2f}")
+    if args.replay:
+        res = replay(reader, args.start, args.end)
+        print(f"Reexecução: {res.recorded['t'].size} ticks, {res.speedup:.0f}x o tempo real, "
+              f"|dT| máx {res.max_abs_dT:.4f}, |dPCRAC| máx {res.max_abs_dpcrac:.4f}")
+    reader.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import unittest
+import asyncio
+from agendador import TickScheduler
+
+class RelogioFalso:
+    """Relógio simulado: sleep avança o tempo; trabalho() simula o custo do tick."""
+
+    def __init__(self, t0=100.0):
+        self.t = t0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, dt):
+        self.sleeps.append(dt)
+        self.t += dt
+
+    def trabalho(self, dt):
+        self.t += dt
+
+class TestAgendador(unittest.TestCase):
+
+    def agendador(self, policy, period=0.1):
+        self.relogio = RelogioFalso()
+        return TickScheduler(period, policy, clock=self.relogio, sleep=self.relogio.sleep)
+
+    # =================================================================
+    # SEM DERIVA
+    # =================================================================
+
+    def test_sem_deriva_com_trabalho(self):
+        """O tempo de trabalho é descontado do sono: os ticks ficam na grade."""
+        sched = self.agendador("skip")
+        ticks = []
+        for _ in range(50):
+            ticks.append(sched.wait())
+            self.relogio.trabalho(0.03)
+        for k, tick in enumerate(ticks):
+            self.assertAlmostEqual(tick.time, 100.0 + k * 0.1, places=9)
+            self.assertAlmostEqual(tick.lateness, 0.0, places=9)
+        self.assertAlmostEqual(self.relogio.sleeps[1], 0.07, places=9)
+        self.assertEqual(sched.stats()["overruns"], 0)
+
+    # =================================================================
+    # POLÍTICAS DE ESTOURO
+    # =================================================================
+
+    def test_skip_descarta_prazos_vencidos(self):
+        sched = self.agendador("skip")
+        sched.wait()
+        self.relogio.trabalho(0.35)          # estoura 3 prazos (0.1, 0.2, 0.3)
+        atrasado = sched.wait()
+        self.assertTrue(atrasado.overrun)
+        self.assertAlmostEqual(atrasado.deadline, 100.1)
+        self.assertAlmostEqual(atrasado.lateness, 0.25)
+        self.assertEqual(atrasado.skipped, 2)
+        proximo = sched.wait()
+        self.assertAlmostEqual(proximo.time, 100.4)   # volta à grade original
+        self.assertEqual(sched.stats()["skipped"], 2)
+
+    def test_catch_up_executa_todos_os_ticks(self):
+        sched = self.agendador("catch-up")
+        sched.wait()
+        self.relogio.trabalho(0.35)
+        atrasados = [sched.wait() for _ in range(3)]
+        self.assertEqual([round(t.deadline, 6) for t in atrasados], [100.1, 100.2, 100.3])
+        self.assertEqual(self.relogio.sleeps, [])
+        proximo = sched.wait()
+        self.assertAlmostEqual(proximo.time, 100.4)
+        self.assertEqual(sched.stats()["skipped"], 0)
+
+    def test_stretch_reinicia_a_grade(self):
+        sched = self.agendador("stretch")
+        sched.wait()
+        self.relogio.trabalho(0.35)
+        atrasado = sched.wait()
+        self.assertAlmostEqual(atrasado.time, 100.35)
+        proximo = sched.wait()
+        self.assertAlmostEqual(proximo.time, 100.45)   # período preservado, fase deslocada
+        self.assertFalse(proximo.overrun)
+
+    # =================================================================
+    # ESTATÍSTICAS E VALIDAÇÃO
+    # =================================================================
+
+    def test_estatisticas_de_atraso(self):
+        sched = self.agendador("stretch")
+        sched.wait()
+        self.relogio.trabalho(0.15)
+        sched.wait()
+        stats = sched.stats()
+        self.assertEqual(stats["ticks"], 2)
+        self.assertEqual(stats["overruns"], 1)
+        self.assertAlmostEqual(stats["late_max_ms"], 50.0)
+        self.assertAlmostEqual(stats["late_last_ms"], 50.0)
+        self.assertAlmostEqual(stats["late_mean_ms"], 25.0)
+        self.assertAlmostEqual(stats["jitter_ms"], 25.0)
+
+    def test_espera_assincrona(self):
+        """wait_async usa a mesma grade e contabilidade de wait."""
+        sched = self.agendador("skip")
+        sched.sleep = None      # não pode ser chamado no modo assíncrono
+
+        async def rodar():
+            ticks = []
+            for _ in range(3):
+                ticks.append(await sched.wait_async())
+                self.relogio.trabalho(0.1)
+            return ticks
+
+        ticks = asyncio.run(rodar())
+        self.assertEqual([round(t.deadline, 6) for t in ticks], [100.0, 100.1, 100.2])
+        self.assertEqual(sched.stats()["ticks"], 3)
+
+    def test_parametros_invalidos(self):
+        with self.assertRaises(ValueError):
+            TickScheduler(0)
+        with self.assertRaises(ValueError):
+            TickScheduler(0.1, "drop")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,68 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+import numpy as np
+from base_regras import DEFAULT_CONFIG, validate_config
+from ajuste import DEFAULT_WEIGHTS, default_profiles, evaluate, random_candidates, search, main
+
+class TestAjuste(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.Text, cls.Qest, cls.nomes = default_profiles(300)
+
+    # =================================================================
+    # CONFIGURAÇÕES
+    # =================================================================
+
+    def test_candidatos_validos_e_reprodutiveis(self):
+        a = random_candidates(20, seed=3)
+        self.assertEqual(a, random_candidates(20, seed=3))
+        self.assertNotEqual(a, random_candidates(20, seed=4))
+        for cand in a:
+            validate_config(cand)
+            p = np.asarray(cand["erro_peaks"])
+            np.testing.assert_allclose(p, -p[::-1])
+            self.assertEqual((cand["pcrac_peaks"][0], cand["pcrac_peaks"][-1]), (0.0, 100.0))
+
+    # =================================================================
+    # AVALIAÇÃO E BUSCA
+    # =================================================================
+
+    def test_superficie_aproxima_o_motor_exato(self):
+        exato = evaluate(DEFAULT_CONFIG, self.Text, self.Qest, settings={"surface_step": None})
+        rapido = evaluate(DEFAULT_CONFIG, self.Text, self.Qest)
+        self.assertAlmostEqual(rapido["energy"] / exato["energy"], 1.0, places=3)
+        self.assertLess(abs(rapido["time_out_of_band"] - exato["time_out_of_band"]), 1.0)
+        self.assertGreater(exato["energy"], 0.0)
+
+    def test_ranking_em_processo_e_no_pool(self):
+        cands = random_candidates(3, seed=1)
+        serial = search(cands, self.Text, self.Qest, workers=1)
+        self.assertEqual([r["rank"] for r in serial], [1, 2, 3, 4])
+        self.assertEqual(sorted(r["score"] for r in serial), [r["score"] for r in serial])
+        base = [r for r in serial if r["baseline"]]
+        self.assertEqual(len(base), 1)
+        self.assertAlmostEqual(base[0]["score"], sum(DEFAULT_WEIGHTS.values()))
+
+        pool = search(cands, self.Text, self.Qest, workers=2)
+        self.assertEqual([r["config"] for r in pool], [r["config"] for r in serial])
+        self.assertEqual([r["score"] for r in pool], [r["score"] for r in serial])
+
+    def test_linha_de_comando(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            melhor = os.path.join(tmp, "melhor.json")
+            ranking = os.path.join(tmp, "ranking.json")
+            with redirect_stdout(io.StringIO()):
+                self.assertEqual(main(["--candidates", "2", "--steps", "100", "--workers", "1",
+                                       "--out", ranking, "--best", melhor]), 0)
+            with open(melhor) as f:
+                validate_config(json.load(f))
+            with open(ranking) as f:
+                self.assertEqual(len(json.load(f)), 3)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
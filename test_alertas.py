@@ -0,0 +1,166 @@
+import unittest
+import threading
+import numpy as np
+from alertas import AlertEngine, AlertGate, ThresholdRule, SustainedRule, OscillationRule, default_alert_rules
+from zonas import oscillation_sign_changes
+
+def sinais(valores, deadband=0.05):
+    valores = np.asarray(valores, dtype=float)
+    return np.where(valores > deadband, 1, np.where(valores < -deadband, -1, 0))
+
+class TestAlertas(unittest.TestCase):
+
+    # =================================================================
+    # LIMIAR E DURAÇÃO
+    # =================================================================
+
+    def test_limiar_abaixo_e_acima(self):
+        motor = AlertEngine([
+            ThresholdRule("baixa", "T", "crítico", "baixa", "crítica", below=18.0, value_key="temperature"),
+            ThresholdRule("alta", "T", "crítico", "alta", "crítica", above=26.0, value_key="temperature"),
+        ], n=3)
+        alertas = motor.update(0.0, T=np.array([17.0, 22.0, 27.5]))
+        self.assertEqual([(i, msg) for i, _, msg, _, _ in alertas], [(0, "baixa"), (2, "alta")])
+        self.assertEqual(alertas[1][3], {"temperature": 27.5, "limit": 26.0, "state": "raised"})
+        with self.assertRaises(ValueError):
+            ThresholdRule("x", "T", "crítico", "x", "crítica", below=18.0, above=26.0)
+
+    def test_limiar_avisa_ao_entrar_e_ao_sair(self):
+        """Condição persistente: um aviso ao entrar, lembretes e um aviso ao sair."""
+        regra = ThresholdRule("alta", "T", "crítico", "alta", "crítica", above=26.0, hysteresis=0.5,
+                              min_hold_sec=5.0, reminder_sec=60.0, message_cleared="normal")
+        motor = AlertEngine([regra])
+        enviados = []
+        for k in range(1000):                       # 100 s a 10 Hz acima do limite
+            enviados += [(k, a[3]["state"]) for a in motor.update(k * 0.1, T=27.0)]
+        self.assertEqual(enviados, [(0, "raised"), (600, "active")])
+        alertas = motor.update(100.0, T=27.0) + motor.update(100.1, T=25.8)   # dentro da banda
+        self.assertEqual(alertas, [])
+        alertas = motor.update(100.2, T=25.5)
+        self.assertEqual([(a[2], a[4], a[3]["state"]) for a in alertas], [("normal", "baixa", "cleared")])
+        self.assertEqual(alertas[0][3]["suppressed"], 400)
+        self.assertAlmostEqual(alertas[0][3]["active_sec"], 100.2)
+
+    def test_limiar_tempo_minimo_ativo(self):
+        """Sem o tempo mínimo no estado ativo, não normaliza (evita alterna-desliga)."""
+        motor = AlertEngine([ThresholdRule("baixa", "T", "crítico", "baixa", "crítica", below=18.0,
+                                           min_hold_sec=2.0)])
+        estados = []
+        for k, T in enumerate([17.0, 19.0, 17.0, 19.0, 19.0]):
+            estados += [a[3]["state"] for a in motor.update(float(k), T=T)]
+        self.assertEqual(estados, ["raised", "cleared"])
+
+    def test_potencia_sustentada_por_tempo_decorrido(self):
+        regra = SustainedRule("pmax", "pcrac", "eficiência", "atingiu", "alta",
+                              at_least=95.0, duration_sec=10.0, message_ended="operou")
+        motor = AlertEngine([regra])
+        self.assertEqual(motor.update(100.0, pcrac=98.0), [])
+        self.assertEqual(motor.update(109.9, pcrac=98.0), [])
+        alertas = motor.update(110.0, pcrac=99.0)
+        self.assertEqual([a[2] for a in alertas], ["atingiu"])
+        self.assertEqual(alertas[0][3]["duration_sec"], 10.0)
+        self.assertEqual(motor.update(120.0, pcrac=99.0), [])      # avisa uma vez só
+        alertas = motor.update(125.0, pcrac=50.0)
+        self.assertEqual([a[2] for a in alertas], ["operou"])
+        self.assertEqual(alertas[0][3]["duration_sec"], 25.0)
+        self.assertTrue(np.isnan(regra.since[0]))
+
+    # =================================================================
+    # OSCILAÇÃO EM FLUXO
+    # =================================================================
+
+    def test_contagem_incremental_igual_a_referencia(self):
+        """A contagem em O(1) coincide com a recontagem da janela inteira."""
+        rng = np.random.default_rng(7)
+        for window in (2, 5, 20, 500):
+            regra = OscillationRule("osc", "erro", "estabilidade", "osc", "média",
+                                    window=window, threshold=10**9)
+            regra.bind(4)
+            valores = rng.choice([-1.0, -0.01, 0.0, 0.02, 1.0], size=(300, 4))
+            for t in range(valores.shape[0]):
+                contagem = regra.push(valores[t]).copy()
+                janela = sinais(valores[max(0, t - window + 1):t + 1]).T
+                np.testing.assert_array_equal(contagem, oscillation_sign_changes(janela))
+            self.assertTrue(np.all(regra.samples == min(window, valores.shape[0])))
+
+    def test_oscilacao_dispara_uma_vez_e_limpa_a_janela(self):
+        motor = AlertEngine([OscillationRule("osc", "erro", "estabilidade", "osc", "média",
+                                             window=10, threshold=3, value_key="erro_atual")])
+        alertas = []
+        for k, erro in enumerate([1, -1, 1, -1, 1]):
+            alertas += motor.update(k, erro=erro)
+        self.assertEqual(len(alertas), 1)
+        self.assertEqual(alertas[0][3], {"sign_changes": 3, "window_samples": 4, "erro_atual": -1.0})
+        self.assertEqual(int(motor["osc"].changes[0]), 0)
+
+    # =================================================================
+    # VÁRIAS ZONAS
+    # =================================================================
+
+    def test_zonas_independentes(self):
+        motor = AlertEngine(default_alert_rules(t_low=18.0, t_high=26.0, max_power_threshold=95.0,
+                                                max_power_duration_sec=1.0, osc_window=20,
+                                                osc_threshold=3), n=3)
+        alertas = []
+        for k in range(6):
+            erro = np.array([(-1.0) ** k, 1.0, 0.0])
+            alertas += motor.update(float(k), T_next=22.0, pcrac=np.array([50.0, 50.0, 99.0]), erro=erro)
+        self.assertEqual(sorted({(i, t) for i, t, *_ in alertas}), [(0, "estabilidade"), (2, "eficiência")])
+        motor.reset(0)
+        self.assertEqual(int(motor["oscilacao"].samples[0]), 0)
+        self.assertEqual(int(motor["oscilacao"].samples[1]), 6)
+
+    # =================================================================
+    # LIMITE DE TAXA
+    # =================================================================
+
+    def test_limite_de_taxa_por_tipo(self):
+        gate = AlertGate(rate_per_sec=1.0, burst=2)
+        aceitos = [gate.admit("t", "comunicação", {"rc": 1}, now=0.0) for _ in range(5)]
+        self.assertEqual(sum(a is not None for a in aceitos), 2)
+        self.assertIsNotNone(gate.admit("t", "operacional", now=0.0))   # outro tipo, outro balde
+        self.assertEqual(gate.stats()["pending"], {"t:comunicação": 3})
+        data = gate.admit("t", "comunicação", {"rc": 1}, now=1.0)
+        self.assertEqual(data, {"rc": 1, "suppressed": 3})
+        self.assertEqual((gate.sent, gate.dropped), (4, 3))
+        with self.assertRaises(ValueError):
+            AlertGate(rate_per_sec=0.0)
+
+    def test_transicoes_passam_pelo_limite(self):
+        gate = AlertGate(rate_per_sec=1.0, burst=1)
+        self.assertIsNotNone(gate.admit("t", "crítico", {"state": "raised"}, now=0.0, key="temperatura_alta"))
+        self.assertIsNotNone(gate.admit("t", "crítico", {"state": "active"}, now=0.0, key="temperatura_alta"))
+        self.assertIsNone(gate.admit("t", "crítico", {"state": "active"}, now=0.0, key="temperatura_alta"))
+        self.assertEqual(gate.admit("t", "crítico", {"state": "cleared"}, now=0.0, key="temperatura_alta"),
+                         {"state": "cleared"})
+        # Mesmo tipo, outra regra: balde próprio
+        self.assertIsNotNone(gate.admit("t", "crítico", {"state": "active"}, now=0.0, key="temperatura_baixa"))
+        self.assertEqual(gate.stats()["pending"], {"t:temperatura_alta": 1})
+
+    def test_alerta_leva_o_nome_da_regra(self):
+        motor = AlertEngine(default_alert_rules(t_low=18.0, t_high=27.0, max_power_threshold=95.0,
+                                                max_power_duration_sec=10.0, osc_window=4, osc_threshold=3))
+        (alerta,) = motor.update(0.0, T_next=30.0, pcrac=50.0, erro=0.0)
+        self.assertEqual(alerta.rule, "temperatura_alta")
+        indice, tipo, _, dados, _ = alerta
+        self.assertEqual((indice, tipo, dados["state"]), (0, "crítico", "raised"))
+
+    def test_limite_de_taxa_entre_threads(self):
+        gate = AlertGate(rate_per_sec=1e-6, burst=50)
+        threads = [threading.Thread(target=lambda: [gate.admit("t", "x", now=0.0) for _ in range(100)])
+                   for _ in range(4)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        self.assertEqual((gate.sent, gate.dropped), (50, 350))
+
+    def test_nomes_repetidos(self):
+        with self.assertRaises(ValueError):
+            AlertEngine([ThresholdRule("a", "T", "c", "m", "s", below=1.0),
+                         ThresholdRule("a", "T", "c", "m", "s", above=2.0)])
+        with self.assertRaises(KeyError):
+            AlertEngine([])["a"]
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
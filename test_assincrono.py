@@ -0,0 +1,207 @@
+import unittest
+import asyncio
+import json
+from unittest.mock import patch
+import fuzzy_miso as app
+from assincrono import MemoryBroker, AsyncRuntime, AsyncMqttClient
+from publicacao import Publisher
+
+def mensagens(broker, topic):
+    return [(t, payload) for t, tp, payload in broker.log if tp == topic]
+
+class TestRuntimeAsyncio(unittest.TestCase):
+
+    def setUp(self):
+        app.Text = 35.0
+        app.Qest = 40.0
+        app.T_n = 22.0
+        app.erro_anterior = 0.0
+        app.PCRAC_val = 50.0
+        app.alert_gate = app.build_alert_gate()
+
+    def executar(self, trigger, cenario, **config):
+        """Roda o controlador num MemoryBroker enquanto ``cenario(broker, entrada)`` executa."""
+        async def principal():
+            broker = MemoryBroker()
+            stop = asyncio.Event()
+            tarefa = asyncio.create_task(app.run_async(broker.client(), trigger=trigger, stop=stop))
+            await asyncio.sleep(0)
+            await cenario(broker, broker.client())
+            stop.set()
+            return broker, await tarefa
+
+        with patch.multiple(app, **config):
+            return asyncio.run(principal())
+
+    # =================================================================
+    # MODO PERIÓDICO
+    # =================================================================
+
+    def test_periodico_publica_a_cada_tick(self):
+        async def cenario(broker, entrada):
+            await asyncio.sleep(0.12)
+            entrada.publish(app.TOPIC_INPUT_TEXT, "28.5")
+            await asyncio.sleep(0.2)
+
+        broker, runtime = self.executar("periodic", cenario, loop_interval=0.05)
+        controles = mensagens(broker, app.TOPIC_CONTROL)
+        self.assertGreaterEqual(len(controles), 5)
+        self.assertEqual(len(controles), runtime.computes)
+        self.assertEqual(app.Text, 28.5)
+        self.assertEqual(runtime.stats()["scheduler"]["ticks"], runtime.computes)
+
+    # =================================================================
+    # RECÁLCULO POR ENTRADA
+    # =================================================================
+
+    def test_sem_entradas_nao_calcula(self):
+        async def cenario(broker, entrada):
+            await asyncio.sleep(0.2)
+
+        broker, runtime = self.executar("on-change", cenario, ON_CHANGE_IDLE_SEC=None)
+        self.assertEqual(runtime.computes, 0)
+        self.assertEqual(mensagens(broker, app.TOPIC_CONTROL), [])
+
+    def test_degrau_de_carga_recalcula_na_hora(self):
+        """O comando do CRAC sai logo após a entrada, sem esperar o próximo tick."""
+        async def cenario(broker, entrada):
+            await asyncio.sleep(0.05)
+            self.t_degrau = broker.clock()
+            entrada.publish(app.TOPIC_INPUT_QEST, "90")
+            await asyncio.sleep(0.05)
+
+        broker, runtime = self.executar("on-change", cenario, ON_CHANGE_IDLE_SEC=None, loop_interval=1.0)
+        controles = mensagens(broker, app.TOPIC_CONTROL)
+        self.assertEqual(len(controles), 1)
+        self.assertLess(controles[0][0] - self.t_degrau, 0.03)
+        self.assertEqual(app.Qest, 90.0)
+
+    def test_espacamento_minimo_agrupa_rajadas(self):
+        async def cenario(broker, entrada):
+            for k in range(30):
+                entrada.publish(app.TOPIC_INPUT_QEST, str(40 + k))
+                await asyncio.sleep(0.002)
+            await asyncio.sleep(0.1)
+
+        # Instantes dos cálculos (os de publicação dependem da tarefa de envio)
+        instantes = []
+        control_step = app.control_step
+        def registrar(out, now, *args):
+            instantes.append(now)
+            control_step(out, now, *args)
+
+        broker, runtime = self.executar("on-change", cenario, ON_CHANGE_IDLE_SEC=None,
+                                        ON_CHANGE_MIN_SPACING_SEC=0.02, control_step=registrar)
+        self.assertEqual(len(instantes), runtime.computes)
+        self.assertLess(runtime.computes, 10)
+        self.assertEqual(runtime.inputs, 30)
+        self.assertTrue(all(b - a >= 0.019 for a, b in zip(instantes, instantes[1:])))
+        self.assertEqual(app.Qest, 69.0)      # o último valor entra no último cálculo
+
+    def test_reset_publica_alerta(self):
+        async def cenario(broker, entrada):
+            entrada.publish(app.TOPIC_RESET, "")
+            await asyncio.sleep(0.05)
+
+        broker, _ = self.executar("on-change", cenario, ON_CHANGE_IDLE_SEC=None)
+        alertas = [json.loads(p) for _, p in mensagens(broker, app.TOPIC_ALERT)]
+        self.assertEqual([a["type"] for a in alertas], ["operacional"])
+        self.assertEqual((app.Text, app.Qest), (25.0, 40.0))
+
+    # =================================================================
+    # QUEDA DE CONEXÃO
+    # =================================================================
+
+    def test_reconecta_com_espera_crescente(self):
+        async def principal():
+            broker = MemoryBroker()
+            cliente = broker.client()
+            cliente.subscribe("entrada/#")
+            tentativas = []
+            reconectar = cliente.reconnect
+
+            async def reconectar_falhando():
+                tentativas.append(broker.clock())
+                if len(tentativas) < 3:
+                    raise ConnectionRefusedError
+                await reconectar()
+
+            cliente.reconnect = reconectar_falhando
+            recebidas = []
+            runtime = AsyncRuntime(cliente, Publisher(cliente), lambda now: None, recebidas.append,
+                                   period=0.02, reconnect_min=0.02, reconnect_max=0.05)
+            stop = asyncio.Event()
+            tarefa = asyncio.create_task(runtime.run(stop))
+            await asyncio.sleep(0.05)
+            queda = broker.clock()
+            cliente.drop()
+            broker.client().publish("entrada/a", "perdida")
+            await asyncio.sleep(0.2)
+            broker.client().publish("entrada/a", "depois")
+            await asyncio.sleep(0.02)
+            stop.set()
+            await tarefa
+            return runtime, queda, tentativas, recebidas
+
+        runtime, queda, tentativas, recebidas = asyncio.run(principal())
+        self.assertEqual((runtime.reconnects, runtime.reconnect_failures), (1, 2))
+        esperas = [b - a for a, b in zip([queda] + tentativas, tentativas)]
+        self.assertGreaterEqual(esperas[0], 0.02)
+        self.assertGreaterEqual(esperas[1], 0.04)
+        self.assertGreaterEqual(esperas[2], 0.05)              # limitada por reconnect_max
+        self.assertEqual([m.payload for m in recebidas], [b"depois"])
+        self.assertEqual(runtime.stats()["reconnects"], 1)
+
+    def test_cliente_paho_reconecta_apos_queda(self):
+        """Broker TCP mínimo que derruba a primeira sessão logo após o CONNACK."""
+        async def principal():
+            conexoes = []
+
+            async def atender(reader, writer):
+                conexoes.append(writer)
+                await reader.read(2)                        # início do CONNECT
+                writer.write(b"\x20\x02\x00\x00")          # CONNACK aceito
+                await writer.drain()
+                if len(conexoes) == 1:
+                    writer.close()
+
+            servidor = await asyncio.start_server(atender, "127.0.0.1", 0)
+            porta = servidor.sockets[0].getsockname()[1]
+            cliente = AsyncMqttClient("127.0.0.1", porta, client_id="teste")
+            conectado = []
+            cliente.paho.on_connect = lambda client, userdata, flags, rc: conectado.append(rc)
+            await cliente.connect()
+            broker = MemoryBroker()
+            runtime = AsyncRuntime(cliente, Publisher(broker.client()), lambda now: None, lambda msg: None,
+                                   period=0.02, reconnect_min=0.02, reconnect_max=0.1)
+            stop = asyncio.Event()
+            tarefa = asyncio.create_task(runtime.run(stop))
+            for _ in range(100):
+                await asyncio.sleep(0.02)
+                if len(conectado) == 2:
+                    break
+            stop.set()
+            await tarefa
+            await cliente.disconnect()
+            for writer in conexoes:
+                writer.close()
+            servidor.close()
+            await servidor.wait_closed()
+            return runtime, conexoes, conectado
+
+        runtime, conexoes, conectado = asyncio.run(principal())
+        self.assertEqual(len(conexoes), 2)
+        self.assertEqual(conectado, [0, 0])
+        self.assertEqual(runtime.reconnects, 1)
+
+    def test_modo_invalido(self):
+        broker = MemoryBroker()
+        with self.assertRaises(ValueError):
+            AsyncRuntime(broker.client(), Publisher(broker.client()), lambda now: None, lambda msg: None,
+                         trigger="polling")
+        with self.assertRaises(ValueError):
+            AsyncRuntime(broker.client(), Publisher(broker.client()), lambda now: None, lambda msg: None,
+                         reconnect_min=2.0, reconnect_max=1.0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
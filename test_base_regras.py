@@ -0,0 +1,201 @@
+import unittest
+import json
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import numpy as np
+import sistema_fuzzy
+import fuzzy_miso as app
+from base_regras import (DEFAULT_CONFIG, ERRO_LIMITS, VAR_LIMITS, input_mfs, output_mfs, build_engine,
+                         validate_config, compile_rule_base, RuleBaseSwap, RuleFileWatcher)
+
+# Saída mais agressiva que a atual: muda o PCRAC sem mudar as entradas
+OUTRA_CONFIG = dict(DEFAULT_CONFIG, pcrac_peaks=[0, 20, 50, 80, 100])
+
+class TestBaseRegras(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def esperar(self, cond, timeout=10.0):
+        limite = time.monotonic() + timeout
+        while not cond():
+            if time.monotonic() > limite:
+                self.fail("tempo esgotado")
+            time.sleep(0.01)
+
+    # =================================================================
+    # CONFIGURAÇÃO E COMPILAÇÃO
+    # =================================================================
+
+    def test_configuracao_atual_reproduz_o_sistema(self):
+        for label, mf in input_mfs(sistema_fuzzy.errotemp_universe, DEFAULT_CONFIG["erro_peaks"], ERRO_LIMITS).items():
+            np.testing.assert_array_equal(mf, sistema_fuzzy.errotemp_mfs[label])
+        for label, mf in input_mfs(sistema_fuzzy.varerrotemp_universe, DEFAULT_CONFIG["var_peaks"], VAR_LIMITS).items():
+            np.testing.assert_array_equal(mf, sistema_fuzzy.varerrotemp_mfs[label])
+        for label, mf in output_mfs(sistema_fuzzy.pcrac_universe, DEFAULT_CONFIG["pcrac_peaks"]).items():
+            np.testing.assert_array_equal(mf, sistema_fuzzy.consequents_terms[label])
+        E, V = np.meshgrid(np.linspace(-16, 16, 33), np.linspace(-2, 2, 21))
+        np.testing.assert_allclose(build_engine(DEFAULT_CONFIG).evaluate(E, V).output,
+                                   sistema_fuzzy.motor_lote.evaluate(E, V).output)
+        self.assertEqual(sistema_fuzzy.mf_definitions_hash(compile_rule_base(DEFAULT_CONFIG).definitions()),
+                         sistema_fuzzy.mf_definitions_hash())
+
+    def test_configuracao_invalida(self):
+        for key, value in (("erro_peaks", [-12, -6, 0, 0, 12]), ("var_peaks", [-3, -0.4, 0, 0.4, 0.8]),
+                           ("matriz_saida", [["MB"] * 5] * 4), ("matriz_saida", [["XX"] * 5] * 5)):
+            with self.assertRaises(ValueError, msg=key):
+                validate_config(dict(DEFAULT_CONFIG, **{key: value}))
+        with self.assertRaises(ValueError):
+            validate_config({k: v for k, v in DEFAULT_CONFIG.items() if k != "pcrac_peaks"})
+
+    def test_tipos_invalidos_sao_value_error(self):
+        for key, value in (("matriz_saida", 5), ("matriz_saida", [[{}] * 5] * 5), ("matriz_saida", ["MBBMA"] * 5),
+                           ("erro_peaks", 3), ("erro_peaks", [{}, 1, 2, 3, 4]), ("var_peaks", [True] * 5),
+                           ("pcrac_peaks", [0, 25, float("nan"), 75, 100])):
+            with self.assertRaises(ValueError, msg=f"{key}={value!r}"):
+                validate_config(dict(DEFAULT_CONFIG, **{key: value}))
+        for config in ([], "x", None):
+            with self.assertRaises(ValueError):
+                validate_config(config)
+
+    def test_forma_compilada_em_cache(self):
+        """A segunda compilação da mesma configuração só lê o arquivo do cache."""
+        nova = compile_rule_base(OUTRA_CONFIG, self.dir)
+        lida = compile_rule_base(json.loads(json.dumps(OUTRA_CONFIG)), self.dir)
+        self.assertEqual((nova.source, lida.source), ("compiled", "cache"))
+        self.assertEqual(nova.hash, lida.hash)
+        self.assertEqual(len(os.listdir(self.dir)), 1)
+        np.testing.assert_array_equal(lida.surface.table, nova.surface.table)
+        E, V = np.meshgrid(np.linspace(-16, 16, 17), np.linspace(-2, 2, 11))
+        np.testing.assert_array_equal(lida.engine.evaluate(E, V).output, nova.engine.evaluate(E, V).output)
+        self.assertEqual(lida.sparse.evaluate(3.0, 0.1).output, nova.sparse.evaluate(3.0, 0.1).output)
+        self.assertNotEqual(compile_rule_base(OUTRA_CONFIG, surface_step=(1.0, 0.1)).hash, nova.hash)
+
+    # =================================================================
+    # TROCA EM EXECUÇÃO
+    # =================================================================
+
+    def test_troca_entrega_a_oferta_mais_recente(self):
+        swap = RuleBaseSwap()
+        self.assertIsNone(swap.take())
+        swap.offer("a")
+        swap.offer("b")
+        self.assertEqual(swap.take(), "b")
+        self.assertIsNone(swap.take())
+        self.assertEqual(swap.stats(), {"offered": 2, "applied": 1, "replaced": 1})
+
+    def test_arquivo_observado(self):
+        path = os.path.join(self.dir, "regras.json")
+        with open(path, "w") as f:
+            json.dump(DEFAULT_CONFIG, f)
+        compiladas, erros = [], []
+        watcher = RuleFileWatcher(path, lambda config: compile_rule_base(config, self.dir),
+                                  compiladas.append, erros.append)
+        self.assertFalse(watcher.check())           # arquivo não mudou desde a criação
+        with open(path, "w") as f:
+            json.dump(OUTRA_CONFIG, f, indent=1)
+        self.assertTrue(watcher.check())
+        self.assertEqual(compiladas[0].config["pcrac_peaks"], OUTRA_CONFIG["pcrac_peaks"])
+        with open(path, "w") as f:
+            f.write("{")
+        self.assertFalse(watcher.check())
+        self.assertEqual((len(compiladas), watcher.reloads, watcher.errors, len(erros)), (1, 1, 1, 1))
+
+    def test_arquivo_malformado_nao_para_a_observacao(self):
+        """Tipos errados no arquivo viram erro de validação; a thread continua observando."""
+        path = os.path.join(self.dir, "regras.json")
+        with open(path, "w") as f:
+            json.dump(DEFAULT_CONFIG, f)
+        compiladas, erros = [], []
+        watcher = RuleFileWatcher(path, lambda config: compile_rule_base(config, self.dir),
+                                  compiladas.append, erros.append, interval=0.01).start()
+        self.addCleanup(watcher.stop)
+        for k, ruim in enumerate((dict(DEFAULT_CONFIG, matriz_saida=5),
+                                  dict(DEFAULT_CONFIG, matriz_saida=[[{}] * 5] * 5))):
+            with open(path, "w") as f:
+                json.dump(ruim, f, indent=k + 1)
+            self.esperar(lambda: len(erros) == k + 1)
+            self.assertIsInstance(erros[-1], ValueError)
+        with open(path, "w") as f:
+            json.dump(OUTRA_CONFIG, f)
+        self.esperar(lambda: compiladas)
+        self.assertTrue(watcher._thread.is_alive())
+        self.assertEqual((watcher.reloads, watcher.errors), (1, 2))
+
+    def test_erro_inesperado_na_compilacao_nao_para_a_thread(self):
+        path = os.path.join(self.dir, "regras.json")
+        with open(path, "w") as f:
+            json.dump(DEFAULT_CONFIG, f)
+        erros = []
+
+        def compilar(config):
+            raise RuntimeError("falha")
+
+        watcher = RuleFileWatcher(path, compilar, lambda c: None, erros.append, interval=0.01).start()
+        self.addCleanup(watcher.stop)
+        with open(path, "w") as f:
+            json.dump(OUTRA_CONFIG, f)
+        self.esperar(lambda: erros)
+        self.assertTrue(watcher._thread.is_alive())
+        self.assertEqual(watcher.errors, 1)
+
+    def test_arquivo_invalido_na_partida(self):
+        """A partida segue com a base atual e o arquivo continua observado."""
+        path = os.path.join(self.dir, "regras.json")
+        with open(path, "w") as f:
+            json.dump(dict(DEFAULT_CONFIG, matriz_saida=5), f)
+        with patch.multiple(app, RULES_FILE=path, RULES_WATCH_SEC=0.01, RULES_CACHE_DIR=self.dir), \
+                patch("builtins.print"):
+            watcher = app.start_rules_watcher()
+            self.addCleanup(watcher.stop)
+            self.assertIsNone(app.rule_swap.take())
+            with open(path, "w") as f:
+                json.dump(OUTRA_CONFIG, f)
+            self.esperar(lambda: app.rule_swap._pending is not None)
+            self.assertEqual(app.rule_swap.take().config, OUTRA_CONFIG)
+
+    def test_loop_aplica_a_base_entre_ticks(self):
+        out = MagicMock()
+        with patch.multiple(app, RULES_IMG_CACHE_DIR=self.dir, RULES_CACHE_DIR=self.dir, T_n=25.0,
+                            erro_anterior=0.0, PCRAC_val=50.0):
+            self.addCleanup(lambda: app.apply_rule_base(MagicMock(), None).join())
+            compilada = app.compile_rules(OUTRA_CONFIG)
+            app.rule_swap.offer(compilada)
+            app.control_step(out, 0.0, app.build_alert_engine())
+            self.assertIs(app.rule_base, compilada)
+            self.assertIs(app.motor_lote, compilada.engine)
+            self.assertAlmostEqual(app.PCRAC_val, float(compilada.engine.evaluate(3.0, 3.0).output))
+            self.assertNotAlmostEqual(app.PCRAC_val, float(sistema_fuzzy.motor_lote.evaluate(3.0, 3.0).output))
+
+            status = [c for c in out.publish.call_args_list if c.args[0] == app.TOPIC_RULES_STATUS]
+            self.assertEqual(len(status), 1)
+            self.assertTrue(status[0].kwargs["retain"])
+            self.assertEqual(json.loads(status[0].args[1])["hash"], compilada.hash[:16])
+            self.esperar(lambda: any(c.args[0] == app.TOPIC_IMG_RULES for c in out.publish.call_args_list))
+
+            # Com superfície, o loop passa a usar a da base nova
+            app.control_step(out, 0.1, app.build_alert_engine(), superficie=lambda e, v: -1.0)
+            self.assertEqual(app.PCRAC_val, compilada.surface(app.erro_anterior, app.erro_anterior - 3.0))
+
+    def test_configuracao_por_mqtt(self):
+        out = MagicMock()
+        msg = lambda payload: SimpleNamespace(topic=app.TOPIC_RULES, payload=payload)
+        with patch.object(app, "RULES_CACHE_DIR", self.dir):
+            app.on_message(out, None, msg(b'{"erro_peaks": [1, 2]}'))
+            self.esperar(lambda: out.publish.called)
+            topic, payload = out.publish.call_args_list[0].args
+            self.assertEqual(topic, app.TOPIC_RULES_STATUS)
+            self.assertIn("error", json.loads(payload))
+            self.assertIsNone(app.rule_swap.take())
+
+            app.on_message(out, None, msg(json.dumps(OUTRA_CONFIG).encode()))
+            self.esperar(lambda: app.rule_swap._pending is not None)
+            self.assertEqual(app.rule_swap.take().config, OUTRA_CONFIG)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
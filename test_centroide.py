@@ -0,0 +1,85 @@
+import unittest
+import numpy as np
+import skfuzzy as fuzz
+import fuzzy_miso as app
+from centroide import PiecewiseLinearCentroid, knots_from_samples
+from inferencia import BatchInference
+
+def centroide_fino(mfs_x, mfs, cuts, n=200001):
+    """Centróide de referência amostrando o polígono numa grade muito fina."""
+    x = np.linspace(mfs_x[0], mfs_x[-1], n)
+    finos = np.stack([np.interp(x, mfs_x, mf) for mf in mfs])
+    out = []
+    for c in cuts:
+        agg = np.minimum(c[:, None], finos).max(axis=0)
+        out.append(np.trapezoid(x * agg, x) / np.trapezoid(agg, x))
+    return np.array(out)
+
+class TestCentroideAnalitico(unittest.TestCase):
+
+    def setUp(self):
+        self.motor = app.motor_lote
+        self.pl = PiecewiseLinearCentroid.from_samples(self.motor.out_universe, self.motor.out_mf)
+        self.rng = np.random.default_rng(3)
+
+    # =================================================================
+    # VÉRTICES
+    # =================================================================
+
+    def test_vertices_dos_termos(self):
+        """trimf/trapmf amostrados voltam a ter só os vértices dos parâmetros."""
+        xs, ys = knots_from_samples(app.pcrac_universe, app.consequents_terms['M'])
+        self.assertEqual(xs.tolist(), [0.0, 25.0, 50.0, 75.0, 100.0])
+        self.assertEqual(ys.tolist(), [0.0, 0.0, 1.0, 0.0, 0.0])
+
+    # =================================================================
+    # EXATIDÃO
+    # =================================================================
+
+    def test_exato_contra_referencia_fina(self):
+        cuts = self.rng.uniform(0.0, 1.0, (200, 5))
+        ref = centroide_fino(self.motor.out_universe, self.motor.out_mf, cuts)
+        np.testing.assert_allclose(self.pl.centroid(cuts), ref, atol=1e-3)
+
+    def test_termos_trapezoidais_sobrepostos(self):
+        """Termos genéricos: patamares, mais de dois termos sobrepostos."""
+        u = np.linspace(0.0, 10.0, 1001)
+        termos = [fuzz.trapmf(u, [0, 0, 3, 6]), fuzz.trapmf(u, [2, 4, 5, 9]),
+                  fuzz.trimf(u, [1, 7, 10]), fuzz.trapmf(u, [6, 8, 10, 10])]
+        pl = PiecewiseLinearCentroid.from_samples(u, termos)
+        cuts = self.rng.uniform(0.0, 1.0, (100, 4))
+        np.testing.assert_allclose(pl.centroid(cuts), centroide_fino(u, termos, cuts), atol=1e-4)
+
+    def test_area_nula(self):
+        out = self.pl.centroid(np.array([[0.0] * 5, [0.0, 0.0, 1.0, 0.0, 0.0]]))
+        self.assertTrue(np.isnan(out[0]))
+        self.assertAlmostEqual(out[1], 50.0)
+
+    # =================================================================
+    # MOTOR EM LOTE
+    # =================================================================
+
+    def test_independe_da_resolucao_do_universo(self):
+        """O universo de saída mais fino não muda o centróide analítico."""
+        fino = np.arange(0, 100.01, 0.1)
+        termos = {label: np.interp(fino, app.pcrac_universe, mf) for label, mf in app.consequents_terms.items()}
+        e_u, e_mfs = app.antecedents['errotemp']
+        v_u, v_mfs = app.antecedents['varerrotemp']
+        motor_fino = BatchInference(e_u, e_mfs, v_u, v_mfs, fino, termos,
+                                    app.matriz_saida, app.erro_labels, app.delta_labels)
+        erro = self.rng.uniform(-16, 16, 500)
+        var = self.rng.uniform(-2, 2, 500)
+        a = self.motor.evaluate(erro, var, centroid_method="analytic").output
+        b = motor_fino.evaluate(erro, var, centroid_method="analytic").output
+        np.testing.assert_allclose(a, b, rtol=0, atol=1e-9)
+
+    def test_proximo_do_skfuzzy(self):
+        """Difere do centróide amostrado só pelo erro da grade; continua monotônico no erro."""
+        erro = np.linspace(-16, 16, 2001)
+        exato = self.motor.evaluate(erro, 0.0, centroid_method="analytic").output
+        amostrado = self.motor.evaluate(erro, 0.0).output
+        self.assertLess(np.abs(exato - amostrado).max(), 0.05)
+        self.assertTrue((np.diff(exato) >= -1e-12).all())
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
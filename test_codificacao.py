@@ -0,0 +1,109 @@
+import unittest
+import json
+import numpy as np
+import fuzzy_miso as app
+from codificacao import InferenceEncoder, InferenceDecoder, InferenceJson, inference_metadata
+
+class TestCodificacaoCompacta(unittest.TestCase):
+
+    def setUp(self):
+        self.antecedents = {
+            'errotemp': (app.errotemp.universe, {label: app.errotemp[label].mf for label in app.errotemp.terms}),
+            'varerrotemp': (app.varerrotemp.universe, {label: app.varerrotemp[label].mf for label in app.varerrotemp.terms})
+        }
+        self.consequents_terms = {label: app.pcrac[label].mf for label in app.pcrac.terms}
+        self.encoder = InferenceEncoder(app.pcrac.universe.size, keyframe_interval=10)
+        self.decoder = InferenceDecoder()
+
+    def quadro(self, erro, var_erro, encoder=None):
+        rule_infos, agg_mu, defuzz = app.inference_debug(erro, var_erro, app.pcrac.universe,
+                                                         self.consequents_terms, self.antecedents)
+        activations = [r["activation"] for r in rule_infos]
+        frame = (encoder or self.encoder).encode(1700000000.5, 22.0 + erro, defuzz, erro, var_erro,
+                                                 defuzz, activations, agg_mu)
+        return frame, rule_infos, agg_mu, defuzz
+
+    def test_ida_e_volta(self):
+        """O quadro decodificado reproduz ponto de operação, regras ativas e agregação."""
+        frame, rule_infos, agg_mu, defuzz = self.quadro(3.0, 0.1)
+        out = self.decoder.decode(frame)
+        self.assertAlmostEqual(out["defuzzified"], defuzz, places=4)
+        self.assertAlmostEqual(out["operating_point"]["erro"], 3.0, places=5)
+        esperadas = [(r["id"], r["activation"]) for r in rule_infos if r["activation"] > 0]
+        self.assertEqual([r["id"] for r in out["rules"]], [i for i, _ in esperadas])
+        for r, (_, act) in zip(out["rules"], esperadas):
+            self.assertAlmostEqual(r["activation"], act, places=4)
+        np.testing.assert_allclose(out["aggregation"]["mu"], agg_mu, atol=0.5 / 255 + 1e-12)
+
+    def test_muito_menor_que_json(self):
+        frame, rule_infos, agg_mu, defuzz = self.quadro(3.0, 0.1)
+        payload = json.dumps({"rules": rule_infos, "aggregation": {"x": app.pcrac.universe.tolist(), "mu": agg_mu}})
+        self.assertLess(len(frame) * 10, len(payload))
+
+    def test_delta_e_quadro_repetido(self):
+        """Quadros seguintes usam delta ou 'igual' e continuam decodificáveis."""
+        keyframe, _, _, _ = self.quadro(3.0, 0.1)
+        repetido, _, agg_mu, _ = self.quadro(3.0, 0.1)
+        delta, _, agg_delta, _ = self.quadro(3.2, 0.1)
+        self.assertLess(len(repetido), len(keyframe))
+        self.decoder.decode(keyframe)
+        self.assertIsNotNone(self.decoder.decode(repetido)["aggregation"])
+        out = self.decoder.decode(delta)
+        np.testing.assert_allclose(out["aggregation"]["mu"], agg_delta, atol=0.5 / 255 + 1e-12)
+
+    def test_perda_de_quadro_ressincroniza_no_keyframe(self):
+        """Delta sem o quadro anterior não é aplicado; o keyframe seguinte ressincroniza."""
+        # Regime permanente: depois do keyframe os quadros não repetem a agregação
+        frames = [self.quadro(3.0, 0.1)[0] for _ in range(12)]
+        self.assertLess(len(frames[2]), len(frames[0]))
+        self.decoder.decode(frames[0])
+        # frames[1] perdido
+        self.assertIsNone(self.decoder.decode(frames[2])["aggregation"])
+        self.assertIsNone(self.decoder.decode(frames[3])["aggregation"])
+        self.assertIsNotNone(self.decoder.decode(frames[10])["aggregation"])
+        self.assertIsNotNone(self.decoder.decode(frames[11])["aggregation"])
+
+    def test_mu_16_bits(self):
+        encoder = InferenceEncoder(app.pcrac.universe.size, mu_bits=16)
+        frame, _, agg_mu, _ = self.quadro(-7.5, -0.3, encoder)
+        out = self.decoder.decode(frame)
+        np.testing.assert_allclose(out["aggregation"]["mu"], agg_mu, atol=0.5 / 65535 + 1e-12)
+
+    def test_metadados(self):
+        meta = inference_metadata(app.pcrac.universe, app.motor_lote.rule_labels)
+        self.assertEqual(len(meta["rules"]), 25)
+        self.assertEqual(meta["rules"][0], {"id": 1, "antecedents": ["varerrotemp.MN", "errotemp.MN"], "consequent": "MB"})
+        self.assertEqual(len(meta["aggregation_x"]), app.pcrac.universe.size)
+        json.dumps(meta)
+
+    def test_quadro_invalido(self):
+        frame = bytearray(self.quadro(0.0, 0.0)[0])
+        frame[0:3] = b"XXX"
+        with self.assertRaises(ValueError):
+            self.decoder.decode(frame)
+
+class TestPayloadJson(unittest.TestCase):
+
+    def test_mesmo_texto_que_o_dicionario(self):
+        """O JSON montado dos buffers é idêntico ao json.dumps do dicionário de inference_active."""
+        enc = InferenceJson(app.pcrac_universe, app.motor_lote)
+        rng = np.random.default_rng(3)
+        pontos = list(zip(rng.uniform(-17, 17, 200), rng.uniform(-2.2, 2.2, 200))) + [(20.0, 0.0), (0.0, 0.0)]
+        for include_all in (False, True):
+            for e, v in pontos:
+                rule_infos, agg_mu, defuzz = app.inference_active(e, v, include_all=include_all)
+                pcrac = np.float64(48.12345)
+                ref = json.dumps({
+                    "timestamp": "2024-01-01T00:00:00+00:00",
+                    "operating_point": {"T": round(22.0 + e, 3), "pcrac": round(pcrac, 3),
+                                        "erro": round(e, 3), "var_erro": round(v, 3)},
+                    "rules": rule_infos,
+                    "defuzzified": round(defuzz, 3),
+                    "aggregation": {"x": app.pcrac_universe.tolist(), "mu": [round(float(x), 6) for x in agg_mu]},
+                })
+                texto = enc.encode("2024-01-01T00:00:00+00:00", 22.0 + e, pcrac, e, v,
+                                   app.motor_esparso.evaluate_into(e, v), include_all)
+                self.assertEqual(texto, ref)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -19,8 +19,8 @@ class TestDataCenterCompleto(unittest.TestCase):
         app.PCRAC_val = 50.0
         
         # 2. Reseta contadores e históricos de alerta
-        app.max_power_counter = 0
-        app.osc_history = []
+        self.alertas = app.build_alert_engine()
+        app.alert_gate = app.build_alert_gate()
         
         # 3. Mock do Cliente MQTT (finge que é o MQTT)
         self.mock_client = MagicMock()
@@ -43,6 +43,7 @@ class TestDataCenterCompleto(unittest.TestCase):
         msg.payload = b"reset_now"
         
         app.on_message(self.mock_client, None, msg)
+        app.read_inputs()  # o loop aplica o snapshot no início do tick
         
         self.assertEqual(app.Text, 25.0, "Text deve resetar para 25.0")
         self.assertEqual(app.Qest, 40.0, "Qest deve resetar para 40.0")
@@ -122,26 +123,14 @@ class TestDataCenterCompleto(unittest.TestCase):
         """
         Deve disparar alerta se ficar em 100% de potência por 10 segundos.
         """
-        # Configuração:
-        app.MAX_POWER_DURATION_SEC = 10.0
-        app.loop_interval = 1
-        required_iters = int(app.MAX_POWER_DURATION_SEC / app.loop_interval) # 10
-        
-        # Simula 9 iterações (não deve disparar)
-        app.max_power_counter = required_iters - 1 # 9
-        app.PCRAC_val = 98.0 # Acima do threshold de 95
-        
-        # Lógica do loop para simular a décima iteração:
-        if app.PCRAC_val >= app.MAX_POWER_THRESHOLD:
-            app.max_power_counter += 1
-        
-        # O alerta deve ser disparado AGORA (na iteração 10)
-        if app.max_power_counter == required_iters:
-             app.publish_alert(self.mock_client, 
-                               alert_type="eficiência", 
-                               message="CRAC atingiu potência máxima por tempo prolongado", 
-                               severity="alta")
-        
+        # Em potência máxima desde t=100 s (tempo decorrido, não iterações)
+        for agora in (100.0, 105.0, 110.0):
+            alertas = self.alertas.update(agora, T_next=22.0, pcrac=98.0, erro=0.0)  # Acima do threshold de 95
+
+        # O alerta deve ser disparado AGORA (10 s depois)
+        for _, alert_type, message, data, severity in alertas:
+            app.publish_alert(self.mock_client, alert_type, message, data, severity)
+
         # Verificação:
         self.mock_client.publish.assert_called()
         args, _ = self.mock_client.publish.call_args
@@ -151,27 +140,47 @@ class TestDataCenterCompleto(unittest.TestCase):
         # Asserção: Verifica a chave 'type' no objeto JSON decodificado
         self.assertEqual(payload_data['type'], "eficiência", "O tipo de alerta deveria ser 'eficiência'")
 
+    def test_alerta_temperatura_nao_inunda_o_broker(self):
+        """
+        T_next > 26 por 30 s a 10 Hz: um alerta ao entrar, não um por tick.
+        """
+        for k in range(300):
+            for _, alert_type, message, data, severity in self.alertas.update(k * 0.1, T_next=30.0, pcrac=50.0, erro=8.0):
+                app.emit_alert(self.mock_client, alert_type, message, data, severity, now=k * 0.1)
+        for k in range(300, 310):
+            for _, alert_type, message, data, severity in self.alertas.update(k * 0.1, T_next=22.0, pcrac=50.0, erro=0.0):
+                app.emit_alert(self.mock_client, alert_type, message, data, severity, now=k * 0.1)
+
+        estados = [json.loads(c.args[1])["data"]["state"] for c in self.mock_client.publish.call_args_list]
+        self.assertEqual(estados, ["raised", "cleared"])
+
+    def test_desconexoes_limitadas_por_tipo(self):
+        """
+        Uma rajada de desconexões é limitada pelo alert_gate (ALERT_BURST).
+        """
+        for _ in range(50):
+            app.on_disconnect(self.mock_client, None, 7)
+        self.assertEqual(self.mock_client.publish.call_count, app.ALERT_BURST)
+        self.assertEqual(app.alert_gate.dropped, 50 - app.ALERT_BURST)
+
     def test_alerta_oscilacao(self):
         """
         Detecta se o sistema oscila (positivo/negativo) muitas vezes ("bater pino").
         """
-        # Limpa histórico
-        app.osc_history = []
-        app.OSC_SIGN_CHANGE_THRESHOLD = 3 
-        
+        self.alertas["oscilacao"].threshold = 3
+
         # Simula histórico oscilatório: + - + - 
         # (Isso é péssimo para compressores de ar condicionado)
         sequencia_erros = [1, -1, 1, -1] 
-        
-        sign_changes = 0
-        prev = sequencia_erros[0]
-        for s in sequencia_erros[1:]:
-            if s != prev:
-                sign_changes += 1
-            prev = s
-            
-        self.assertGreaterEqual(sign_changes, 3)
-        # Se fosse no código real, isso dispararia o publish_alert de estabilidade
+
+        alertas = []
+        for k, erro in enumerate(sequencia_erros):
+            alertas += self.alertas.update(k * 0.1, T_next=22.0, pcrac=50.0, erro=erro)
+
+        self.assertEqual(len(alertas), 1)
+        _, alert_type, _, data, _ = alertas[0]
+        self.assertEqual(alert_type, "estabilidade")
+        self.assertGreaterEqual(data["sign_changes"], 3)
 
     # =================================================================
     # GRUPO 4: FÍSICA E MATEMÁTICA (PLANTA)
@@ -0,0 +1,88 @@
+import unittest
+import json
+import os
+import tempfile
+import fuzzy_miso as app
+from desempenho import run_benchmarks, compare, main, operating_points
+
+ETAPAS_RAPIDAS = ["inference_active", "antecedents", "json_inference", "tick"]
+
+class TestBenchmarks(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.relatorio = run_benchmarks(ETAPAS_RAPIDAS, {name: 20 for name in ETAPAS_RAPIDAS})
+
+    # =================================================================
+    # RELATÓRIO
+    # =================================================================
+
+    def test_percentis_e_alocacoes_por_etapa(self):
+        self.assertEqual(list(self.relatorio["stages"]), ETAPAS_RAPIDAS)
+        for row in self.relatorio["stages"].values():
+            self.assertEqual(row["calls"], 20)
+            self.assertLessEqual(row["min_ms"], row["p50_ms"])
+            self.assertLessEqual(row["p50_ms"], row["p90_ms"])
+            self.assertLessEqual(row["p99_ms"], row["max_ms"])
+            self.assertGreater(row["alloc_peak_kb"], 0.0)
+            self.assertIn("gc_per_call", row)
+
+    def test_relatorio_serializavel(self):
+        texto = json.dumps(self.relatorio)
+        self.assertEqual(json.loads(texto)["meta"]["mf_hash"], app.mf_definitions_hash()[:16])
+
+    def test_tick_nao_altera_o_estado_do_controlador(self):
+        app.T_n = 23.5
+        run_benchmarks(["tick"], {"tick": 5})
+        self.assertEqual(app.T_n, 23.5)
+
+    def test_tick_com_superficie_sem_alocar_por_tick(self):
+        """Com os buffers da inferência, o tick não retém memória nem dispara o GC."""
+        row = run_benchmarks(["tick_surface"], {"tick_surface": 300})["stages"]["tick_surface"]
+        self.assertLess(row["gc_per_call"], 0.01)
+        self.assertLess(row["alloc_blocks_per_call"], 1.0)
+        self.assertLess(row["alloc_peak_kb"], 12.0)
+
+    def test_trajetoria_deterministica(self):
+        a = operating_points(100)
+        b = operating_points(100)
+        self.assertEqual(a[0].tolist(), b[0].tolist())
+        self.assertTrue(abs(a[1]).max() <= 2.0)
+        with self.assertRaises(ValueError):
+            run_benchmarks(["nao_existe"])
+
+    # =================================================================
+    # COMPARAÇÃO COM A LINHA DE BASE
+    # =================================================================
+
+    def test_comparacao_detecta_regressao(self):
+        base = json.loads(json.dumps(self.relatorio))
+        base["stages"]["tick"]["p50_ms"] = self.relatorio["stages"]["tick"]["p50_ms"] / 2.0
+        del base["stages"]["antecedents"]
+        linhas = {r["stage"]: r for r in compare(self.relatorio, base, tolerance=0.2)}
+        self.assertNotIn("antecedents", linhas)
+        self.assertTrue(linhas["tick"]["regression"])
+        self.assertAlmostEqual(linhas["tick"]["ratio"], 2.0)
+        self.assertFalse(linhas["json_inference"]["regression"])
+
+    def test_linha_de_comando(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            saida = os.path.join(tmp, "atual.json")
+            base = os.path.join(tmp, "base.json")
+            lenta = json.loads(json.dumps(self.relatorio))
+            for row in lenta["stages"].values():
+                row["p50_ms"] *= 1000.0
+            with open(base, "w") as f:
+                json.dump(lenta, f)
+            args = ["--stages", "antecedents", "--iterations", "10", "--out", saida, "--baseline", base]
+            self.assertEqual(main(args), 0)
+            with open(saida) as f:
+                self.assertEqual(list(json.load(f)["stages"]), ["antecedents"])
+            for row in lenta["stages"].values():
+                row["p50_ms"] /= 1e9
+            with open(base, "w") as f:
+                json.dump(lenta, f)
+            self.assertEqual(main(args), 1)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
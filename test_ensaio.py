@@ -0,0 +1,78 @@
+import unittest
+import json
+import os
+import tempfile
+import fuzzy_miso as app
+from ensaio import run_soak, main, LatencyProbe
+
+class TestEnsaio(unittest.TestCase):
+
+    def setUp(self):
+        app.T_n = 22.0
+        app.erro_anterior = 0.0
+        app.PCRAC_val = 50.0
+
+    # =================================================================
+    # LATÊNCIA ENTRADA-ATUAÇÃO
+    # =================================================================
+
+    def test_sonda_casa_entrada_com_a_atuacao_seguinte(self):
+        sonda = LatencyProbe(2)
+        sonda.sent("q/a", 0, 1.0)
+        sonda.sent("q/b", 1, 1.1)
+        sonda.actuated(0, 1.2)                  # ainda não aplicada: não conta
+        sonda.applied("q/a")
+        sonda.actuated(1, 1.3)
+        sonda.actuated(0, 1.5)
+        self.assertEqual(list(sonda.latencies), [0.5])
+        self.assertEqual(sonda.pending(), 1)
+
+    def test_sala_unica_periodica(self):
+        rel = run_soak(duration=1.0, rate=40, loop_interval=0.05, sample_every=0.25)
+        self.assertEqual(rel["inputs"]["sent"], 40)
+        self.assertEqual(rel["inputs"]["unmatched"], 0)
+        lat = rel["latency"]
+        self.assertEqual(lat["count"], 40)
+        self.assertLessEqual(lat["p50_ms"], lat["p99_ms"])
+        self.assertLessEqual(lat["p99_ms"], lat["max_ms"])
+        self.assertLess(lat["max_ms"], 3 * 50.0)            # no máximo um período, com folga
+        self.assertGreater(rel["broker"]["bytes_per_sec"], 0.0)
+        self.assertGreaterEqual(len(rel["timeline"]), 3)
+        if rel["rss_mb"]["start"] is not None:
+            self.assertGreater(rel["rss_mb"]["end"], 0.0)
+        # O estado do módulo volta ao de antes
+        self.assertIsNone(app.zone_controller)
+        self.assertEqual(app.T_n, 22.0)
+        json.dumps(rel)
+
+    def test_enchente_de_entradas_em_zonas(self):
+        """Por entrada, uma enchente é agrupada em poucos cálculos e toda entrada é atendida."""
+        rel = run_soak(duration=1.0, rate=400, zones=10, trigger="on-change", sample_every=0.5)
+        self.assertEqual(rel["inputs"]["unmatched"], 0)
+        self.assertEqual(rel["latency"]["count"], 400)
+        self.assertLess(rel["runtime"]["computes"], 200)
+        self.assertGreater(rel["runtime"]["coalesced"], 0)
+        self.assertLess(rel["latency"]["max_ms"], 200.0)
+
+    def test_consumidor_lento_nao_atrasa_o_controle(self):
+        rel = run_soak(duration=1.0, rate=40, loop_interval=0.05, slow_consumers=1, consumer_delay=0.05,
+                       sample_every=0.25)
+        self.assertGreater(rel["consumers"]["max_queue"], 5)
+        self.assertLess(rel["consumers"]["received"][0], rel["broker"]["messages"])
+        self.assertEqual(rel["inputs"]["unmatched"], 0)
+        self.assertLess(rel["latency"]["max_ms"], 3 * 50.0)
+
+    def test_linha_de_comando(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            saida = os.path.join(tmp, "ensaio.json")
+            self.assertEqual(main(["--duration", "0.3", "--rate", "20", "--loop-interval", "0.05",
+                                   "--out", saida]), 0)
+            with open(saida) as f:
+                rel = json.load(f)
+        self.assertEqual(rel["config"]["rate"], 20.0)
+        self.assertIn("p99_ms", rel["latency"])
+        with self.assertRaises(ValueError):
+            run_soak(duration=0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,145 @@
+import unittest
+import numpy as np
+import fuzzy_miso as app
+from inferencia import BatchInference, UniverseCentroid, centroid
+import skfuzzy as fuzz
+
+class TestMotorVetorizado(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.motor = app.motor_lote
+        rng = np.random.default_rng(42)
+        # Pontos aleatórios + pontos exatamente sobre os vértices das funções
+        cls.erro = np.concatenate([rng.uniform(-16, 16, 200), np.repeat([-12.0, -6.0, 0.0, 6.0, 12.0], 5)])
+        cls.var = np.concatenate([rng.uniform(-2, 2, 200), np.tile([-0.8, -0.4, 0.0, 0.4, 0.8], 5)])
+        cls.antecedents = {
+            'errotemp': (app.errotemp.universe, {label: app.errotemp[label].mf for label in app.errotemp.terms}),
+            'varerrotemp': (app.varerrotemp.universe, {label: app.varerrotemp[label].mf for label in app.varerrotemp.terms})
+        }
+        cls.consequents_terms = {label: app.pcrac[label].mf for label in app.pcrac.terms}
+
+    def test_igual_ao_skfuzzy(self):
+        """A saída em lote é idêntica à de simulacao.compute() ponto a ponto."""
+        out = self.motor.evaluate(self.erro, self.var).output
+        for k in range(0, len(self.erro), 9):
+            app.simulacao.input['errotemp'] = self.erro[k]
+            app.simulacao.input['varerrotemp'] = self.var[k]
+            app.simulacao.compute()
+            self.assertEqual(out[k], app.simulacao.output['pcrac'])
+
+    def test_igual_ao_inference_debug(self):
+        """Ativações, agregação e centróide batem com inference_debug."""
+        res = self.motor.evaluate(self.erro, self.var, centroid_method="universe", return_aggregation=True)
+        self.assertEqual(res.activations.shape, (len(self.erro), 25))
+        self.assertEqual(res.aggregation.shape, (len(self.erro), app.pcrac.universe.size))
+        for k in range(0, len(self.erro), 9):
+            rule_infos, agg_mu, defuzz_val = app.inference_debug(
+                self.erro[k], self.var[k], app.pcrac.universe, self.consequents_terms, self.antecedents)
+            activations = [r['activation'] for r in rule_infos]
+            np.testing.assert_array_equal(np.round(res.activations[k], 6), activations)
+            np.testing.assert_array_equal(res.aggregation[k], agg_mu)
+            self.assertEqual(res.output[k], defuzz_val)
+
+    def test_ordem_das_regras(self):
+        """A regra k segue a ordem (delta, erro) de inference_debug e da matriz_saida."""
+        self.assertEqual(self.motor.n_rules, 25)
+        self.assertEqual(self.motor.rule_labels[0], ('MN', 'MN', 'MB'))
+        self.assertEqual(self.motor.rule_labels[24], ('MP', 'MP', 'MA'))
+        self.assertEqual(self.motor.rule_labels[4], ('MN', 'MP', app.matriz_saida[0][4]))
+
+    def test_formato_das_entradas(self):
+        """Saída preserva o formato das entradas, inclusive escalares e grades 2D."""
+        self.assertEqual(self.motor.evaluate(3.0, 0.1).output.shape, ())
+        E, V = np.meshgrid(np.linspace(-16, 16, 4), np.linspace(-2, 2, 3), indexing='ij')
+        self.assertEqual(self.motor.evaluate(E, V).output.shape, (4, 3))
+
+    def test_entrada_fora_do_universo_satura(self):
+        """Fora do universo o motor satura nas bordas, como o clip_to_bounds do skfuzzy."""
+        out = self.motor.evaluate([40.0, -40.0], [5.0, -5.0]).output
+        ref = self.motor.evaluate([16.0, -16.0], [2.0, -2.0]).output
+        np.testing.assert_array_equal(out, ref)
+
+    def test_centroide_igual_ao_skfuzzy(self):
+        """A função centroid reproduz fuzz.defuzz(..., 'centroid') e devolve NaN sem área."""
+        x = app.pcrac.universe
+        mus = np.array([app.pcrac['B'].mf * 0.3, np.fmax(app.pcrac['MB'].mf * 0.7, app.pcrac['A'].mf), np.zeros_like(x, dtype=float)])
+        out = centroid(x, mus)
+        self.assertEqual(out[0], fuzz.defuzz(x, mus[0], 'centroid'))
+        self.assertEqual(out[1], fuzz.defuzz(x, mus[1], 'centroid'))
+        self.assertTrue(np.isnan(out[2]))
+
+    def test_metodo_de_centroide_invalido(self):
+        with self.assertRaises(ValueError):
+            self.motor.evaluate(0.0, 0.0, centroid_method="bisector")
+
+    def test_matriz_com_consequente_desconhecido(self):
+        matriz = [row[:] for row in app.matriz_saida]
+        matriz[0][0] = 'XX'
+        with self.assertRaises(ValueError):
+            BatchInference.from_variables(app.errotemp, app.varerrotemp, app.pcrac, matriz,
+                                          app.erro_labels, app.delta_labels)
+
+class TestRegrasAtivas(unittest.TestCase):
+
+    def setUp(self):
+        self.motor = app.motor_esparso
+        rng = np.random.default_rng(7)
+        self.pontos = list(zip(rng.uniform(-17, 17, 150), rng.uniform(-2.2, 2.2, 150)))
+        self.pontos += [(e, v) for e in [-16.0, -6.0, 0.0, 12.0] for v in [-0.8, 0.0, 0.4, 2.0]]
+
+    def test_no_maximo_dois_termos_por_entrada(self):
+        for e, v in self.pontos:
+            res = self.motor.evaluate(e, v)
+            self.assertLessEqual(len(res.erro_degrees), 2)
+            self.assertLessEqual(len(res.var_degrees), 2)
+            self.assertLessEqual(len(res.rules), 4)
+
+    def test_igual_ao_inference_debug(self):
+        """Com include_all, regras, agregação e centróide batem com inference_debug."""
+        for e, v in self.pontos:
+            ref = app.inference_debug(e, v, app.pcrac_universe, app.consequents_terms, app.antecedents)
+            out = app.inference_active(e, v, include_all=True)
+            self.assertEqual(out[0], ref[0])
+            np.testing.assert_allclose(out[1], ref[1], rtol=0, atol=1e-12)
+            np.testing.assert_allclose(out[2], ref[2], rtol=0, atol=1e-9)
+
+    def test_payload_so_com_regras_ativas(self):
+        ref = app.inference_debug(3.0, 0.1, app.pcrac_universe, app.consequents_terms, app.antecedents)[0]
+        rules = app.inference_active(3.0, 0.1)[0]
+        self.assertEqual(rules, [r for r in ref if r["activation"] > 0])
+        self.assertEqual([r["id"] for r in rules], [13, 14, 18, 19])
+
+    def test_avaliacao_no_lugar(self):
+        """evaluate_into reaproveita os mesmos buffers e dá o mesmo resultado que evaluate."""
+        estado = self.motor.state
+        agg = estado.aggregation
+        for e, v in self.pontos:
+            ref = self.motor.evaluate(e, v)
+            out = self.motor.evaluate_into(e, v)
+            self.assertIs(out, estado)
+            self.assertIs(out.aggregation, agg)
+            self.assertEqual([(r.index, r.activation) for r in out.records[:out.n_fired]], ref.rules)
+            np.testing.assert_array_equal(out.aggregation, ref.aggregation)
+            self.assertEqual(np.flatnonzero(out.activations).tolist(), [k for k, _ in ref.rules])
+            self.assertEqual({t: d for t, d in enumerate(out.erro_degrees) if d}, ref.erro_degrees)
+            np.testing.assert_equal(out.output, ref.output)
+
+    def test_centroide_com_buffers_igual_bit_a_bit(self):
+        x = app.motor_lote.out_universe
+        calcular = UniverseCentroid(x)
+        rng = np.random.default_rng(11)
+        for _ in range(200):
+            mu = np.where(rng.random(x.size) < 0.4, 0.0, rng.random(x.size))
+            mu[rng.integers(0, x.size, 6)] = mu[0]          # trechos retangulares
+            self.assertEqual(calcular(mu), float(centroid(x, mu[None, :])[0]))
+        self.assertTrue(np.isnan(calcular(np.zeros_like(x))))
+
+    def test_fora_do_universo(self):
+        """Fora do universo nenhum termo é ativo, como em interp_membership."""
+        res = self.motor.evaluate(20.0, 0.0)
+        self.assertEqual(res.rules, [])
+        self.assertTrue(np.isnan(res.output))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
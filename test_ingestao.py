@@ -0,0 +1,136 @@
+import unittest
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+import numpy as np
+import fuzzy_miso as app
+from ingestao import InputSnapshot, SensorIngest, decode_text, decode_packed, pack_samples
+
+class Relogio:
+    def __init__(self, t=1000.0):
+        self.t = t
+    def __call__(self):
+        return self.t
+
+class TestIngestao(unittest.TestCase):
+
+    def setUp(self):
+        self.relogio = Relogio()
+        self.ingest = (SensorIngest({"Text": 35.0, "Qest": 40.0}, clock=self.relogio, max_age=10.0)
+                       .route("t", "Text").route("q", "Qest").route("q/bin", "Qest", decode_packed))
+
+    # =================================================================
+    # DECODIFICAÇÃO
+    # =================================================================
+
+    def test_formatos_de_payload(self):
+        self.assertEqual(decode_text(b" 28.5 "), (None, 28.5))
+        self.assertIsNone(decode_text(b"[1, 2.5, 3]")[0])
+        t, v = decode_text(b"[[10.0, 1.5], [11.0, 2.5]]")
+        self.assertEqual((t.tolist(), v.tolist()), ([10.0, 11.0], [1.5, 2.5]))
+        t, v = decode_packed(pack_samples([1e9, 1e9 + 1], [20.5, 21.0]))
+        self.assertEqual((t.tolist(), v.tolist()), ([1e9, 1e9 + 1], [20.5, 21.0]))
+        for payload in (b"ola", b"[]", b"[1, [2]]", b"[[1, 2, 3]]", b'{"v": 1}', b"\xff"):
+            with self.assertRaises(ValueError, msg=payload):
+                decode_text(payload)
+        with self.assertRaises(ValueError):
+            decode_packed(b"\0" * 13)
+
+    # =================================================================
+    # DESPACHO E CONTADORES
+    # =================================================================
+
+    def test_lote_aplica_a_amostra_mais_recente(self):
+        self.assertTrue(self.ingest.handle("q", json.dumps([[995.0, 50.0], [999.0, 70.0], [997.0, 60.0]])))
+        leitura = self.ingest.read()
+        self.assertEqual(leitura.values, (35.0, 70.0))
+        self.assertEqual((leitura.stamps[1], leitura.version), (999.0, 1))
+        self.assertFalse(self.ingest.handle("outro/topico", b"1"))
+        self.assertEqual(self.ingest.stats()["samples"], 3)
+
+    def test_malformadas_e_antigas_contadas(self):
+        self.ingest.handle("q", b"isso_nao_eh_numero")
+        self.ingest.handle("q", b"nan")
+        self.ingest.handle("q/bin", pack_samples([998.0, 999.0], [np.nan, 55.0]))
+        self.ingest.handle("q/bin", pack_samples([998.5], [56.0]))      # anterior à já aceita
+        self.ingest.handle("q", b"[[900.0, 57.0]]")                       # mais velha que max_age
+        self.ingest.handle("t", b"[29.0, 30.0]")                           # sem instante: chegada
+        self.assertEqual(self.ingest.read().values, (30.0, 55.0))
+        self.assertEqual(self.ingest.stats(), {"messages": 6, "samples": 3, "malformed": 3,
+                                               "stale": 2, "version": 2})
+
+    def test_numero_fora_do_float_contado(self):
+        """Um inteiro JSON grande demais para float não escapa de handle."""
+        self.assertTrue(self.ingest.handle("q", b"[1" + b"0" * 400 + b", 2.0]"))
+        self.assertTrue(self.ingest.handle("q", b"[[1" + b"0" * 400 + b", 2.0]]"))
+        self.assertEqual(self.ingest.stats()["malformed"], 2)
+        self.assertEqual(self.ingest.read().values, (35.0, 40.0))
+
+    def test_timestamp_no_futuro_recusado(self):
+        """Um remetente com relógio adiantado não congela o canal."""
+        self.ingest.handle("q/bin", pack_samples([1000.0 + 3600.0], [50.0]))
+        self.ingest.handle("q", b"[[1004.0, 55.0]]")                      # dentro da tolerância
+        self.assertEqual(self.ingest.read().values[1], 55.0)
+        self.relogio.t = 1005.0
+        self.ingest.handle("q", b"60.0")
+        self.assertEqual(self.ingest.read().values[1], 60.0)
+        self.assertEqual(self.ingest.stats(), {"messages": 3, "samples": 2, "malformed": 1,
+                                               "stale": 0, "version": 2})
+
+    def test_leitura_nunca_ve_escrita_pela_metade(self):
+        snapshot = InputSnapshot(("a", "b"), (0.0, 0.0))
+        parar = threading.Event()
+
+        def escrever():
+            k = 0
+            while not parar.is_set():
+                k += 1
+                snapshot.write({"a": (k, k), "b": (k, k)})
+
+        escritor = threading.Thread(target=escrever)
+        escritor.start()
+        try:
+            versoes = []
+            for _ in range(20000):
+                leitura = snapshot.read()
+                self.assertEqual(leitura.values[0], leitura.values[1])
+                self.assertEqual(leitura.values[0], leitura.version)
+                versoes.append(leitura.version)
+        finally:
+            parar.set()
+            escritor.join()
+        self.assertEqual(versoes, sorted(versoes))
+
+    def test_custo_por_amostra_em_lote(self):
+        payload = pack_samples(1000.0 - np.arange(1000)[::-1] * 1e-3, np.linspace(40, 60, 1000))
+        t0 = time.perf_counter()
+        for _ in range(200):
+            self.ingest.handle("q/bin", payload)
+        custo_us = (time.perf_counter() - t0) / (200 * 1000) * 1e6
+        self.assertLess(custo_us, 1.0)
+        self.assertAlmostEqual(self.ingest.read().values[1], 60.0, places=4)
+
+    # =================================================================
+    # LOOP DE CONTROLE
+    # =================================================================
+
+    def test_tick_le_o_snapshot(self):
+        """A thread de rede só escreve no snapshot; o tick aplica Text e Qest."""
+        app.T_n, app.erro_anterior, app.PCRAC_val, app.Qest = 22.0, 0.0, 50.0, 40.0
+        app.sensors = app.build_sensors()
+        msg = MagicMock(topic=app.TOPIC_INPUT_QEST_BIN, payload=pack_samples([time.time()] * 3, [60.0, 70.0, 80.0]))
+        app.on_message(MagicMock(), None, msg)
+        self.assertEqual(app.Qest, 40.0)
+        try:
+            app.control_step(MagicMock(), 0.0, app.build_alert_engine())
+            self.assertEqual(app.Qest, 80.0)
+            self.assertEqual(app.sensors.stats()["samples"], 3)
+        finally:
+            app.sensors = app.build_sensors()
+            app.sensors.set(Qest=40.0)
+            app.read_inputs()
+            app.T_n = 22.0
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,94 @@
+import unittest
+import json
+import time
+import urllib.request
+from unittest.mock import MagicMock
+import fuzzy_miso as app
+from metricas import Histogram, Metrics, serve_http
+
+class TestMetricas(unittest.TestCase):
+
+    # =================================================================
+    # HISTOGRAMAS E CONTADORES
+    # =================================================================
+
+    def test_histograma_por_buckets(self):
+        h = Histogram((0.001, 0.01, 0.1))
+        for v in (0.0005, 0.002, 0.003, 0.05, 2.0):
+            h.observe(v)
+        self.assertEqual(h.counts, [1, 2, 1, 1])
+        self.assertEqual(h.count, 5)
+        self.assertAlmostEqual(h.sum, 2.0555)
+        self.assertEqual(h.max, 2.0)
+        self.assertEqual(h.quantile(0.5), 0.01)
+        self.assertEqual(h.quantile(1.0), 2.0)      # acima do último limite: usa o máximo
+
+    def test_texto_prometheus(self):
+        m = Metrics(prefix="t", buckets=(0.01, 0.1))
+        m.describe("stage_seconds", "Etapas", label="stage")
+        m.observe("stage_seconds", 0.05, "compute")
+        m.observe("tick_seconds", 0.2)
+        m.inc("messages_in_total", 3)
+        m.gauge("fila", lambda: {"queued": 2})
+        texto = m.prometheus_text()
+        self.assertIn("# TYPE t_stage_seconds histogram", texto)
+        self.assertIn('t_stage_seconds_bucket{stage="compute",le="0.1"} 1', texto)
+        self.assertIn('t_stage_seconds_bucket{stage="compute",le="+Inf"} 1', texto)
+        self.assertIn('t_stage_seconds_count{stage="compute"} 1', texto)
+        self.assertIn('t_tick_seconds_bucket{le="0.1"} 0', texto)
+        self.assertIn("t_messages_in_total 3", texto)
+        self.assertIn('t_fila{key="queued"} 2', texto)
+
+    def test_custo_por_etapa(self):
+        """Medir uma etapa custa poucos microssegundos (pode ficar ligado a 10 Hz)."""
+        timer = Metrics().timer("stage_seconds")
+        n = 20000
+        t0 = time.perf_counter()
+        t = timer.start()
+        for _ in range(n):
+            t = timer.lap("compute", t)
+        custo_us = (time.perf_counter() - t0) / n * 1e6
+        self.assertLess(custo_us, 20.0)
+
+    def test_endpoint_http(self):
+        m = Metrics(prefix="t")
+        m.inc("messages_in_total")
+        server = serve_http(m, 0)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as resp:
+                self.assertIn("text/plain", resp.headers["Content-Type"])
+                self.assertIn("t_messages_in_total 1", resp.read().decode())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    # =================================================================
+    # INTEGRAÇÃO COM O CONTROLADOR
+    # =================================================================
+
+    def test_etapas_do_tick_e_topico_retido(self):
+        app.metrics._next_publish = None
+        antes = app.metrics.histogram("tick_seconds").count
+        client = MagicMock()
+        app.control_step(client, 0.0, app.build_alert_engine())
+        self.assertEqual(app.metrics.histogram("tick_seconds").count, antes + 1)
+        for stage in ("compute", "inference", "publish", "alerts"):
+            self.assertGreater(app.metrics.histogram("stage_seconds", stage).count, 0)
+        chamadas = [c for c in client.publish.call_args_list if c.args[0] == app.TOPIC_METRICS]
+        self.assertEqual(len(chamadas), 1)
+        self.assertTrue(chamadas[0].kwargs["retain"])
+        self.assertIn("stage_seconds.compute", json.loads(chamadas[0].args[1])["histograms"])
+
+    def test_mensagens_de_entrada_contadas(self):
+        antes = app.metrics.counters.get("messages_in_total", 0)
+        msg = MagicMock(topic=app.TOPIC_INPUT_QEST, payload=b"55")
+        app.on_message(MagicMock(), None, msg)
+        self.assertEqual(app.metrics.counters["messages_in_total"], antes + 1)
+        app.read_inputs()
+        self.assertEqual(app.Qest, 55.0)
+        app.sensors.set(Qest=40.0)
+        app.read_inputs()
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
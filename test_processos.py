@@ -0,0 +1,92 @@
+import unittest
+import os
+import signal
+from multiprocessing import shared_memory
+from unittest.mock import patch
+import numpy as np
+import fuzzy_miso as app
+from processos import ShardedZoneController, EngineCompute
+
+N = 40
+
+def controlador(workers):
+    with patch.object(app, "ZONE_WORKERS", workers):
+        return app.build_zone_controller(N)
+
+class TestControladorEmProcessos(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ctl = controlador(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.ctl.close()
+
+    def setUp(self):
+        """Estado inicial igual no controlador em processos e numa referência de um processo só."""
+        self.ref = controlador(0)
+        self.ref.Qest[:] = np.linspace(10.0, 90.0, N)
+        self.ref.Text[:] = np.linspace(15.0, 40.0, N)
+        self.ref.T[:] = np.linspace(19.0, 27.0, N)
+        for field in ("T", "erro_anterior", "pcrac", "Text", "Qest"):
+            getattr(self.ctl, field)[:] = getattr(self.ref, field)
+        self.ctl.alerts = controlador(0).alerts
+        self.ctl.compute_pcrac = EngineCompute(app.motor_lote, app.DEFUZZ_METHOD)
+
+    def comparar(self, res, ref):
+        np.testing.assert_allclose(res.pcrac, ref.pcrac, rtol=0, atol=1e-9)
+        np.testing.assert_allclose(res.T_next, ref.T_next, rtol=0, atol=1e-9)
+        np.testing.assert_allclose(res.erro, ref.erro, rtol=0, atol=1e-9)
+
+    # =================================================================
+    # PASSO DIVIDIDO
+    # =================================================================
+
+    def test_mesmo_resultado_que_um_processo(self):
+        self.assertEqual(self.ctl.stats()["slices"], [(0, 20), (20, N)])
+        for k in range(15):
+            if k == 5:
+                for c in (self.ctl, self.ref):
+                    c.handle_message("entrada/cargaTermica/zona3", b"95")
+            res, ref = self.ctl.step(now=k * 0.1), self.ref.step(now=k * 0.1)
+            self.comparar(res, ref)
+            self.assertEqual(res.alerts, ref.alerts)
+        np.testing.assert_allclose(self.ctl.T, self.ref.T, rtol=0, atol=1e-9)
+
+    def test_processo_morto_e_recriado_do_estado(self):
+        for k in range(3):
+            self.ctl.step(), self.ref.step()
+        antes = self.ctl.restarts
+        os.kill(self.ctl.worker_pids()[1], signal.SIGKILL)
+        self.comparar(self.ctl.step(), self.ref.step())
+        self.assertEqual(self.ctl.restarts, antes + 1)
+        self.comparar(self.ctl.step(), self.ref.step())
+
+    def test_troca_de_compute_chega_aos_processos(self):
+        superficie, _ = app.build_control_surface(validate=False)
+        self.ctl.compute_pcrac = superficie
+        erro = self.ctl.T - app.T_SETPOINT
+        res = self.ctl.step()
+        np.testing.assert_array_equal(res.pcrac, superficie(erro, erro - self.ref.erro_anterior))
+
+    # =================================================================
+    # ENCERRAMENTO
+    # =================================================================
+
+    def test_encerramento_libera_a_memoria(self):
+        ctl = ShardedZoneController(["a", "b"], EngineCompute(app.motor_lote), workers=3,
+                                    setpoint=22.0, loop_interval=0.1, t_low=18.0, t_high=26.0,
+                                    max_power_threshold=95.0, max_power_duration_sec=10.0,
+                                    osc_window=20, osc_threshold=6)
+        self.assertEqual(ctl.stats()["workers"], 2)
+        ctl.step()
+        nome = ctl._state.name
+        T = ctl.T.copy()
+        ctl.close()
+        np.testing.assert_array_equal(ctl.T, T)
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=nome)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
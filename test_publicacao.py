@@ -0,0 +1,143 @@
+import unittest
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+import fuzzy_miso as app
+from publicacao import Publisher, TopicPolicy, LATEST, topic_matches
+
+class InfoFalsa:
+    """Imita MQTTMessageInfo: fica "em voo" até o teste marcar como publicada."""
+
+    def __init__(self, rc=0):
+        self.rc = rc
+        self.published = False
+
+    def is_published(self):
+        return self.published
+
+class ClienteFalso:
+
+    def __init__(self, rc=0):
+        self.rc = rc
+        self.calls = []
+        self.infos = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.calls.append((topic, payload, retain))
+        info = InfoFalsa(self.rc)
+        self.infos.append(info)
+        return info
+
+class ClienteTravado(ClienteFalso):
+    """Broker travado: publish só volta quando ``liberar`` é sinalizado."""
+
+    def __init__(self):
+        super().__init__()
+        self.liberar = threading.Event()
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.liberar.wait(5.0)
+        return super().publish(topic, payload, qos, retain)
+
+class TestPublicacao(unittest.TestCase):
+
+    # =================================================================
+    # POLÍTICAS POR TÓPICO
+    # =================================================================
+
+    def test_filtros_de_topico(self):
+        self.assertTrue(topic_matches("datacenter/fuzzy/+/alert", "datacenter/fuzzy/sala1/alert"))
+        self.assertFalse(topic_matches("datacenter/fuzzy/+/alert", "datacenter/fuzzy/alert"))
+        self.assertTrue(topic_matches("datacenter/#", "datacenter/fuzzy/temp"))
+        self.assertFalse(topic_matches("datacenter/fuzzy/temp", "datacenter/fuzzy/temp/x"))
+
+    def test_valor_mais_recente_substitui_o_pendente(self):
+        cliente = ClienteFalso()
+        pub = Publisher(cliente, default=LATEST)
+        for k in range(10):
+            pub.publish("datacenter/fuzzy/temp", k)
+        self.assertEqual(pub.queued(), 1)
+        pub.drain()
+        self.assertEqual(cliente.calls, [("datacenter/fuzzy/temp", 9, False)])
+        self.assertEqual(pub.stats()["dropped_by_topic"], {"datacenter/fuzzy/temp": 9})
+
+    def test_fila_fifo_limitada_descarta_a_mais_antiga(self):
+        cliente = ClienteFalso()
+        pub = Publisher(cliente, {"a/+": TopicPolicy(latest=False, maxlen=3)}, default=LATEST)
+        for k in range(5):
+            pub.publish("a/x", k)
+        pub.drain()
+        self.assertEqual([c[1] for c in cliente.calls], [2, 3, 4])
+        self.assertEqual(pub.dropped, 2)
+
+    # =================================================================
+    # CONTRAPRESSÃO
+    # =================================================================
+
+    def test_limite_de_mensagens_em_voo(self):
+        """Sem confirmação de escrita no socket, no máximo max_inflight vão ao paho."""
+        cliente = ClienteFalso()
+        pub = Publisher(cliente, default=TopicPolicy(latest=False, maxlen=50), max_inflight=4)
+        for k in range(10):
+            pub.publish("t", k)
+        self.assertEqual(pub.drain(), 4)
+        self.assertEqual(pub.stats()["inflight"], 4)
+        self.assertEqual(pub.queued(), 6)
+        for info in cliente.infos:
+            info.published = True
+        self.assertEqual(pub.drain(), 4)
+
+    def test_erros_do_cliente_sao_contados(self):
+        pub = Publisher(ClienteFalso(rc=4))      # MQTT_ERR_NO_CONN
+        pub.publish("t", 1)
+        pub.drain()
+        stats = pub.stats()
+        self.assertEqual((stats["sent"], stats["errors"], stats["inflight"]), (0, 1, 0))
+
+    def test_broker_travado_nao_bloqueia_nem_acumula(self):
+        """publish() retorna na hora e a memória fica limitada com o envio travado."""
+        cliente = ClienteTravado()
+        pub = Publisher(cliente, {"alert": TopicPolicy(latest=False, maxlen=10)}, default=LATEST).start()
+        try:
+            t0 = time.perf_counter()
+            for k in range(2000):
+                pub.publish("control", k)
+                pub.publish("temp", k)
+                pub.publish("alert", k)
+            self.assertLess(time.perf_counter() - t0, 1.0)
+            self.assertLessEqual(pub.queued(), 12)
+        finally:
+            cliente.liberar.set()
+            pub.stop()
+        self.assertEqual(pub.queued(), 0)
+        self.assertEqual(cliente.calls[-1][1], 1999)
+
+    # =================================================================
+    # INTEGRAÇÃO COM O CONTROLADOR
+    # =================================================================
+
+    def test_controle_e_temperatura_agrupados(self):
+        mock_client = MagicMock()
+        modo = app.PUBLISH_STEP_MODE
+        app.PUBLISH_STEP_MODE = "bundle"
+        try:
+            ctl = app.build_zone_controller(["a", "b"])
+            app.publish_zone_step(mock_client, ctl, ctl.step())
+        finally:
+            app.PUBLISH_STEP_MODE = modo
+        topics = [c.args[0] for c in mock_client.publish.call_args_list]
+        self.assertEqual(topics, [app.TOPIC_STEP])
+        payload = json.loads(mock_client.publish.call_args.args[1])
+        self.assertEqual(payload["zones"], ["a", "b"])
+        self.assertEqual(len(payload["pcrac"]), 2)
+
+    def test_politicas_do_controlador(self):
+        pub = app.build_publisher(ClienteFalso())
+        self.assertTrue(pub.policy(app.TOPIC_CONTROL).latest)
+        self.assertTrue(pub.policy(app.TOPIC_ZONE_TEMP.format(zone="sala1")).latest)
+        self.assertFalse(pub.policy(app.TOPIC_ZONE_ALERT.format(zone="sala1")).latest)
+        self.assertFalse(pub.policy(app.TOPIC_INFERENCE_BIN).latest)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,228 @@
+import unittest
+import threading
+import time
+import base64
+import numpy as np
+import fuzzy_miso as app
+from renderizador import InferenceFigure, InferenceRenderer, RenderCache
+
+def termos():
+    antecedents = {
+        'errotemp': (app.errotemp.universe, {label: app.errotemp[label].mf for label in app.errotemp.terms}),
+        'varerrotemp': (app.varerrotemp.universe, {label: app.varerrotemp[label].mf for label in app.varerrotemp.terms})
+    }
+    consequents_terms = {label: app.pcrac[label].mf for label in app.pcrac.terms}
+    return app.pcrac.universe, antecedents, consequents_terms
+
+class FiguraFalsa:
+    """Substitui a figura real: 'renderiza' devolvendo o erro recebido."""
+    def render(self, erro_val, varerro_val, agg_mu, defuzz_val):
+        return erro_val
+
+class FiguraContada:
+    """Figura falsa que conta as renderizações e devolve uma string por ponto."""
+    def __init__(self):
+        self.chamadas = 0
+    def render(self, erro_val, varerro_val, agg_mu, defuzz_val):
+        self.chamadas += 1
+        return f"img:{erro_val:.3f}"
+
+class TestRenderizadorInferencia(unittest.TestCase):
+
+    def setUp(self):
+        self.universe, self.antecedents, self.consequents_terms = termos()
+
+    def criar(self, publish, period=0.0, mode="thread"):
+        renderer = InferenceRenderer(publish, self.universe, self.antecedents, self.consequents_terms,
+                                     period=period, mode=mode)
+        self.addCleanup(renderer.stop)
+        return renderer
+
+    def esperar(self, cond, timeout=5.0):
+        limite = time.monotonic() + timeout
+        while not cond():
+            if time.monotonic() > limite:
+                self.fail("tempo esgotado esperando o renderizador")
+            time.sleep(0.01)
+
+    def test_figura_reutilizada_gera_png(self):
+        """A mesma figura produz PNGs válidos e diferentes para pontos diferentes."""
+        fig = InferenceFigure(self.universe, self.antecedents, self.consequents_terms)
+        rule_infos, agg, defuzz = app.inference_debug(3.0, 0.1, self.universe, self.consequents_terms, self.antecedents)
+        img1 = fig.render(3.0, 0.1, agg, defuzz)
+        rule_infos, agg, defuzz = app.inference_debug(-8.0, -0.5, self.universe, self.consequents_terms, self.antecedents)
+        img2 = fig.render(-8.0, -0.5, agg, defuzz)
+        self.assertTrue(img1.startswith("data:image/png;base64,"))
+        self.assertEqual(base64.b64decode(img1.split(",", 1)[1])[:4], b"\x89PNG")
+        self.assertNotEqual(img1, img2)
+        self.assertEqual(fig.defuzz_text.get_text(), f"defuzz={defuzz:.2f}")
+
+    def test_somente_o_mais_recente(self):
+        """Pedidos que chegam durante uma renderização são substituídos pelo mais novo."""
+        liberar = threading.Event()
+        publicados = []
+
+        def publish(img):
+            publicados.append(img)
+            liberar.wait(5.0)
+
+        renderer = self.criar(publish)
+        renderer._figure = FiguraFalsa()
+        renderer.start()
+        renderer.submit(1.0, 0.0, [0.0], 0.0)
+        self.esperar(lambda: publicados == [1.0])
+
+        t0 = time.perf_counter()
+        for erro in (2.0, 3.0, 4.0):
+            renderer.submit(erro, 0.0, [0.0], 0.0)
+        self.assertLess(time.perf_counter() - t0, 0.05, "submit não pode esperar a renderização")
+
+        liberar.set()
+        self.esperar(lambda: renderer.stats()["rendered"] == 2)
+        self.assertEqual(publicados, [1.0, 4.0])
+        stats = renderer.stats()
+        self.assertEqual(stats["submitted"], 4)
+        self.assertEqual(stats["dropped"], 2)
+
+    def test_periodo_minimo(self):
+        """Não publica mais de uma imagem por período."""
+        publicados = []
+        renderer = self.criar(lambda img: publicados.append((time.monotonic(), img)), period=0.3)
+        renderer._figure = FiguraFalsa()
+        renderer.start()
+        renderer.submit(1.0, 0.0, [0.0], 0.0)
+        self.esperar(lambda: len(publicados) == 1)
+        renderer.submit(2.0, 0.0, [0.0], 0.0)
+        time.sleep(0.1)
+        self.assertEqual(len(publicados), 1)
+        self.esperar(lambda: len(publicados) == 2)
+        self.assertGreaterEqual(publicados[1][0] - publicados[0][0], 0.25)
+
+    def test_erro_de_renderizacao_contado(self):
+        def publish(img):
+            raise RuntimeError("broker fora")
+        renderer = self.criar(publish)
+        renderer._figure = FiguraFalsa()
+        renderer.start()
+        renderer.submit(1.0, 0.0, [0.0], 0.0)
+        self.esperar(lambda: renderer.stats()["errors"] == 1)
+
+    def test_modo_processo(self):
+        """No modo processo a figura é renderizada num processo filho."""
+        publicados = []
+        renderer = self.criar(publicados.append, mode="process").start()
+        rule_infos, agg, defuzz = app.inference_debug(3.0, 0.1, self.universe, self.consequents_terms, self.antecedents)
+        renderer.submit(3.0, 0.1, agg, defuzz)
+        self.esperar(lambda: len(publicados) == 1, timeout=30.0)
+        self.assertTrue(publicados[0].startswith("data:image/png;base64,"))
+
+    # =================================================================
+    # CACHE DE IMAGENS
+    # =================================================================
+
+    def test_cache_lru_por_entradas_e_bytes(self):
+        cache = RenderCache(quantum=(0.1, 0.01, 0.5), max_entries=3, max_bytes=100)
+        self.assertEqual(cache.key(0.04, 0.001, 50.2), cache.key(-0.04, -0.004, 49.9))
+        self.assertNotEqual(cache.key(0.04, 0.0, 50.0), cache.key(0.16, 0.0, 50.0))
+        for k in range(3):
+            cache.put(k, "x" * 10)
+        self.assertEqual(cache.get(0), "x" * 10)      # 0 passa a ser o mais recente
+        cache.put(3, "y" * 10)
+        self.assertIsNone(cache.get(1))               # 1 era o menos usado
+        self.assertEqual(cache.stats()["evictions"], 1)
+        cache.put(4, "z" * 80)                        # estoura max_bytes
+        self.assertEqual(cache.bytes, sum(len(cache._entries[k]) for k in cache._entries))
+        self.assertLessEqual(cache.bytes, 100)
+        cache.put(5, "w" * 101)                       # maior que o cache inteiro: não entra
+        self.assertIsNone(cache.get(5))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+        self.assertAlmostEqual(stats["hit_rate"], 1 / 3)
+        with self.assertRaises(ValueError):
+            RenderCache(quantum=(0.1, 0.0, 0.5))
+
+    def test_ponto_parado_nao_republica(self):
+        """Em regime a imagem sai uma vez; pontos já vistos vêm do cache."""
+        publicados = []
+        renderer = InferenceRenderer(publicados.append, self.universe, self.antecedents, self.consequents_terms,
+                                     period=0.0, cache=RenderCache())
+        self.addCleanup(renderer.stop)
+        renderer._figure = figura = FiguraContada()
+        renderer.start()
+
+        def enviar(erro):
+            renderer.submit(erro, 0.0, [0.0], 50.0)
+            self.esperar(lambda: renderer.stats()["submitted"] == renderer.stats()["published"]
+                         + renderer.stats()["suppressed"] + renderer.stats()["dropped"])
+
+        for erro in (0.01, 0.02, 0.03, 1.0, 1.02, 0.0):
+            enviar(erro)
+        self.assertEqual(publicados, ["img:0.010", "img:1.000", "img:0.010"])
+        self.assertEqual(figura.chamadas, 2)
+        stats = renderer.stats()
+        self.assertEqual((stats["rendered"], stats["published"], stats["suppressed"]), (2, 3, 3))
+        self.assertEqual(renderer.cache.stats()["hits"], 1)
+
+    def test_defuzz_nan_nao_derruba_o_renderizador(self):
+        """Sem regra ativa (defuzz NaN) o ponto não entra no cache e os seguintes continuam saindo."""
+        publicados = []
+        renderer = InferenceRenderer(publicados.append, self.universe, self.antecedents, self.consequents_terms,
+                                     period=0.0, cache=RenderCache()).start()
+        self.addCleanup(renderer.stop)
+        self.assertIsNone(renderer.cache.key(20.0, 2.7, float("nan")))
+        renderer.submit(20.0, 2.7, np.zeros(self.universe.size), float("nan"))
+        self.esperar(lambda: renderer.stats()["published"] == 1)
+        _, agg, defuzz = app.inference_debug(3.0, 0.1, self.universe, self.consequents_terms, self.antecedents)
+        renderer.submit(3.0, 0.1, agg, defuzz)
+        self.esperar(lambda: renderer.stats()["published"] == 2)
+        self.assertEqual(renderer.stats()["errors"], 0)
+        self.assertTrue(publicados[1].startswith("data:image/png;base64,"))
+        self.assertEqual(renderer.cache.stats()["entries"], 1)
+
+    def test_ponto_parado_reenviado_periodicamente(self):
+        agora = [0.0]
+        publicados = []
+        renderer = InferenceRenderer(publicados.append, self.universe, self.antecedents, self.consequents_terms,
+                                     period=0.0, clock=lambda: agora[0], cache=RenderCache(), resend_after=60.0)
+        self.addCleanup(renderer.stop)
+        renderer._figure = FiguraContada()
+        renderer.start()
+        renderer.submit(0.0, 0.0, [0.0], 50.0)
+        self.esperar(lambda: len(publicados) == 1)
+        renderer.submit(0.0, 0.0, [0.0], 50.0)
+        self.esperar(lambda: renderer.stats()["suppressed"] == 1)
+        agora[0] = 61.0
+        renderer.submit(0.0, 0.0, [0.0], 50.0)
+        self.esperar(lambda: len(publicados) == 2)
+        self.assertEqual(renderer.stats()["rendered"], 1)
+
+    def test_troca_de_termos_invalida_o_cache(self):
+        """Depois de set_terms o mesmo ponto é renderizado de novo, com a figura nova."""
+        from base_regras import DEFAULT_CONFIG, compile_rule_base
+        publicados = []
+        renderer = InferenceRenderer(publicados.append, self.universe, self.antecedents, self.consequents_terms,
+                                     period=0.0, cache=RenderCache())
+        self.addCleanup(renderer.stop)
+        renderer.start()
+        renderer.submit(0.0, 0.0, np.zeros(self.universe.size), 50.0)
+        self.esperar(lambda: len(publicados) == 1)
+
+        base = compile_rule_base(dict(DEFAULT_CONFIG, pcrac_peaks=[0, 20, 50, 80, 100]))
+        renderer.set_terms(base.engine.out_universe, base.antecedents, base.consequents_terms)
+        renderer.submit(0.0, 0.0, np.zeros(self.universe.size), 50.0)
+        self.esperar(lambda: len(publicados) == 2)
+        self.assertNotEqual(publicados[0], publicados[1])
+        self.assertEqual(renderer.stats()["rendered"], 2)
+        self.assertEqual(len(renderer.cache), 1)
+
+    def test_fabrica_usa_configuracao_do_cache(self):
+        renderer = app.build_renderer(app.Publisher(None))
+        self.assertEqual(renderer.cache.quantum, app.INFERENCE_IMG_QUANTUM)
+        self.assertEqual(renderer.resend_after, app.INFERENCE_IMG_RESEND_SEC)
+
+    def test_modo_invalido(self):
+        with self.assertRaises(ValueError):
+            InferenceRenderer(print, self.universe, self.antecedents, self.consequents_terms, mode="gpu")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+import fuzzy_miso as app
+from planta import plant_step
+from simulador import simulate, simulate_scenarios, summarize
+
+class TestSimuladorHeadless(unittest.TestCase):
+
+    def test_cenario_unico_igual_ao_loop_escalar(self):
+        """Um cenário reproduz passo a passo o cálculo do loop de sala única."""
+        Text = np.linspace(25.0, 35.0, 30)
+        Qest = np.linspace(60.0, 20.0, 30)
+        res = simulate_scenarios(Text, Qest, T0=24.0)
+
+        T_n, erro_anterior = 24.0, 0.0
+        for k in range(30):
+            erro = T_n - app.T_SETPOINT
+            app.simulacao.input['errotemp'] = erro
+            app.simulacao.input['varerrotemp'] = erro - erro_anterior
+            app.simulacao.compute()
+            pcrac = app.simulacao.output['pcrac']
+            self.assertEqual(res.pcrac[k, 0], pcrac)
+            T_n, erro_anterior = plant_step(T_n, pcrac, Qest[k], Text[k]), erro
+            self.assertAlmostEqual(res.T[k + 1, 0], T_n, places=10)
+
+    def test_cenarios_lado_a_lado(self):
+        """Cada coluna é um cenário independente; colunas iguais dão trajetórias iguais."""
+        Qest = np.column_stack([np.full(50, 20.0), np.full(50, 80.0), np.full(50, 20.0)])
+        res = simulate_scenarios(Text=30.0, Qest=Qest, T0=[22.0, 22.0, 22.0])
+        self.assertEqual(res.T.shape, (51, 3))
+        self.assertEqual(res.pcrac.shape, (50, 3))
+        np.testing.assert_array_equal(res.T[:, 0], res.T[:, 2])
+        self.assertGreater(res.pcrac[-1, 1], res.pcrac[-1, 0])
+
+    def test_passos_e_series_constantes(self):
+        with self.assertRaises(ValueError):
+            simulate_scenarios(Text=30.0, Qest=40.0)
+        res = simulate_scenarios(Text=30.0, Qest=40.0, steps=10, names=["x", "y"])
+        self.assertEqual(res.T.shape, (11, 2))
+        self.assertEqual(res.zones, ["x", "y"])
+
+    def test_cenarios_incompativeis(self):
+        with self.assertRaises(ValueError):
+            simulate_scenarios(Text=np.zeros((5, 2)), Qest=np.zeros((5, 3)))
+        with self.assertRaises(ValueError):
+            simulate(app.build_zone_controller(2), Text=np.zeros((5, 4)), Qest=40.0)
+
+    def test_alertas_com_passo(self):
+        """Alertas trazem o passo e o cenário em que dispararam."""
+        res = simulate_scenarios(Text=30.0, Qest=40.0, T0=[22.0, 40.0], steps=3)
+        criticos = [a for a in res.alerts if a[2] == "crítico"]
+        self.assertTrue(criticos)
+        self.assertEqual(criticos[0][:2], (0, "1"))
+
+    def test_resumo(self):
+        res = simulate_scenarios(Text=30.0, Qest=[[20.0, 80.0]] * 40, T0=22.0)
+        resumo = summarize(res, app.loop_interval, app.T_LIMIT_LOW, app.T_LIMIT_HIGH)
+        np.testing.assert_allclose(resumo["energy"], res.pcrac.sum(axis=0) * app.loop_interval)
+        self.assertEqual(resumo["alerts"].shape, (2,))
+        self.assertTrue(np.all(resumo["T_min"] <= resumo["T_max"]))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,83 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+from unittest.mock import MagicMock, patch
+import fuzzy_miso as app
+import sistema_fuzzy
+import skfuzzy as fuzz
+
+class TestPartidaSemEfeitosColaterais(unittest.TestCase):
+
+    # =================================================================
+    # IMPORTAÇÃO
+    # =================================================================
+
+    def test_importar_nao_conecta_nem_carrega_matplotlib(self):
+        """Importar fuzzy_miso não cria cliente MQTT nem importa matplotlib ou skfuzzy.control."""
+        codigo = ("import sys, fuzzy_miso as app; "
+                  "print(app.client is None, 'matplotlib' in sys.modules, "
+                  "'paho.mqtt.client' in sys.modules, 'skfuzzy.control' in sys.modules)")
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", codigo], capture_output=True,
+                             text=True, cwd=os.path.dirname(os.path.abspath(__file__)), timeout=60)
+        self.assertEqual(out.returncode, 0, out.stderr)
+        self.assertEqual(out.stdout.split(), ["True", "False", "False", "False"])
+
+    def test_simulacao_criada_uma_vez(self):
+        self.assertIs(app.simulacao, sistema_fuzzy.control_simulation())
+        self.assertIs(app.sistema_controle, app.simulacao.ctrl)
+        self.assertIn("import_ms", app.startup_times)
+
+    def test_variaveis_skfuzzy_usam_as_mesmas_pertinencias(self):
+        np.testing.assert_array_equal(app.errotemp.universe, sistema_fuzzy.errotemp_universe)
+        for label, mf in sistema_fuzzy.consequents_terms.items():
+            np.testing.assert_array_equal(app.pcrac[label].mf, mf)
+        self.assertEqual(len(app.rules), 25)
+
+    # =================================================================
+    # CACHE DA IMAGEM DAS REGRAS
+    # =================================================================
+
+    def test_hash_muda_com_a_pertinencia(self):
+        base = sistema_fuzzy.mf_definitions_hash()
+        self.assertEqual(base, sistema_fuzzy.mf_definitions_hash())
+        u = sistema_fuzzy.errotemp_universe
+        mfs = dict(sistema_fuzzy.errotemp_mfs, ZE=fuzz.trimf(u, [-5, 0, 5]))
+        alterado = sistema_fuzzy.mf_definitions_hash(dict(
+            sistema_fuzzy.antecedents, errotemp=(u, mfs),
+            pcrac=(sistema_fuzzy.pcrac_universe, sistema_fuzzy.consequents_terms)))
+        self.assertNotEqual(base, alterado)
+
+    def test_imagem_das_regras_em_cache(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            with patch.object(app, "gerar_graficos_base64", return_value="data:image/png;base64,AAAA") as gerar:
+                img, cached = app.rules_image(pasta)
+                self.assertFalse(cached)
+                img2, cached2 = app.rules_image(pasta)
+            self.assertTrue(cached2)
+            self.assertEqual(img, img2)
+            gerar.assert_called_once()
+            self.assertEqual(len(os.listdir(pasta)), 1)
+
+    # =================================================================
+    # START
+    # =================================================================
+
+    def test_start_so_uma_vez(self):
+        cliente = MagicMock()
+        with patch("paho.mqtt.client.Client", return_value=cliente) as Client, \
+             patch.object(app, "rules_image", return_value=("img", True)):
+            try:
+                self.assertIs(app.start(), cliente)
+                self.assertIs(app.start(), cliente)
+            finally:
+                app.client = None
+        Client.assert_called_once()
+        cliente.connect.assert_called_once_with(app.MQTT_BROKER, app.MQTT_PORT, 60)
+        cliente.publish.assert_called_once_with(app.TOPIC_IMG_RULES, "img", retain=True)
+        self.assertEqual(app.startup_times["rules_img_cache"], "hit")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+import fuzzy_miso as app
+from superficie import ControlSurface
+
+class TestSuperficieControle(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Grade grossa para manter o teste rápido
+        cls.superficie, cls.report = app.build_control_surface(erro_step=2.0, var_step=0.2, validate=True)
+
+    def exato(self, erro, var_erro):
+        app.simulacao.input['errotemp'] = erro
+        app.simulacao.input['varerrotemp'] = var_erro
+        app.simulacao.compute()
+        return app.simulacao.output['pcrac']
+
+    def test_nos_da_grade_sao_exatos(self):
+        """Nos pontos da grade a interpolação devolve o valor do motor exato."""
+        s = self.superficie
+        for i, j in [(0, 0), (3, 7), (8, 10), (16, 20)]:
+            e, v = s.erro_grid[i], s.var_grid[j]
+            self.assertAlmostEqual(s(e, v), self.exato(e, v), places=9)
+
+    def test_entrada_escalar_e_array(self):
+        """Escalar devolve float; arrays devolvem array do mesmo formato."""
+        self.assertIsInstance(self.superficie(1.3, 0.07), float)
+        out = self.superficie(np.array([[1.0, 2.0], [3.0, 4.0]]), np.zeros((2, 2)))
+        self.assertEqual(out.shape, (2, 2))
+
+    def test_saturacao_fora_do_universo(self):
+        """Entradas fora da grade são saturadas, como no clip_to_bounds do skfuzzy."""
+        s = self.superficie
+        self.assertAlmostEqual(s(40.0, 5.0), s(16.0, s.var_grid[-1]), places=12)
+        self.assertAlmostEqual(s(-40.0, -5.0), self.exato(-16, -2), places=6)
+
+    def test_relatorio_de_erro(self):
+        """O relatório de erro aponta um máximo coerente com o erro medido."""
+        s = self.superficie
+        at = self.report['at']
+        medido = abs(s(at['erro'], at['var_erro']) - self.exato(at['erro'], at['var_erro']))
+        self.assertAlmostEqual(medido, self.report['max_abs_error'], places=6)
+        self.assertLessEqual(self.report['mean_abs_error'], self.report['max_abs_error'])
+
+    def test_grade_mais_fina_reduz_erro(self):
+        """Refinar a grade não deve piorar o erro máximo."""
+        fina, report_fino = app.build_control_surface(erro_step=1.0, var_step=0.1, validate=True)
+        self.assertLess(report_fino['max_abs_error'], self.report['max_abs_error'])
+
+    def test_grade_invalida(self):
+        with self.assertRaises(ValueError):
+            ControlSurface([0.0, 1.0], [0.0, 1.0], np.zeros((3, 2)))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,110 @@
+import unittest
+import os
+import io
+import tempfile
+import time
+from contextlib import redirect_stdout
+import numpy as np
+import fuzzy_miso as app
+from telemetria import TelemetryRecorder, TelemetryReader, Segment, replay, main, ACTIVATION_SCALE
+
+class TestTelemetria(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def gravar(self, n, t0=1000.0, **kwargs):
+        rec = TelemetryRecorder(self.dir, 25, **kwargs)
+        for k in range(n):
+            rec.append(t0 + 0.1 * k, 22.0 + 0.01 * k, 50.0, 0.01 * k, 0.01, 35.0, 40.0 + k, [(k % 25, 0.5)])
+        return rec
+
+    # =================================================================
+    # GRAVAÇÃO E LEITURA
+    # =================================================================
+
+    def test_colunas_sem_copia(self):
+        rec = self.gravar(20, segment_records=100)
+        rec.close()
+        reader = TelemetryReader(self.dir)
+        self.addCleanup(reader.close)
+        cols = reader.columns()
+        self.assertEqual(len(reader), 20)
+        self.assertTrue(np.shares_memory(cols["T"], reader.segments[0].columns["T"]))
+        self.assertFalse(cols["T"].flags.writeable)
+        np.testing.assert_allclose(cols["Qest"], 40.0 + np.arange(20))
+        self.assertEqual(cols["activations"].shape, (20, 25))
+        self.assertEqual(cols["activations"][3, 3], round(0.5 * ACTIVATION_SCALE))
+        self.assertEqual(cols["activations"][3].sum(), cols["activations"][3, 3])
+
+    def test_rotacao_e_retencao(self):
+        rec = self.gravar(35, segment_records=10, max_segments=2)
+        self.assertEqual(rec.stats(), {"records": 35, "segments_created": 4, "segments_deleted": 2})
+        reader = TelemetryReader(self.dir)
+        self.addCleanup(reader.close)
+        self.assertEqual([len(s) for s in reader.segments], [10, 5])   # acompanha o segmento aberto
+        rec.close()
+
+        # Intervalo que cruza dois segmentos é concatenado
+        cols = reader.columns(("t", "Qest"), start=1000.0 + 0.1 * 25 - 0.01, end=1000.0 + 0.1 * 32 - 0.01)
+        np.testing.assert_allclose(cols["Qest"], 40.0 + np.arange(25, 32))
+        self.assertEqual(reader.columns(("t",), start=5000.0)["t"].size, 0)
+
+    def test_gravador_novo_continua_a_numeracao(self):
+        self.gravar(5, segment_records=10).close()
+        self.gravar(5, t0=2000.0, segment_records=10).close()
+        nomes = sorted(os.listdir(self.dir))
+        self.assertEqual(nomes, ["telemetria-000000.tlm", "telemetria-000001.tlm"])
+        with self.assertRaises(ValueError):
+            with open(os.path.join(self.dir, "x.tlm"), "wb") as f:
+                f.write(b"\0" * 4096)
+            Segment(os.path.join(self.dir, "x.tlm"))
+
+    def test_custo_por_tick(self):
+        rec = TelemetryRecorder(self.dir, 25, segment_records=10000)
+        self.addCleanup(rec.close)
+        regras = [(0, 0.3), (1, 0.7), (5, 0.2), (6, 0.1)]
+        t0 = time.perf_counter()
+        for k in range(5000):
+            rec.append(k * 0.1, 22.0, 50.0, 0.1, 0.01, 35.0, 40.0, regras)
+        custo_us = (time.perf_counter() - t0) / 5000 * 1e6
+        self.assertLess(custo_us, 50.0)
+
+    # =================================================================
+    # LOOP E REEXECUÇÃO
+    # =================================================================
+
+    def test_reexecucao_reproduz_o_loop(self):
+        """Os Text/Qest gravados pelo loop reproduzem a trajetória de T e do PCRAC."""
+        app.T_n, app.erro_anterior, app.PCRAC_val = 24.0, 0.0, 50.0
+        rec = TelemetryRecorder(self.dir, app.motor_lote.n_rules, segment_records=150)
+        out = app.Publisher(None)
+        alert_engine = app.build_alert_engine()
+        try:
+            for k in range(200):
+                app.Text = 30.0 + 5.0 * np.sin(k * 0.05)
+                app.Qest = 40.0 + (30.0 if 80 <= k < 140 else 0.0)
+                app.control_step(out, k * 0.1, alert_engine, recorder=rec)
+        finally:
+            rec.close()
+            app.Text, app.Qest, app.T_n = 35.0, 40.0, 22.0
+
+        reader = TelemetryReader(self.dir)
+        self.addCleanup(reader.close)
+        self.assertEqual(len(reader.segments), 2)
+        res = replay(reader)
+        self.assertEqual(res.simulation.T.shape, (201, 1))
+        self.assertLess(res.max_abs_dT, 1e-3)
+        self.assertLess(res.max_abs_dpcrac, 1e-2)
+        ativas = (reader.columns(("activations",))["activations"] > 0).sum(axis=1)
+        self.assertTrue(((ativas >= 1) & (ativas <= 4)).mean() > 0.9)
+
+        saida = io.StringIO()
+        with redirect_stdout(saida):
+            self.assertEqual(main([self.dir, "--replay"]), 0)
+        self.assertIn("Reexecução: 200 ticks", saida.getvalue())
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,173 @@
+import unittest
+import json
+import numpy as np
+from unittest.mock import MagicMock
+import fuzzy_miso as app
+from planta import plant_step
+from zonas import ZoneController, oscillation_sign_changes
+
+class TestControladorMultiZona(unittest.TestCase):
+
+    def setUp(self):
+        self.ctl = app.build_zone_controller(["a", "b", "c"])
+        self.mock_client = MagicMock()
+
+    # =================================================================
+    # ROTEAMENTO DE ENTRADAS
+    # =================================================================
+
+    def test_roteamento_por_topico(self):
+        """Cada zona recebe apenas o valor do seu tópico."""
+        self.assertEqual(self.ctl.handle_message("entrada/temp/externa/b", b"30.5"), "Text")
+        self.assertEqual(self.ctl.handle_message("entrada/cargaTermica/c", b"70"), "Qest")
+        self.assertEqual(self.ctl.apply_inputs(), 2)
+        self.assertEqual(self.ctl.Text.tolist(), [35.0, 30.5, 35.0])
+        self.assertEqual(self.ctl.Qest.tolist(), [40.0, 40.0, 70.0])
+
+    def test_entrada_invalida_e_zona_desconhecida(self):
+        """Payload inválido ou zona desconhecida não alteram o estado."""
+        self.assertIsNone(self.ctl.handle_message("entrada/temp/externa/a", b"nao_eh_numero"))
+        self.assertIsNone(self.ctl.handle_message("entrada/temp/externa/zz", b"10"))
+        self.assertIsNone(self.ctl.handle_message("outro/topico", b"10"))
+        self.assertEqual(self.ctl.apply_inputs(), 0)
+        self.assertEqual(self.ctl.Text.tolist(), [35.0, 35.0, 35.0])
+
+    def test_entrada_nao_finita_ignorada(self):
+        """``nan`` e ``inf`` não chegam a Text/Qest nem contaminam T."""
+        for payload in (b"nan", b"inf", b"-inf"):
+            self.assertIsNone(self.ctl.handle_message("entrada/temp/externa/a", payload))
+            self.assertIsNone(self.ctl.handle_message("entrada/cargaTermica/a", payload))
+        self.ctl.step()
+        self.assertTrue(np.isfinite(self.ctl.T).all())
+        self.assertEqual((self.ctl.Text[0], self.ctl.Qest[0]), (35.0, 40.0))
+
+    def test_reset_por_zona(self):
+        self.ctl.Text[:] = 99.0
+        self.ctl.handle_message("datacenter/fuzzy/reset/a", b"")
+        self.ctl.handle_message("entrada/temp/externa/b", b"30")
+        self.ctl.apply_inputs()
+        self.assertEqual(self.ctl.Text.tolist(), [25.0, 30.0, 99.0])
+
+    def test_entradas_so_mudam_no_inicio_do_tick(self):
+        """A thread de rede não altera Text/Qest no meio de um tick."""
+        lidos = []
+
+        def planta(T, pcrac, Qest, Text):
+            self.ctl.handle_message("entrada/cargaTermica/a", b"90")   # chega durante o tick
+            lidos.append(Qest.copy())
+            return plant_step(T, pcrac, Qest, Text)
+
+        self.ctl.plant = planta
+        self.ctl.step()
+        self.assertEqual(lidos[0].tolist(), [40.0, 40.0, 40.0])
+        self.ctl.step()
+        self.assertEqual(lidos[1].tolist(), [90.0, 40.0, 40.0])
+
+    def test_zonas_repetidas(self):
+        with self.assertRaises(ValueError):
+            app.build_zone_controller(["a", "a"])
+
+    def test_nomes_de_zona_reservados(self):
+        """``bin`` colidiria com entrada/temp/externa/bin; ``/``, ``+`` e ``#`` quebram a assinatura."""
+        for nome in ("bin", "", "a/b", "+", "#"):
+            with self.assertRaises(ValueError):
+                app.build_zone_controller(["a", nome])
+
+    # =================================================================
+    # PASSO DE CONTROLE E PLANTA
+    # =================================================================
+
+    def test_passo_igual_ao_escalar(self):
+        """Cada zona segue o mesmo cálculo do loop de sala única."""
+        self.ctl.T[:] = [20.0, 22.0, 25.0]
+        self.ctl.erro_anterior[:] = [-1.0, 0.0, 2.5]
+        self.ctl.Qest[:] = [10.0, 40.0, 90.0]
+        T0, e0 = self.ctl.T.copy(), self.ctl.erro_anterior.copy()
+        res = self.ctl.step()
+        for i in range(3):
+            erro = T0[i] - app.T_SETPOINT
+            app.simulacao.input['errotemp'] = erro
+            app.simulacao.input['varerrotemp'] = erro - e0[i]
+            app.simulacao.compute()
+            pcrac = app.simulacao.output['pcrac']
+            self.assertEqual(res.pcrac[i], pcrac)
+            self.assertAlmostEqual(res.T_next[i], plant_step(T0[i], pcrac, self.ctl.Qest[i], self.ctl.Text[i]), places=12)
+        np.testing.assert_array_equal(self.ctl.T, res.T_next)
+        np.testing.assert_array_equal(self.ctl.erro_anterior, res.erro)
+
+    def test_saida_nan_mantem_pcrac_anterior(self):
+        ctl = ZoneController(["a"], lambda e, v: np.full_like(e, np.nan), setpoint=22.0, loop_interval=0.1,
+                             t_low=18.0, t_high=26.0, max_power_threshold=95.0, max_power_duration_sec=1.0,
+                             osc_window=20, osc_threshold=6, pcrac0=42.0)
+        self.assertEqual(ctl.step().pcrac[0], 42.0)
+
+    # =================================================================
+    # ALERTAS POR ZONA
+    # =================================================================
+
+    def test_alerta_temperatura_por_zona(self):
+        self.ctl.T[:] = [22.0, 40.0, 5.0]
+        alerts = self.ctl.step().alerts
+        por_zona = {zone: (t, data["limit"]) for zone, t, _, data, _ in alerts if t == "crítico"}
+        self.assertEqual(por_zona, {"b": ("crítico", 26.0), "c": ("crítico", 18.0)})
+
+    def test_alerta_potencia_maxima(self):
+        ctl = ZoneController(["a", "b"], lambda e, v: np.array([100.0, 10.0]), setpoint=22.0, loop_interval=0.1,
+                             t_low=-1e9, t_high=1e9, max_power_threshold=95.0, max_power_duration_sec=0.5,
+                             osc_window=20, osc_threshold=6)
+        fired = []
+        for _ in range(8):
+            fired += [a for a in ctl.step().alerts if a[1] == "eficiência"]
+        self.assertEqual(len(fired), 1)
+        self.assertEqual(fired[0][0], "a")
+        self.assertAlmostEqual(fired[0][3]["duration_sec"], 0.5)
+        self.assertEqual(ctl.alerts["potencia_maxima"].since[0], 0.0)
+        self.assertTrue(np.isnan(ctl.alerts["potencia_maxima"].since[1]))
+
+    def test_alerta_potencia_maxima_usa_tempo_decorrido(self):
+        """A duração vem do instante dos ticks, não da contagem de iterações."""
+        ctl = ZoneController(["a"], lambda e, v: np.array([100.0]), setpoint=22.0, loop_interval=0.1,
+                             t_low=-1e9, t_high=1e9, max_power_threshold=95.0, max_power_duration_sec=0.5,
+                             osc_window=20, osc_threshold=6)
+        # Ticks atrasados: 3 ticks já cobrem 0,6 s
+        fired = []
+        for now in (10.0, 10.3, 10.6):
+            fired += [a for a in ctl.step(now=now).alerts if a[1] == "eficiência"]
+        self.assertEqual(len(fired), 1)
+        self.assertAlmostEqual(fired[0][3]["duration_sec"], 0.6)
+
+    def test_contagem_de_mudancas_de_sinal(self):
+        """Zeros são ignorados: compara com o último sinal não nulo."""
+        hist = np.array([[1, -1, 1, -1, 0],
+                         [1, 0, -1, 0, 1],
+                         [0, 0, 1, 1, 1],
+                         [0, 0, 0, 0, 0]], dtype=np.int8)
+        self.assertEqual(oscillation_sign_changes(hist).tolist(), [3, 2, 0, 0])
+
+    def test_alerta_oscilacao_limpa_janela(self):
+        self.ctl.alerts["oscilacao"].threshold = 3
+        for erro in [1.0, -1.0, 1.0]:
+            self.ctl.T[:] = app.T_SETPOINT + erro
+            self.assertEqual([a for a in self.ctl.step().alerts if a[1] == "estabilidade"], [])
+        self.ctl.T[:] = app.T_SETPOINT - 1.0
+        osc = [a for a in self.ctl.step().alerts if a[1] == "estabilidade"]
+        self.assertEqual(sorted(a[0] for a in osc), ["a", "b", "c"])
+        self.assertEqual(self.ctl.alerts["oscilacao"].samples.tolist(), [0, 0, 0])
+
+    # =================================================================
+    # PUBLICAÇÃO
+    # =================================================================
+
+    def test_publicacao_por_zona(self):
+        self.ctl.T[1] = 40.0
+        res = self.ctl.step()
+        app.publish_zone_step(self.mock_client, self.ctl, res)
+        topics = [c.args[0] for c in self.mock_client.publish.call_args_list]
+        for zone in ["a", "b", "c"]:
+            self.assertIn(f"datacenter/fuzzy/{zone}/control", topics)
+            self.assertIn(f"datacenter/fuzzy/{zone}/temp", topics)
+        alert_calls = [c for c in self.mock_client.publish.call_args_list if c.args[0] == "datacenter/fuzzy/b/alert"]
+        self.assertEqual(json.loads(alert_calls[0].args[1])["severity"], "crítica")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
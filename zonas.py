@@ -0,0 +1,241 @@
+"""Controlador multi-zona: um processo controlando muitas salas/CRACs.
+
+O estado de processo que no modo de sala única vive em globais de
+``fuzzy_miso`` (``T_n``, ``erro_anterior``, ``PCRAC_val``, ``Text`` e ``Qest``)
+é guardado aqui em arrays com uma posição por zona, e os alertas usam um
+`alertas.AlertEngine` vetorizado. A cada tick o passo fuzzy, a planta e as
+verificações de alerta são calculados para todas as zonas de uma vez.
+
+As entradas são roteadas pelo sufixo do tópico::
+
+    entrada/temp/externa/<zona>     -> Text da zona
+    entrada/cargaTermica/<zona>     -> Qest da zona
+    datacenter/fuzzy/reset/<zona>   -> reset da zona
+
+Os nomes de zona ocupam um nível de tópico, então não podem ser vazios nem
+conter ``/``, ``+`` ou ``#``, e ``bin`` é reservado para os lotes binários de
+sala única (``entrada/temp/externa/bin``). A thread de rede não escreve nos
+arrays lidos pelo tick: as entradas ficam pendentes e `ZoneController.step`
+aplica todas de uma vez no início do tick, como o `ingestao.InputSnapshot`
+faz com as entradas de sala única.
+
+As saídas vão para ``datacenter/fuzzy/<zona>/control``, ``.../temp`` e
+``.../alert``. Este módulo não fala MQTT diretamente: a publicação fica em
+``fuzzy_miso.publish_zone_step``.
+"""
+import math
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+from planta import plant_step
+from alertas import Alert, AlertEngine, default_alert_rules
+
+TOPIC_ZONE_INPUT_TEXT = "entrada/temp/externa/"
+TOPIC_ZONE_INPUT_QEST = "entrada/cargaTermica/"
+TOPIC_ZONE_RESET = "datacenter/fuzzy/reset/"
+TOPIC_ZONE_CONTROL = "datacenter/fuzzy/{zone}/control"
+TOPIC_ZONE_TEMP = "datacenter/fuzzy/{zone}/temp"
+TOPIC_ZONE_ALERT = "datacenter/fuzzy/{zone}/alert"
+# Sufixos que já têm dono nos tópicos de entrada (lotes binários de sala única)
+RESERVED_ZONE_NAMES = frozenset({"bin"})
+
+ZoneStep = namedtuple("ZoneStep", ["erro", "var_erro", "pcrac", "T_next", "alerts"])
+ZoneStep.__doc__ = """Resultado de um tick de `ZoneController.step`.
+
+erro, var_erro, pcrac, T_next : arrays (zonas,)
+alerts : lista de (zona, alert_type, message, data, severity)
+"""
+
+
+def oscillation_sign_changes(history):
+    """Mudanças de sinal por linha de ``history`` (zonas x janela), ignorando zeros.
+
+    Compara cada sinal não nulo com o último sinal não nulo anterior. É a
+    contagem de referência (recalculada sobre a janela inteira) que
+    `alertas.OscillationRule` mantém incrementalmente.
+    """
+    n, w = history.shape
+    cols = np.arange(w)
+    last_nz = np.where(history != 0, cols, 0)
+    np.maximum.accumulate(last_nz, axis=1, out=last_nz)
+    prev = history[np.arange(n)[:, None], last_nz]
+    s = history[:, 1:]
+    p = prev[:, :-1]
+    return ((s != 0) & (p != 0) & (s != p)).sum(axis=1)
+
+
+class ZoneController:
+    """Estado e passo de controle vetorizados para várias zonas.
+
+    ``compute_pcrac(erro, var_erro)`` recebe arrays (zonas,) e devolve o
+    PCRAC de cada zona (por exemplo ``motor_lote.evaluate(...).output`` ou uma
+    ``ControlSurface``). Saídas NaN mantêm o PCRAC anterior da zona, como o
+    ``except: pass`` do loop de sala única.
+
+    `handle_message` e `reset` podem ser chamados da thread de rede: só
+    registram as entradas pendentes, aplicadas por `apply_inputs` no início
+    de `step`. Os arrays ``Text`` e ``Qest`` não mudam durante um tick.
+    """
+
+    def __init__(self, zones, compute_pcrac, *, setpoint, loop_interval,
+                 t_low, t_high, max_power_threshold, max_power_duration_sec,
+                 osc_window, osc_threshold, alert_hysteresis=0.0, alert_min_hold_sec=0.0,
+                 alert_reminder_sec=None, T0=22.0, pcrac0=50.0,
+                 Text0=35.0, Qest0=40.0, reset_Text=25.0, reset_Qest=40.0,
+                 plant=plant_step):
+        self.zones = [str(z) for z in zones]
+        if len(set(self.zones)) != len(self.zones):
+            raise ValueError("identificadores de zona repetidos")
+        for zone in self.zones:
+            if not zone or any(c in zone for c in "/+#") or zone in RESERVED_ZONE_NAMES:
+                raise ValueError(f"nome de zona inválido ou reservado: {zone!r}")
+        self.index = {z: i for i, z in enumerate(self.zones)}
+        self.compute_pcrac = compute_pcrac
+        self.plant = plant
+
+        self.setpoint = setpoint
+        self.loop_interval = loop_interval
+        self.reset_Text = reset_Text
+        self.reset_Qest = reset_Qest
+
+        n = len(self.zones)
+        self.T = np.full(n, T0, dtype=float)
+        self.erro_anterior = np.zeros(n)
+        self.pcrac = np.full(n, pcrac0, dtype=float)
+        self.Text = np.full(n, Text0, dtype=float)
+        self.Qest = np.full(n, Qest0, dtype=float)
+        self._inputs_lock = threading.Lock()
+        self._pending = {}     # (campo, índice da zona) -> valor, aplicado no próximo tick
+        self.ticks = 0
+        self.alerts = AlertEngine(default_alert_rules(
+            t_low=t_low, t_high=t_high,
+            max_power_threshold=max_power_threshold, max_power_duration_sec=max_power_duration_sec,
+            osc_window=osc_window, osc_threshold=osc_threshold, hysteresis=alert_hysteresis,
+            min_hold_sec=alert_min_hold_sec, reminder_sec=alert_reminder_sec), n)
+
+    def __len__(self):
+        return len(self.zones)
+
+    def reset(self, zone=None):
+        """Restaura Text e Qest de uma zona (ou de todas) no próximo tick."""
+        indices = range(len(self.zones)) if zone is None else (self.index[zone],)
+        with self._inputs_lock:
+            for i in indices:
+                self._pending[("Text", i)] = self.reset_Text
+                self._pending[("Qest", i)] = self.reset_Qest
+
+    def apply_inputs(self):
+        """Copia para ``Text``/``Qest`` as entradas pendentes; retorna quantas."""
+        with self._inputs_lock:
+            pending, self._pending = self._pending, {}
+        for (field, i), value in pending.items():
+            getattr(self, field)[i] = value
+        return len(pending)
+
+    def route(self, topic):
+        """Classifica um tópico de entrada: ("Text" | "Qest" | "reset", zona) ou None."""
+        for prefix, kind in ((TOPIC_ZONE_INPUT_TEXT, "Text"),
+                             (TOPIC_ZONE_INPUT_QEST, "Qest"),
+                             (TOPIC_ZONE_RESET, "reset")):
+            if topic.startswith(prefix):
+                zone = topic[len(prefix):]
+                if zone in self.index:
+                    return kind, zone
+                return None
+        return None
+
+    def handle_message(self, topic, payload):
+        """Aplica uma mensagem de entrada; retorna o tipo tratado ou None.
+
+        Payloads inválidos ou não finitos (``nan``, ``inf``) e zonas
+        desconhecidas são ignorados, como em `ingestao.SensorIngest`.
+        """
+        routed = self.route(topic)
+        if routed is None:
+            return None
+        kind, zone = routed
+        if kind == "reset":
+            self.reset(zone)
+            return kind
+        try:
+            valor = float(payload.decode() if isinstance(payload, (bytes, bytearray)) else payload)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            return None
+        if not math.isfinite(valor):
+            # NaN ficaria preso em T para sempre (e nenhum alerta compara)
+            return None
+        with self._inputs_lock:
+            self._pending[(kind, self.index[zone])] = valor
+        return kind
+
+    def step(self, now=None):
+        """Executa um tick para todas as zonas e avança o estado.
+
+        ``now`` é o instante do tick (relógio monotônico) usado nos alertas
+        por duração. Sem ele, usa o tempo simulado ``ticks * loop_interval``.
+        """
+        if now is None:
+            now = self.ticks * self.loop_interval
+        self.ticks += 1
+        self.apply_inputs()
+        erro = self.T - self.setpoint
+        var_erro = erro - self.erro_anterior
+
+        out = np.asarray(self.compute_pcrac(erro, var_erro), dtype=float)
+        self.pcrac = np.where(np.isnan(out), self.pcrac, out)
+
+        T_next = self.plant(self.T, self.pcrac, self.Qest, self.Text)
+        alerts = self._check_alerts(erro, T_next, now)
+
+        self.erro_anterior = erro
+        self.T = T_next
+        return ZoneStep(erro, var_erro, self.pcrac.copy(), T_next, alerts)
+
+    def _check_alerts(self, erro, T_next, now):
+        zones = self.zones
+        return [Alert(zones[alert.index], *alert[1:], rule=alert.rule)
+                for alert in self.alerts.update(now, T_next=T_next, pcrac=self.pcrac, erro=erro)]
+
+
+def measure_zone_capacity(make_controller, zone_counts, ticks=50, period=0.1, publish=None):
+    """Mede o custo por tick para várias quantidades de zonas.
+
+    ``make_controller(n)`` cria um `ZoneController` com ``n`` zonas e
+    ``publish(controller, step)`` (opcional) inclui o custo de publicação.
+    Retorna uma lista de dicionários com tempos médios/p99 em ms e se a
+    quantidade cabe no período ``period`` (10 Hz por padrão).
+    """
+    results = []
+    for n in zone_counts:
+        controller = make_controller(n)
+        # Perturbações diferentes por zona para exercitar regras distintas
+        controller.Qest[:] = np.linspace(10.0, 90.0, n)
+        controller.Text[:] = np.linspace(15.0, 40.0, n)
+        times = np.empty(ticks)
+        for k in range(ticks):
+            t0 = time.perf_counter()
+            result = controller.step()
+            if publish is not None:
+                publish(controller, result)
+            times[k] = time.perf_counter() - t0
+        p99 = float(np.percentile(times, 99))
+        results.append({
+            "zones": n,
+            "mean_ms": float(times.mean() * 1e3),
+            "p99_ms": p99 * 1e3,
+            "sustainable": p99 < period,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    import fuzzy_miso as app
+
+    counts = [1, 10, 100, 250, 500, 1000, 2000, 5000]
+    null_client = type("NullClient", (), {"publish": lambda self, *a, **k: None})()
+    for row in measure_zone_capacity(app.build_zone_controller, counts,
+                                     period=app.loop_interval,
+                                     publish=lambda c, r: app.publish_zone_step(null_client, c, r)):
+        status = "ok" if row["sustainable"] else "excede o período"
+        print(f"{row['zones']:>6} zonas: média {row['mean_ms']:.2f} ms, p99 {row['p99_ms']:.2f} ms ({status})")